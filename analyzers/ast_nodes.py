@@ -0,0 +1,115 @@
+from typing import List, Optional
+
+# Every node keeps the char offset of its first token, resolved to
+# "line:col" through the LineIndex only when a diagnostic needs it.
+class Node:
+  __slots__ = ('offset',)
+
+  def __init__(self, offset: int):
+    self.offset = offset
+
+  def __repr__(self) -> str:
+    fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+    return f'{type(self).__name__}({fields})'
+
+# ----------------
+# Expressions
+# ----------------
+class Var(Node):
+  __slots__ = ('name',)
+
+  def __init__(self, name: str, offset: int):
+    super().__init__(offset)
+    self.name = name
+
+class Num(Node):
+  __slots__ = ('value',)
+
+  def __init__(self, value: int, offset: int):
+    super().__init__(offset)
+    self.value = value
+
+class Str(Node):
+  # Raw lexeme, quotes and escapes included
+  __slots__ = ('text',)
+
+  def __init__(self, text: str, offset: int):
+    super().__init__(offset)
+    self.text = text
+
+  @property
+  def value(self) -> str:
+    # The lexer only treats \" as an escape (it does not end the string)
+    return self.text[1:-1].replace('\\"', '"')
+
+class BinaryOp(Node):
+  # op is the operator's TokenEnum kind (arithmetic, comparison, "e"/"ou")
+  __slots__ = ('op', 'left', 'right')
+
+  def __init__(self, op: int, left: Node, right: Node, offset: int):
+    super().__init__(offset)
+    self.op = op
+    self.left = left
+    self.right = right
+
+class UnaryOp(Node):
+  # op is the operator's TokenEnum kind ("não")
+  __slots__ = ('op', 'operand')
+
+  def __init__(self, op: int, operand: Node, offset: int):
+    super().__init__(offset)
+    self.op = op
+    self.operand = operand
+
+# ----------------
+# Statements
+# ----------------
+class Assign(Node):
+  __slots__ = ('target', 'value')
+
+  def __init__(self, target: Var, value: Node, offset: int):
+    super().__init__(offset)
+    self.target = target
+    self.value = value
+
+class Escreva(Node):
+  __slots__ = ('value',)
+
+  def __init__(self, value: Node, offset: int):
+    super().__init__(offset)
+    self.value = value
+
+class Leia(Node):
+  __slots__ = ('target',)
+
+  def __init__(self, target: Var, offset: int):
+    super().__init__(offset)
+    self.target = target
+
+class Se(Node):
+  __slots__ = ('condition', 'then_body', 'else_body')
+
+  def __init__(self, condition: Node, thenBody: List[Node], elseBody: List[Node], offset: int):
+    super().__init__(offset)
+    self.condition = condition
+    self.then_body = thenBody
+    self.else_body = elseBody
+
+class Para(Node):
+  __slots__ = ('var', 'limit', 'step', 'body')
+
+  def __init__(self, var: Var, limit: Num, step: Optional[Num], body: List[Node], offset: int):
+    super().__init__(offset)
+    self.var = var
+    self.limit = limit
+    self.step = step
+    self.body = body
+
+class Program(Node):
+  __slots__ = ('name', 'declarations', 'body')
+
+  def __init__(self, name: Str, declarations: List[Var], body: List[Node], offset: int):
+    super().__init__(offset)
+    self.name = name
+    self.declarations = declarations
+    self.body = body
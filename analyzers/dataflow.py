@@ -0,0 +1,269 @@
+from heapq import heappop, heappush
+from typing import Callable, Dict, List, Optional
+
+from analyzers.ast_nodes import Assign, BinaryOp, Escreva, Leia, Node, Num, Para, Program, Se, UnaryOp, Var
+from analyzers.diagnostics import WARNING, Diagnostic
+from utils.token_enum import TokenEnum
+from utils.tokens import LineIndex
+
+# Control-flow graph of a validated program plus bitset dataflow over it.
+# Variables are numbered in declaration order and sets of variables (or of
+# definitions) are Python ints used as bitsets, so a transfer function is a
+# couple of big-int operations whatever the number of variables.
+
+class FlowNode:
+  # One statement, "se" condition, or "para" test/step
+  __slots__ = ('index', 'statement', 'offset', 'uses', 'use_sites', 'defines', 'successors', 'predecessors')
+
+  def __init__(self, index: int, statement: Optional[Node], offset: int):
+    self.index = index
+    self.statement = statement
+    self.offset = offset
+    self.uses = 0 # Bitset of variables read
+    self.use_sites: List[Var] = []
+    self.defines = -1 # Variable written, -1 for none
+    self.successors: List['FlowNode'] = []
+    self.predecessors: List['FlowNode'] = []
+
+class ControlFlowGraph:
+  def __init__(self, program: Program):
+    self.variables: Dict[str, int] = {}
+    for var in program.declarations:
+      self.variables.setdefault(var.name, len(self.variables))
+
+    self.nodes: List[FlowNode] = []
+    self.entry = self.add_node(None, program.offset, [])
+    exits = self.build(program.body, [self.entry])
+    self.exit = self.add_node(None, program.offset, exits)
+
+  def add_node(self, statement: Optional[Node], offset: int, predecessors: List[FlowNode]) -> FlowNode:
+    node = FlowNode(len(self.nodes), statement, offset)
+    for predecessor in predecessors:
+      predecessor.successors.append(node)
+      node.predecessors.append(predecessor)
+    self.nodes.append(node)
+    return node
+
+  def build(self, statements: List[Node], predecessors: List[FlowNode]) -> List[FlowNode]:
+    # Appends the statements after `predecessors`; returns the nodes control leaves from
+    for statement in statements:
+      if isinstance(statement, Se):
+        condition = self.add_node(statement, statement.offset, predecessors)
+        self.read(condition, statement.condition)
+        value = constant_condition(statement.condition)
+        then_exits = self.build(statement.then_body, [condition] if value is not False else [])
+        else_exits = self.build(statement.else_body, [condition] if value is not True else [])
+        predecessors = then_exits + else_exits
+      elif isinstance(statement, Para):
+        # while var <= limit: body; var += step
+        test = self.add_node(statement, statement.offset, predecessors)
+        self.read(test, statement.var)
+        body_exits = self.build(statement.body, [test])
+        step = self.add_node(statement, statement.offset, body_exits)
+        step.uses = test.uses # Same read as the test, reported there
+        self.write(step, statement.var)
+        step.successors.append(test)
+        test.predecessors.append(step)
+        predecessors = [test]
+      else:
+        node = self.add_node(statement, statement.offset, predecessors)
+        if isinstance(statement, Assign):
+          self.read(node, statement.value)
+          self.write(node, statement.target)
+        elif isinstance(statement, Leia):
+          self.write(node, statement.target)
+        elif isinstance(statement, Escreva):
+          self.read(node, statement.value)
+        predecessors = [node]
+
+    return predecessors
+
+  def read(self, node: FlowNode, expression: Node):
+    pending = [expression]
+    while pending:
+      expression = pending.pop()
+      if isinstance(expression, Var):
+        node.uses |= 1 << self.variables[expression.name]
+        node.use_sites.append(expression)
+      elif isinstance(expression, BinaryOp):
+        pending.append(expression.right)
+        pending.append(expression.left)
+      elif isinstance(expression, UnaryOp):
+        pending.append(expression.operand)
+
+  def write(self, node: FlowNode, target: Var):
+    node.defines = self.variables[target.name]
+
+  def reachable(self) -> int:
+    # Bitset of the nodes reachable from the entry
+    seen = 1
+    pending = [self.entry]
+    while pending:
+      for successor in pending.pop().successors:
+        if not seen >> successor.index & 1:
+          seen |= 1 << successor.index
+          pending.append(successor)
+    return seen
+
+# ----------------
+# Dataflow
+# ----------------
+def solve(cfg: ControlFlowGraph, forward: bool, transfer: Callable[[FlowNode, int], int]) -> tuple[List[int], List[int]]:
+  # Worklist fixed point of a may (union) problem. Returns the (in, out) sets
+  # of every node, in the direction of the flow. Nodes are created in reverse
+  # postorder (only "para" steps jump back), so always taking the pending node
+  # that comes first in the flow direction needs about one pass per loop level.
+  size = len(cfg.nodes)
+  (flow_in, flow_out) = ([0] * size, [0] * size)
+  nodes = cfg.nodes
+  priority = (lambda index: index) if forward else (lambda index: size - 1 - index)
+  pending = list(range(size))
+  queued = [True] * size
+
+  while pending:
+    node = nodes[priority(heappop(pending))]
+    queued[node.index] = False
+
+    incoming = 0
+    for source in (node.predecessors if forward else node.successors):
+      incoming |= flow_out[source.index]
+    flow_in[node.index] = incoming
+
+    outgoing = transfer(node, incoming)
+    if outgoing != flow_out[node.index]:
+      flow_out[node.index] = outgoing
+      for target in (node.successors if forward else node.predecessors):
+        if not queued[target.index]:
+          queued[target.index] = True
+          heappush(pending, priority(target.index))
+
+  return (flow_in, flow_out)
+
+def reaching_definitions(cfg: ControlFlowGraph) -> List[int]:
+  # Definitions reaching each node. Definition v (< variable count) is the
+  # implicit 0 every variable starts with, the entry node makes all of them;
+  # each writing node n makes definition variable count + n.
+  variable_count = len(cfg.variables)
+  definitions_of = [1 << v for v in range(variable_count)]
+  for node in cfg.nodes:
+    if node.defines >= 0:
+      definitions_of[node.defines] |= 1 << (variable_count + node.index)
+
+  everything = (1 << variable_count) - 1
+  def transfer(node: FlowNode, incoming: int) -> int:
+    if node is cfg.entry:
+      return everything
+    if node.defines < 0:
+      return incoming
+    made = 1 << (variable_count + node.index)
+    return made | (incoming & ~definitions_of[node.defines])
+
+  return solve(cfg, True, transfer)[0]
+
+def live_variables(cfg: ControlFlowGraph) -> List[int]:
+  # Variables read later on some path, after each node
+  def transfer(node: FlowNode, outgoing: int) -> int:
+    if node.defines >= 0:
+      outgoing &= ~(1 << node.defines)
+    return node.uses | outgoing
+
+  return solve(cfg, False, transfer)[0]
+
+# ----------------
+# Warnings
+# ----------------
+def flow_warnings(program: Program, lineIndex: LineIndex) -> List[Diagnostic]:
+  # Possible reads of the implicit 0, values never read and unreachable
+  # statements, in source order. The program must have passed validation.
+  cfg = ControlFlowGraph(program)
+  reachable = cfg.reachable()
+  reaching = reaching_definitions(cfg)
+  live_out = live_variables(cfg)
+  names = list(cfg.variables)
+  warnings = []
+
+  def warn(message: str, offset: int):
+    warnings.append(Diagnostic(WARNING, f'{message} at line {lineIndex.code_index(offset)}', offset))
+
+  read = 0
+  for node in cfg.nodes:
+    read |= node.uses
+
+  unassigned_reported = 0
+  for node in cfg.nodes:
+    if not reachable >> node.index & 1:
+      # Only the first statement of a dead region: every predecessor of a
+      # dead node is dead too, and all but "para" steps come before it
+      if not any(predecessor.index < node.index for predecessor in node.predecessors):
+        warn('Unreachable code', node.offset)
+      continue
+
+    for site in node.use_sites:
+      index = cfg.variables[site.name]
+      if reaching[node.index] >> index & 1 and not unassigned_reported >> index & 1:
+        # Once per variable, at its first such read
+        unassigned_reported |= 1 << index
+        warn(f'Variable "{site.name}" may be used before being assigned', site.offset)
+
+    if isinstance(node.statement, Assign) and read >> node.defines & 1 and not live_out[node.index] >> node.defines & 1:
+      warn(f'Value assigned to "{node.statement.target.name}" is never read', node.offset)
+
+  for var in program.declarations:
+    index = cfg.variables[var.name]
+    if not read >> index & 1:
+      warn(f'Variable "{names[index]}" is never read', var.offset)
+
+  return sorted(warnings, key=lambda warning: warning.offset)
+
+def constant_condition(condition: Node) -> Optional[bool]:
+  # Value of a condition made only of literals, None when it depends on
+  # variables or fails at run time (ordering text against a number).
+  # "não", "e" and "ou" chains are walked with an explicit stack.
+  values: List[Optional[bool]] = []
+  pending: List[tuple[Node, bool]] = [(condition, False)]
+  while pending:
+    (node, visited) = pending.pop()
+    if isinstance(node, UnaryOp):
+      if not visited:
+        pending.append((node, True))
+        pending.append((node.operand, False))
+        continue
+      value = values.pop()
+      values.append(None if value is None else not value)
+    elif isinstance(node, BinaryOp) and node.op in (TokenEnum.E.kind, TokenEnum.OU.kind):
+      if not visited:
+        pending.append((node, True))
+        pending.append((node.right, False))
+        pending.append((node.left, False))
+        continue
+      right = values.pop()
+      left = values.pop()
+      # One side can decide alone (if the other side fails instead, neither branch runs)
+      deciding = node.op == TokenEnum.OU.kind
+      if deciding in (left, right):
+        values.append(deciding)
+      else:
+        values.append(None if None in (left, right) else not deciding)
+    else:
+      values.append(constant_comparison(node))
+  return values[0]
+
+def constant_comparison(condition: Node) -> Optional[bool]:
+  if not isinstance(condition, BinaryOp):
+    return None
+  (op, left, right) = (condition.op, condition.left, condition.right)
+  if isinstance(left, (Var, BinaryOp, UnaryOp)) or isinstance(right, (Var, BinaryOp, UnaryOp)):
+    return None
+  if isinstance(left, Num) != isinstance(right, Num):
+    # Text is never equal to a number and can't be ordered against one
+    return (op == TokenEnum.LOGDIFF.kind) if op in (TokenEnum.LOGIGUAL.kind, TokenEnum.LOGDIFF.kind) else None
+  return COMPARISONS[op](left.value, right.value)
+
+COMPARISONS = {
+  TokenEnum.LOGIGUAL.kind: lambda left, right: left == right,
+  TokenEnum.LOGDIFF.kind: lambda left, right: left != right,
+  TokenEnum.LOGMENOR.kind: lambda left, right: left < right,
+  TokenEnum.LOGMENORIGUAL.kind: lambda left, right: left <= right,
+  TokenEnum.LOGMAIOR.kind: lambda left, right: left > right,
+  TokenEnum.LOGMAIORIGUAL.kind: lambda left, right: left >= right,
+}
@@ -0,0 +1,51 @@
+from typing import List, NamedTuple, Optional
+
+LEXICAL = 'lexical'
+SYNTACTIC = 'syntactic'
+SEMANTIC = 'semantic'
+RUNTIME = 'runtime'
+WARNING = 'warning' # Reported, but the program still compiles
+
+DEFAULT_DIAGNOSTIC_LIMIT = 100
+
+class Diagnostic(NamedTuple):
+  kind: str # LEXICAL | SYNTACTIC | SEMANTIC | WARNING
+  message: str
+  offset: int # Char offset in the source, -1 when unknown
+
+class CompilerError(Exception):
+  # Base for lexical/syntactic/semantic errors; str() is the message,
+  # code_index the "line:col" it points at, kind the phase that raised it
+  kind: Optional[str] = None
+
+  def __init__(self, message: str, codeIndex: str = 'unknown'):
+    super().__init__(message)
+    self.code_index = codeIndex
+
+class TooManyDiagnostics(Exception):
+  pass
+
+class DiagnosticCollector:
+  # Every problem found in one compile, up to `limit`. A problem past the
+  # limit is dropped and raises TooManyDiagnostics, so pathological inputs
+  # stop early and `truncated` means something was actually left out.
+  def __init__(self, limit: int = DEFAULT_DIAGNOSTIC_LIMIT):
+    self.items: List[Diagnostic] = []
+    self.limit = limit
+    self.truncated = False
+
+  def add(self, kind: str, error: CompilerError, offset: int):
+    if len(self.items) >= self.limit:
+      self.truncated = True
+      raise TooManyDiagnostics()
+    self.items.append(Diagnostic(kind, str(error), offset))
+
+  def in_source_order(self) -> List[Diagnostic]:
+    return sorted(self.items, key=lambda diagnostic: diagnostic.offset)
+
+def split_code_index(codeIndex: str) -> tuple:
+  # "12:5" -> (12, 5); (None, None) when the error has no position
+  (line, _, column) = codeIndex.partition(':')
+  if not (line.isdigit() and column.isdigit()):
+    return (None, None)
+  return (int(line), int(column))
@@ -0,0 +1,143 @@
+from typing import Dict, FrozenSet, List, Set
+
+from utils.token_enum import TOKENS_BY_KIND, TokenEnum
+
+# The Portugol grammar as data. Nonterminals are lowercase, terminals are
+# TokenEnum names; an empty alternative derives nothing. FIRST/FOLLOW sets and
+# the LL(1) prediction table are computed once, at import, from this table.
+GRAMMAR: Dict[str, List[List[str]]] = {
+  'program': [['ALGORITMO', 'STRING', 'var_block', 'INICIO', 'statements', 'FIMALGORITMO']],
+  'var_block': [['VAR', 'declarations'], []],
+  'declarations': [['ID', 'more_ids', 'COLON', 'TIPO', 'declarations'], []],
+  'more_ids': [['COMMA', 'ID', 'more_ids'], []],
+
+  'statements': [['statement', 'statements'], []],
+  'statement': [['assignment'], ['escreva'], ['leia'], ['se'], ['para']],
+  'assignment': [['ID', 'ATR', 'arithmetic']],
+  'escreva': [['ESCREVA', 'PARAB', 'escreva_value', 'PARFE']],
+  'escreva_value': [['ID'], ['NUMINT'], ['STRING']],
+  'leia': [['LEIA', 'PARAB', 'ID', 'PARFE']],
+  'se': [['SE', 'logic', 'ENTAO', 'statements', 'else_part', 'FIMSE']],
+  'else_part': [['SENAO', 'statements'], []],
+  'para': [['PARA', 'ID', 'ATE', 'NUMINT', 'step', 'statements', 'FIMPARA']],
+  'step': [['PASSO', 'NUMINT'], []],
+
+  'arithmetic': [['arithmetic_term', 'arithmetic_rest']],
+  'arithmetic_rest': [['arithmetic_operator', 'arithmetic_term', 'arithmetic_rest'], []],
+  'arithmetic_operator': [['OPMAIS'], ['OPMENOS'], ['OPMULTI'], ['OPDIVI']],
+  'arithmetic_term': [['ID'], ['NUMINT'], ['PARAB', 'arithmetic', 'PARFE']],
+
+  'logic': [['comparison', 'logic_rest']],
+  'logic_rest': [['logic_operator', 'comparison', 'logic_rest'], []],
+  'logic_operator': [['E'], ['OU']],
+  'comparison': [['NAO', 'comparison'], ['PARAB', 'logic', 'PARFE'], ['logic_operand', 'comparison_operator', 'right_operand']],
+  'comparison_operator': [['LOGIGUAL'], ['LOGDIFF'], ['LOGMENOR'], ['LOGMENORIGUAL'], ['LOGMAIOR'], ['LOGMAIORIGUAL']],
+  'logic_operand': [['ID'], ['NUMINT'], ['STRING']],
+  'right_operand': [['logic_operand'], ['PARAB', 'logic', 'PARFE']],
+}
+
+START = 'program'
+END_OF_FILE = TokenEnum.END_OF_FILE.kind
+
+class GrammarError(Exception):
+  pass
+
+def is_terminal(symbol: str) -> bool:
+  return symbol not in GRAMMAR
+
+def terminal_kind(symbol: str) -> int:
+  return TokenEnum[symbol].kind
+
+# ----------------
+# FIRST / FOLLOW
+# ----------------
+def compute_first() -> tuple[Dict[str, Set[int]], Set[str]]:
+  first: Dict[str, Set[int]] = {nonterminal: set() for nonterminal in GRAMMAR}
+  nullable: Set[str] = set()
+
+  # Fixed point: grow the sets until a full pass adds nothing
+  changed = True
+  while changed:
+    changed = False
+    for nonterminal, alternatives in GRAMMAR.items():
+      for alternative in alternatives:
+        (kinds, derives_empty) = first_of_sequence(alternative, first, nullable)
+        if not kinds <= first[nonterminal]:
+          first[nonterminal] |= kinds
+          changed = True
+        if derives_empty and nonterminal not in nullable:
+          nullable.add(nonterminal)
+          changed = True
+
+  return (first, nullable)
+
+def first_of_sequence(symbols: List[str], first: Dict[str, Set[int]], nullable: Set[str]) -> tuple[Set[int], bool]:
+  # Kinds that can start `symbols`, and whether `symbols` can derive nothing
+  kinds = set()
+  for symbol in symbols:
+    if is_terminal(symbol):
+      kinds.add(terminal_kind(symbol))
+      return (kinds, False)
+
+    kinds |= first[symbol]
+    if symbol not in nullable:
+      return (kinds, False)
+
+  return (kinds, True)
+
+def compute_follow(first: Dict[str, Set[int]], nullable: Set[str]) -> Dict[str, Set[int]]:
+  follow: Dict[str, Set[int]] = {nonterminal: set() for nonterminal in GRAMMAR}
+  follow[START].add(END_OF_FILE)
+
+  changed = True
+  while changed:
+    changed = False
+    for nonterminal, alternatives in GRAMMAR.items():
+      for alternative in alternatives:
+        for i, symbol in enumerate(alternative):
+          if is_terminal(symbol):
+            continue
+
+          (kinds, derives_empty) = first_of_sequence(alternative[i+1:], first, nullable)
+          if derives_empty:
+            kinds = kinds | follow[nonterminal]
+          if not kinds <= follow[symbol]:
+            follow[symbol] |= kinds
+            changed = True
+
+  return follow
+
+def compute_table() -> Dict[str, Dict[int, int]]:
+  # nonterminal -> token kind -> index of the alternative to expand
+  table: Dict[str, Dict[int, int]] = {}
+  for nonterminal, alternatives in GRAMMAR.items():
+    row = table[nonterminal] = {}
+    for index, alternative in enumerate(alternatives):
+      (kinds, derives_empty) = first_of_sequence(alternative, FIRST, NULLABLE)
+      if derives_empty:
+        kinds = kinds | FOLLOW[nonterminal]
+
+      for kind in kinds:
+        if kind in row:
+          raise GrammarError(f'Grammar is not LL(1): "{nonterminal}" has two alternatives for "{TOKENS_BY_KIND[kind].value}"')
+        row[kind] = index
+
+  return table
+
+def lookahead(nonterminal: str, symbol: str) -> FrozenSet[int]:
+  # Kinds that may come right after `symbol` in the production of `nonterminal`,
+  # i.e. the tokens that end a repetition there (e.g. a "statements" list)
+  for alternative in GRAMMAR[nonterminal]:
+    if symbol in alternative:
+      rest = alternative[alternative.index(symbol)+1:]
+      (kinds, derives_empty) = first_of_sequence(rest, FIRST, NULLABLE)
+      if derives_empty:
+        kinds = kinds | FOLLOW[nonterminal]
+      return frozenset(kinds)
+
+  raise GrammarError(f'"{symbol}" does not appear in "{nonterminal}"')
+
+(first_sets, NULLABLE) = compute_first()
+FIRST: Dict[str, FrozenSet[int]] = {nonterminal: frozenset(kinds) for nonterminal, kinds in first_sets.items()}
+FOLLOW: Dict[str, FrozenSet[int]] = {nonterminal: frozenset(kinds) for nonterminal, kinds in compute_follow(first_sets, NULLABLE).items()}
+TABLE = compute_table()
@@ -0,0 +1,285 @@
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from operator import attrgetter
+from typing import Iterator, List, Optional, Tuple
+
+import analyzers.lexical_analyzer as lexical_analyzer
+from analyzers.ast_nodes import Node, Var
+from analyzers.diagnostics import LEXICAL, SEMANTIC, SYNTACTIC, Diagnostic
+from analyzers.semantic_analyzer import SemanticAnalyzer, double_declaration_error, undeclared_variable_error
+from analyzers.syntax_analyzer import PROGRAM_END, Parser, SyntacticError
+from utils.file_helper import split_lines
+from utils.token_stream import TokenStream
+from utils.tokens import LineIndex, Token
+
+class Segment:
+  # One top-level statement: where it starts (line, col of its first token),
+  # the line of its last token, its AST and the undeclared identifiers in it.
+  # Offsets inside node/undeclared are relative to `base`, the start offset of
+  # start_line when it was parsed.
+  __slots__ = ('start_line', 'start_col', 'end_line', 'node', 'base', 'undeclared')
+
+  def __init__(self, startLine: int, startCol: int, endLine: int, node: Node, base: int, undeclared: List[Var]):
+    self.start_line = startLine
+    self.start_col = startCol
+    self.end_line = endLine
+    self.node = node
+    self.base = base
+    self.undeclared = undeclared
+
+  def position(self) -> Tuple[int, int]:
+    return (self.start_line, self.start_col)
+
+class IncrementalDocument:
+  # Keeps per-line token caches and the top-level statements of the last good
+  # parse. Edits only relex the changed lines and mark them dirty; the next
+  # diagnostics() call reparses from the statement before the dirty lines and
+  # stops as soon as it lines up with an untouched statement again.
+  def __init__(self, text: str = '', engine: str = 'table'):
+    self.scan = lexical_analyzer.SCANNERS[engine]
+    self.lines: List[str] = []
+    self.line_tokens: List[Tuple[Token, ...]] = [] # Offsets relative to the line start
+    self.line_failed: List[bool] = []
+    self.line_index = LineIndex()
+
+    self.parsed = False
+    self.declarations: List[Var] = []
+    self.header_diagnostics: List[Diagnostic] = []
+    self.body_start: Tuple[int, int] = (0, 0) # Right after "inicio"
+    self.segments: List[Segment] = []
+    self.syntax_error: Optional[Diagnostic] = None
+
+    # Dirty region since the last good parse: new lines [start, end), line count delta
+    self.dirty = False
+    self.dirty_start = 0
+    self.dirty_end = 0
+    self.dirty_delta = 0
+
+    self.edit(0, 0, text)
+
+  @property
+  def text(self) -> str:
+    return ''.join(self.lines)
+
+  # ----------------
+  # Editing
+  # ----------------
+  def replace(self, text: str):
+    self.edit(0, len(self.lines), text)
+
+  def edit(self, startLine: int, endLine: int, text: str):
+    # Replace lines [startLine, endLine) with the lines of `text`
+    new_lines = split_lines(text)
+    scanned = [self.scan_line(line, startLine + i) for i, line in enumerate(new_lines)]
+
+    self.lines[startLine:endLine] = new_lines
+    self.line_tokens[startLine:endLine] = [tokens for tokens, _ in scanned]
+    self.line_failed[startLine:endLine] = [failed for _, failed in scanned]
+    self.update_line_starts(startLine)
+    self.mark_dirty(startLine, endLine, len(new_lines))
+
+  def scan_line(self, line: str, lineNumber: int) -> Tuple[Tuple[Token, ...], bool]:
+    try:
+      (_, tokens) = self.scan(line, lineNumber + 1)
+    except lexical_analyzer.LexicalError:
+      return ((), True)
+    return (tuple(tokens), False)
+
+  def update_line_starts(self, fromLine: int):
+    # Lines before fromLine are untouched, so their starts stay valid
+    starts = self.line_index.starts
+    del starts[fromLine:]
+    first = starts[-1] + len(self.lines[fromLine - 1]) if fromLine > 0 else 0
+    if fromLine < len(self.lines):
+      starts.extend(accumulate(map(len, self.lines[fromLine:-1]), initial=first))
+
+  def mark_dirty(self, start: int, end: int, count: int):
+    delta = count - (end - start)
+    if not self.parsed:
+      return
+
+    if not self.dirty:
+      (self.dirty, self.dirty_start, self.dirty_end) = (True, start, start + count)
+    else:
+      # Move the previous dirty end through this edit
+      previous_end = self.dirty_end
+      if previous_end > end:
+        previous_end += delta
+      elif previous_end > start:
+        previous_end = start + count
+      self.dirty_start = min(self.dirty_start, start)
+      self.dirty_end = max(previous_end, start + count)
+    self.dirty_delta += delta
+
+  # ----------------
+  # Diagnostics
+  # ----------------
+  def diagnostics(self) -> List[Diagnostic]:
+    # Lexical errors first; otherwise the syntax error or every undeclared identifier
+    lexical = self.lexical_diagnostics()
+    if lexical:
+      return lexical
+
+    if not self.parsed or self.dirty or self.syntax_error is not None:
+      self.reparse()
+
+    if self.syntax_error is not None:
+      return [self.syntax_error]
+
+    diagnostics = list(self.header_diagnostics)
+    starts = self.line_index.starts
+    for segment in filter(attrgetter('undeclared'), self.segments): # Skipped in C, most have none
+      shift = starts[segment.start_line] - segment.base
+      for var in segment.undeclared:
+        offset = var.offset + shift
+        message = str(undeclared_variable_error(var.name, self.line_index.code_index(offset)))
+        diagnostics.append(Diagnostic(SEMANTIC, message, offset))
+
+    return diagnostics
+
+  def lexical_diagnostics(self) -> List[Diagnostic]:
+    diagnostics = []
+    if True not in self.line_failed:
+      return diagnostics
+
+    for i, failed in enumerate(self.line_failed):
+      if not failed:
+        continue
+      try:
+        self.scan(self.lines[i], i + 1)
+      except lexical_analyzer.LexicalError as e:
+        (start, _) = lexical_analyzer.error_span(self.lines[i], e)
+        diagnostics.append(Diagnostic(LEXICAL, str(e), self.line_index.starts[i] + start))
+
+    return diagnostics
+
+  # ----------------
+  # Parsing
+  # ----------------
+  def iter_tokens(self, line: int, col: int) -> Iterator[Token]:
+    starts = self.line_index.starts
+    line_tokens = self.line_tokens
+
+    for token in line_tokens[line] if line < len(line_tokens) else ():
+      if token.offset >= col:
+        yield Token(token.kind, token.lexeme, starts[line] + token.offset)
+
+    for n in range(line + 1, len(line_tokens)):
+      base = starts[n]
+      for token in line_tokens[n]:
+        yield Token(token.kind, token.lexeme, base + token.offset)
+
+  def token_before(self, line: int, col: int) -> Optional[Token]:
+    # Last token starting before (line, col), with its absolute offset
+    starts = self.line_index.starts
+    for n in range(min(line, len(self.line_tokens) - 1), -1, -1):
+      for token in reversed(self.line_tokens[n]):
+        if n < line or token.offset < col:
+          return Token(token.kind, token.lexeme, starts[n] + token.offset)
+    return None
+
+  def position(self, token: Token) -> Tuple[int, int]:
+    starts = self.line_index.starts
+    line = bisect_right(starts, token.offset) - 1
+    return (line, token.offset - starts[line])
+
+  def reparse(self):
+    if not self.parsed or self.dirty_start <= self.body_start[0]:
+      self.full_parse()
+      return
+
+    # Resume at the statement before the first touched one: its end depends
+    # on the token that follows it
+    first = bisect_left(self.segments, self.dirty_start, key=lambda segment: segment.end_line) - 1
+    if first >= 0:
+      resume = self.segments[first].position()
+    else:
+      (first, resume) = (0, self.body_start)
+
+    parser = Parser(TokenStream(self.iter_tokens(*resume), self.line_index))
+    # An error with no token left after the resume point is reported at the
+    # last token before it, as a full parse would
+    parser.tokens.last = self.token_before(*resume)
+    semantic = self.semantic()
+    (parsed, rest) = ([], None)
+
+    try:
+      while parser.current_token() not in PROGRAM_END:
+        position = self.position(parser.tokens.peek())
+        if position[0] >= self.dirty_end:
+          rest = self.find_segment((position[0] - self.dirty_delta, position[1]), first)
+          if rest is not None:
+            break
+        parsed.append(self.parse_segment(parser, semantic, position))
+
+      if rest is None:
+        parser.parse_trailer()
+    except SyntacticError as e:
+      self.fail(parser, e)
+      return
+
+    # Splice the reparsed statements in and shift the untouched ones after them
+    tail = self.segments[rest:] if rest is not None else []
+    if self.dirty_delta:
+      for segment in tail:
+        segment.start_line += self.dirty_delta
+        segment.end_line += self.dirty_delta
+
+    self.segments[first:] = parsed + tail
+    self.clean()
+
+  def full_parse(self):
+    parser = Parser(TokenStream(self.iter_tokens(0, 0), self.line_index))
+    self.segments = []
+    self.header_diagnostics = []
+
+    try:
+      (_, _, self.declarations) = parser.parse_header()
+      semantic = self.semantic()
+
+      (line, col) = self.position(parser.tokens.last)
+      self.body_start = (line, col + len(parser.tokens.last.lexeme))
+      while parser.current_token() not in PROGRAM_END:
+        self.segments.append(self.parse_segment(parser, semantic, self.position(parser.tokens.peek())))
+
+      parser.parse_trailer()
+    except SyntacticError as e:
+      self.parsed = False
+      self.fail(parser, e)
+      return
+
+    self.parsed = True
+    self.clean()
+
+  def parse_segment(self, parser: Parser, semantic: SemanticAnalyzer, position: Tuple[int, int]) -> Segment:
+    node = parser.statement()
+    end_line = self.position(parser.tokens.last)[0]
+    undeclared = list(semantic.undeclared_variables([node]))
+    return Segment(position[0], position[1], end_line, node, self.line_index.starts[position[0]], undeclared)
+
+  def semantic(self) -> SemanticAnalyzer:
+    # Symbol table from the var block; double declarations are reported once per parse
+    semantic = SemanticAnalyzer(None, self.line_index)
+    self.header_diagnostics = []
+    for var in self.declarations:
+      if semantic.is_variable_declared(var.name):
+        message = str(double_declaration_error(var.name, self.line_index.code_index(var.offset)))
+        self.header_diagnostics.append(Diagnostic(SEMANTIC, message, var.offset))
+      else:
+        semantic.declared_vars[var.name] = var
+    return semantic
+
+  def find_segment(self, position: Tuple[int, int], first: int) -> Optional[int]:
+    # Index of the untouched statement starting exactly at `position` (old coordinates)
+    index = bisect_left(self.segments, position, lo=first, key=Segment.position)
+    if index < len(self.segments) and self.segments[index].position() == position:
+      return index
+    return None
+
+  def fail(self, parser: Parser, error: SyntacticError):
+    token = parser.tokens.peek() or parser.tokens.last
+    self.syntax_error = Diagnostic(SYNTACTIC, str(error), token.offset if token is not None else -1)
+
+  def clean(self):
+    self.syntax_error = None
+    (self.dirty, self.dirty_start, self.dirty_end, self.dirty_delta) = (False, 0, 0, 0)
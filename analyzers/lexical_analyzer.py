@@ -1,62 +1,233 @@
-import json
 import os
-from typing import Callable, List, NamedTuple, Optional
+import re
+import sys
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
 
-from utils.file_helper import read_lines_from_file
+from analyzers.diagnostics import LEXICAL, CompilerError, DiagnosticCollector
+from utils.file_helper import iter_lines_from_file
 from utils.token_enum import TokenEnum
+from utils.tokens import LineIndex, Token
 
 OUTPUT_PATH_BASE = 'output/lexic_analyzer'
 
-class LexicalError(Exception):
-  pass
+KEYWORDS = {
+  'até': TokenEnum.ATE,
+  'e': TokenEnum.E,
+  'então': TokenEnum.ENTAO,
+  'escreva': TokenEnum.ESCREVA,
+  'fim_para': TokenEnum.FIMPARA,
+  'fim_se': TokenEnum.FIMSE,
+  'leia': TokenEnum.LEIA,
+  'não': TokenEnum.NAO,
+  'ou': TokenEnum.OU,
+  'para': TokenEnum.PARA,
+  'passo': TokenEnum.PASSO,
+  'se': TokenEnum.SE,
+  'senão': TokenEnum.SENAO,
+  'inteiro': TokenEnum.TIPO,
+  # Additional Tokens (not in documentation)
+  'algoritmo': TokenEnum.ALGORITMO,
+  'var': TokenEnum.VAR,
+  'inicio': TokenEnum.INICIO,
+  'fimalgoritmo': TokenEnum.FIMALGORITMO,
+}
+
+class LexicalError(CompilerError):
+  kind = LEXICAL
 
 class TokenMatch(NamedTuple):
   start: int
   end: int
   replacement: str
 
-def compile(fileName: str) -> List[str]:
-  print('(Lexer started)')
+def compile(fileName: str, engine: str = 'matcher') -> List[Dict[str, str]]:
+  line_index = LineIndex()
+  tokens = stream(fileName, engine, artifact_writers(fileName, line_index), line_index)
+  return [token.to_dict(line_index) for token in tokens]
 
-  os.makedirs(OUTPUT_PATH_BASE, exist_ok=True)
-  lines = read_lines_from_file(fileName)
+def stream(fileName: str, engine: str = 'matcher', consumers: Optional[List['LineConsumer']] = None, lineIndex: Optional[LineIndex] = None) -> Iterator[Token]:
+  return stream_lines(iter_lines_from_file(fileName), engine, consumers, lineIndex)
+
+def stream_lines(lines: Iterable[str], engine: str = 'matcher', consumers: Optional[List['LineConsumer']] = None, lineIndex: Optional[LineIndex] = None, verbose: bool = True, diagnostics: Optional[DiagnosticCollector] = None) -> Iterator[Token]:
+  # With `diagnostics`, errors are collected and the faulty text skipped instead of raised
+  if verbose:
+    print('(Lexer started)')
 
-  lexeme_pairs = []
+  if engine not in SCANNERS:
+    raise ValueError(f'Unknown lexer engine "{engine}"')
+  scan = SCANNERS[engine]
+  consumers = consumers or []
+  line_index = lineIndex if lineIndex is not None else LineIndex()
+  line_start = 0
 
-  tokens_file_name = f'{fileName}_lexic-replaced.tem'
-  with open(f'{OUTPUT_PATH_BASE}/{tokens_file_name}', 'w', encoding='utf-8') as tokens_file:
-    # Scan and write each line
+  try:
+    # Scan each line and hand it to the consumers
     for i, line in enumerate(lines):
-      print(f'Scanning line [{i+1}]...\t{line.strip()}')
-      (new_line, token_lexem) = scan_line(line, i+1)
-      tokens_file.write(new_line + '\n')
-      lexeme_pairs.extend(token_lexem)
-
-  pairs_file_name = f'{fileName}_lexic-lexems.tem'
-  with open(f'{OUTPUT_PATH_BASE}/{pairs_file_name}', 'w', encoding='utf-8') as lexeme_file:
-    json.dump(lexeme_pairs, lexeme_file, ensure_ascii=False, indent=2)
-    
-  print(f'Output written to {OUTPUT_PATH_BASE}')
-  print('(Lexer ended)')
-  return lexeme_pairs
-
-def scan_line(line: str, lineNumber: int) -> tuple[str, List[str]]:
-  token_matchers: List[Callable[[str, int], Optional[TokenMatch]]] = [
-    match_token_string,
-    match_token_keywords,
-    match_token_atr,
-    match_token_logoperators,
-    match_token_mathoperators,
-    match_token_parentheses,
-    match_token_constnumbers,
-    match_token_separators,
-    match_token_identifier,
-    # ...
-  ]
+      if verbose:
+        text = line if isinstance(line, str) else line.decode('utf-8')
+        print(f'Scanning line [{i+1}]...\t{text.strip()}')
+      line_index.add_line(line_start)
+      if diagnostics is None:
+        (new_line, tokens) = scan(line, i+1, line_start)
+      else:
+        (new_line, tokens) = scan_recovering(scan, line, i+1, line_start, diagnostics)
+      for consumer in consumers:
+        consumer.write_line(new_line, tokens)
+      yield from tokens
+      line_start += text_length(line)
+  finally:
+    for consumer in consumers:
+      consumer.close()
+
+  if verbose:
+    if consumers:
+      print(f'Output written to {OUTPUT_PATH_BASE}')
+    print('(Lexer ended)')
+
+def scan_recovering(scan: Callable, line: str, lineNumber: int, lineStart: int, diagnostics: DiagnosticCollector) -> tuple[str, List[Token]]:
+  # Reports each error, blanks the faulty text out (offsets stay put) and scans again
+  if isinstance(line, bytes):
+    line = line.decode('utf-8') # From the 'bytes' engine, which also scans text
+  while True:
+    try:
+      return scan(line, lineNumber, lineStart)
+    except LexicalError as e:
+      (start, end) = error_span(line, e)
+      diagnostics.add(LEXICAL, e, lineStart + start)
+      blanked = line[:start] + ' ' * (end - start) + line[end:]
+      if blanked == line:
+        return ('', [])
+      line = blanked
+
+def error_span(line: str, error: LexicalError) -> tuple[int, int]:
+  column = int(error.code_index.rpartition(':')[2])
+  if str(error).startswith('Unterminated string'):
+    return (column, len(line)) # The column is the quote's index here
+
+  # A rejected word (e.g. "12abc", "fim_se_x") goes as a whole
+  i = column - 1
+  if not is_word_char(line[i]):
+    return (i, i + 1)
+  (start, end) = (i, i + 1)
+  while start > 0 and is_word_char(line[start - 1]):
+    start -= 1
+  while end < len(line) and is_word_char(line[end]):
+    end += 1
+  return (start, end)
+
+def is_word_char(char: str) -> bool:
+  return char.isalnum() or char == '_'
+
+# ------------------------
+# Artifact writers
+# ------------------------
+class LineConsumer:
+  def write_line(self, new_line: str, tokens: List[Token]):
+    pass
+
+  def close(self):
+    pass
+
+class ReplacedLinesWriter(LineConsumer):
+  def __init__(self, path: str):
+    self.file = open(path, 'w', encoding='utf-8')
+
+  def write_line(self, new_line: str, tokens: List[Token]):
+    self.file.write(new_line + '\n')
+
+  def close(self):
+    self.file.close()
+
+# What json.dumps(..., ensure_ascii=False) escapes in a string
+JSON_ESCAPE_PATTERN = re.compile(r'[\x00-\x1f"\\]')
+JSON_ESCAPES = {'"': '\\"', '\\': '\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t', '\b': '\\b', '\f': '\\f'}
+
+def json_string(text: str) -> str:
+  # Same text as json.dumps(text, ensure_ascii=False), without importing json
+  if JSON_ESCAPE_PATTERN.search(text) is None:
+    return f'"{text}"'
+  return '"' + JSON_ESCAPE_PATTERN.sub(lambda match: JSON_ESCAPES.get(match.group(), f'\\u{ord(match.group()):04x}'), text) + '"'
+
+class LexemeJsonWriter(LineConsumer):
+  # Writes the same document as json.dump(pairs, ensure_ascii=False, indent=2)
+  # one pair at a time
+  def __init__(self, path: str, lineIndex: LineIndex):
+    self.file = open(path, 'w', encoding='utf-8')
+    self.line_index = lineIndex
+    self.count = 0
+
+  def write_line(self, new_line: str, tokens: List[Token]):
+    code_index = self.line_index.code_index
+    for token in tokens:
+      self.file.write(',\n  {\n' if self.count else '[\n  {\n')
+      self.file.write(f'    "token": "{token.name}",\n    "lexeme": {json_string(token.lexeme)},\n    "code_index": "{code_index(token.offset)}"\n  }}')
+      self.count += 1
+
+  def close(self):
+    self.file.write('\n]' if self.count else '[]')
+    self.file.close()
+
+class ArtifactCollector(LineConsumer):
+  # Keeps the replaced lines and tokens in memory instead of writing files
+  def __init__(self):
+    self.lines: List[str] = []
+    self.tokens: List[Token] = []
+
+  def write_line(self, new_line: str, tokens: List[Token]):
+    self.lines.append(new_line)
+    self.tokens.extend(tokens)
+
+class TokenFileWriter(LineConsumer):
+  # Writes the tokens and line index in the binary format of utils/token_file.py
+  def __init__(self, path: str, lineIndex: LineIndex):
+    self.path = path
+    self.line_index = lineIndex
+    self.tokens: List[Token] = []
+
+  def write_line(self, new_line: str, tokens: List[Token]):
+    self.tokens.extend(tokens)
+
+  def close(self):
+    import utils.token_file as token_file # Only loaded when asked for
+    token_file.write(self.path, self.tokens, self.line_index)
+
+def artifact_writers(fileName: str, lineIndex: LineIndex, tokenFormat: str = 'json') -> List[LineConsumer]:
+  # tokenFormat 'binary' writes "_lexic-tokens.tok" instead of the "_lexic-lexems.tem" JSON
+  os.makedirs(OUTPUT_PATH_BASE, exist_ok=True)
+
+  if tokenFormat == 'binary':
+    tokens_writer = TokenFileWriter(f'{OUTPUT_PATH_BASE}/{fileName}_lexic-tokens.tok', lineIndex)
+  else:
+    tokens_writer = LexemeJsonWriter(f'{OUTPUT_PATH_BASE}/{fileName}_lexic-lexems.tem', lineIndex)
+
+  return [ReplacedLinesWriter(f'{OUTPUT_PATH_BASE}/{fileName}_lexic-replaced.tem'), tokens_writer]
+
+def replay_lines(tokens: List[Token], lineIndex: LineIndex, consumers: List[LineConsumer]):
+  # Feed already lexed tokens to the consumers, line by line, as stream_lines would
+  try:
+    starts = lineIndex.starts
+    position = 0
+
+    for i in range(len(starts)):
+      line_end = starts[i + 1] if i + 1 < len(starts) else None
+      line_tokens = []
+      while position < len(tokens) and (line_end is None or tokens[position].offset < line_end):
+        line_tokens.append(tokens[position])
+        position += 1
+
+      new_line = ' '.join(token.name for token in line_tokens)
+      for consumer in consumers:
+        consumer.write_line(new_line, line_tokens)
+  finally:
+    for consumer in consumers:
+      consumer.close()
+
+def scan_line(line: str, lineNumber: int, lineStart: int = 0) -> tuple[str, List[Token]]:
+  token_matchers = TOKEN_MATCHERS
 
   i = 0
   new_line_parts = []
-  token_lexem = []
+  tokens = []
 
   while i < len(line):
     # Skip spaces
@@ -75,12 +246,8 @@ def scan_line(line: str, lineNumber: int) -> tuple[str, List[str]]:
         new_line_parts.append(f' {match.replacement} ')
 
         # Token-lexeme
-        lexeme = line[match.start:match.end]
-        token_lexem.append({
-          "token": match.replacement,
-          "lexeme": lexeme,
-          "code_index": f'{lineNumber}:{match.start + 1}'
-        })
+        lexeme = intern_lexeme(line[match.start:match.end], match.replacement)
+        tokens.append(Token(TokenEnum[match.replacement].kind, lexeme, lineStart + match.start))
 
         i = match.end
         match_found = True
@@ -88,11 +255,17 @@ def scan_line(line: str, lineNumber: int) -> tuple[str, List[str]]:
 
     if not match_found:
       # Unknown char
-      raise LexicalError(f'Unknown char "{line[i]}" at line {lineNumber}:{i+1}')
+      raise LexicalError(f'Unknown char "{line[i]}" at line {lineNumber}:{i+1}', f'{lineNumber}:{i+1}')
 
   # Collapse multiple spaces into single space and trim the line
   new_line = ' '.join(''.join(new_line_parts).split())
-  return (new_line, token_lexem)
+  return (new_line, tokens)
+
+def intern_lexeme(lexeme: str, tokenName: str) -> str:
+  # Keywords, identifiers and operators repeat a lot: share one str per spelling
+  if tokenName == TokenEnum.STRING.name:
+    return lexeme
+  return sys.intern(lexeme)
 
 # ------------------------
 # Token Matchers
@@ -109,7 +282,7 @@ def match_token_string(line: str, startIndex: int, lineNumber: int) -> Optional[
 
   # Couldnt find string end
   if i >= len(line):
-    raise LexicalError(f'Unterminated string starting at line {lineNumber}:{startIndex}')
+    raise LexicalError(f'Unterminated string starting at line {lineNumber}:{startIndex}', f'{lineNumber}:{startIndex}')
 
   end_index = i + 1
   return TokenMatch(start=startIndex, end=end_index, replacement=TokenEnum.STRING.name)
@@ -120,29 +293,7 @@ def match_token_keywords(line: str, startIndex: int, lineNumber: int) -> Optiona
     next_valid = end >= len(line) or not line[end].isalnum()
     return prev_valid and next_valid
 
-  keywords = {
-    'até': TokenEnum.ATE,
-    'e': TokenEnum.E,
-    'então': TokenEnum.ENTAO,
-    'escreva': TokenEnum.ESCREVA,
-    'fim_para': TokenEnum.FIMPARA,
-    'fim_se': TokenEnum.FIMSE,
-    'leia': TokenEnum.LEIA,
-    'não': TokenEnum.NAO,
-    'ou': TokenEnum.OU,
-    'para': TokenEnum.PARA,
-    'passo': TokenEnum.PASSO,
-    'se': TokenEnum.SE,
-    'senão': TokenEnum.SENAO,
-    'inteiro': TokenEnum.TIPO,
-    # Additional Tokens (not in documentation)
-    'algoritmo': TokenEnum.ALGORITMO,
-    'var': TokenEnum.VAR,
-    'inicio': TokenEnum.INICIO,
-    'fimalgoritmo': TokenEnum.FIMALGORITMO,
-  }
-
-  for keyword, token in keywords.items():
+  for keyword, token in KEYWORDS.items():
     length = len(keyword)
     if line[startIndex:startIndex + length].lower() == keyword:
       if is_valid_boundary(startIndex, startIndex + length):
@@ -248,3 +399,219 @@ def match_token_identifier(line: str, startIndex: int, lineNumber: int) -> Optio
     return TokenMatch(start=startIndex, end=i, replacement=TokenEnum.ID.name)
 
   return None  # Not a valid standalone identifier
+
+TOKEN_MATCHERS: List[Callable[[str, int, int], Optional[TokenMatch]]] = [
+  match_token_string,
+  match_token_keywords,
+  match_token_atr,
+  match_token_logoperators,
+  match_token_mathoperators,
+  match_token_parentheses,
+  match_token_constnumbers,
+  match_token_separators,
+  match_token_identifier,
+  # ...
+]
+
+# ------------------------
+# Table-driven engine
+# ------------------------
+# One precompiled pattern classifies every position: whitespace, a word
+# (keyword/number/identifier), an operator/separator or a string.
+# \s and \w follow str.isspace() and str.isalnum() (plus "_"), so the word
+# run is exactly what the matcher chain would consume.
+TABLE_PATTERN = re.compile(r'(\s+)|(\w+)|(<-|<>|<=|>=|[=<>+\-*/(),:])|("(?s:.*?)(?<!\\)")')
+
+TABLE_OPERATORS = {
+  '<-': TokenEnum.ATR,
+  '<>': TokenEnum.LOGDIFF,
+  '<=': TokenEnum.LOGMENORIGUAL,
+  '>=': TokenEnum.LOGMAIORIGUAL,
+  '=': TokenEnum.LOGIGUAL,
+  '<': TokenEnum.LOGMENOR,
+  '>': TokenEnum.LOGMAIOR,
+  '+': TokenEnum.OPMAIS,
+  '-': TokenEnum.OPMENOS,
+  '*': TokenEnum.OPMULTI,
+  '/': TokenEnum.OPDIVI,
+  '(': TokenEnum.PARAB,
+  ')': TokenEnum.PARFE,
+  ':': TokenEnum.COLON,
+  ',': TokenEnum.COMMA,
+}
+
+def scan_line_table(line: str, lineNumber: int, lineStart: int = 0) -> tuple[str, List[Token]]:
+  match_at = TABLE_PATTERN.match
+  intern = sys.intern
+  replacements = []
+  tokens = []
+
+  i = 0
+  line_length = len(line)
+
+  while i < line_length:
+    match = match_at(line, i)
+    if match is None:
+      if line[i] == '"':
+        raise LexicalError(f'Unterminated string starting at line {lineNumber}:{i}', f'{lineNumber}:{i}')
+      raise LexicalError(f'Unknown char "{line[i]}" at line {lineNumber}:{i+1}', f'{lineNumber}:{i+1}')
+
+    group = match.lastindex
+    end = match.end()
+
+    # Skip spaces
+    if group == 1:
+      i = end
+      continue
+
+    if group == 2:
+      token = match_table_word(match.group())
+      if token is None:
+        # Unknown char
+        i += table_word_error_index(match.group())
+        raise LexicalError(f'Unknown char "{line[i]}" at line {lineNumber}:{i+1}', f'{lineNumber}:{i+1}')
+      lexeme = intern(line[i:end])
+    elif group == 3:
+      token = TABLE_OPERATORS[match.group()]
+      lexeme = intern(line[i:end])
+    else:
+      token = TokenEnum.STRING
+      lexeme = line[i:end]
+
+    replacements.append(token.name)
+    tokens.append(Token(token.kind, lexeme, lineStart + i))
+    i = end
+
+  return (' '.join(replacements), tokens)
+
+def match_table_word(word: str) -> Optional[TokenEnum]:
+  first = word[0]
+
+  if first.isdigit():
+    return TokenEnum.NUMINT if word.isdigit() else None
+
+  if not (first.isalpha() or first == '_'):
+    return None  # Not a match
+
+  keyword = KEYWORDS.get(word.lower())
+  if keyword is not None:
+    return keyword
+
+  # A keyword cut at an underscore (e.g. "fim_se_x") leaves "_x" glued to it,
+  # which the matcher chain rejects
+  if table_keyword_prefix(word):
+    return None
+
+  return TokenEnum.ID
+
+def table_keyword_prefix(word: str) -> int:
+  i = word.find('_', 1)
+  while i != -1:
+    if word[:i].lower() in KEYWORDS:
+      return i
+    i = word.find('_', i + 1)
+
+  return 0
+
+def table_word_error_index(word: str) -> int:
+  # Offset of the char the matcher chain would report for a rejected word
+  if word[0].isdigit():
+    i = 1
+    while word[i].isdigit():
+      i += 1
+    return i if word[i] == '_' else 0
+
+  return table_keyword_prefix(word)
+
+# ------------------------
+# Bytes engine
+# ------------------------
+# The table engine over raw UTF-8 lines (see file_helper.iter_buffer_lines).
+# Multibyte chars only occur inside words and strings, so the char offset of a
+# token is its byte offset minus the extra bytes of the words and strings
+# before it. Whitespace is what str.isspace() accepts in ASCII; anything the
+# byte pattern can't decide (e.g. a non-breaking space) sends the line to
+# scan_line_table.
+BYTES_PATTERN = re.compile(rb'([ \t\n\r\x0b\x0c\x1c-\x1f]+)|((?:\w|[\x80-\xff])+)|(<-|<>|<=|>=|[=<>+\-*/(),:])|("(?s:.*?)(?<!\\)")')
+WORD_PATTERN = re.compile(r'\w+')
+
+BYTES_OPERATORS = {operator.encode(): (token.kind, token.name, sys.intern(operator)) for operator, token in TABLE_OPERATORS.items()}
+
+# Word -> (kind, token name, interned lexeme, extra bytes), so repeated words
+# are neither decoded nor classified again; kind is None for words only the
+# text engine can report. Cleared when it grows past the limit.
+BYTES_WORDS: Dict[bytes, tuple[Optional[int], str, str, int]] = {}
+BYTES_WORDS_LIMIT = 1 << 16
+
+def scan_line_bytes(line, lineNumber: int, lineStart: int = 0) -> tuple[str, List[Token]]:
+  if isinstance(line, str):
+    return scan_line_table(line, lineNumber, lineStart)
+
+  match_at = BYTES_PATTERN.match
+  words = BYTES_WORDS
+  replacements = []
+  tokens = []
+
+  i = 0
+  shift = 0 # Bytes - chars so far
+  line_length = len(line)
+
+  while i < line_length:
+    match = match_at(line, i)
+    if match is None:
+      # Unknown char or unterminated string: same errors as the text engine
+      return scan_line_table(line.decode('utf-8'), lineNumber, lineStart)
+
+    group = match.lastindex
+    end = match.end()
+
+    # Skip spaces
+    if group == 1:
+      i = end
+      continue
+
+    if group == 2:
+      word = match.group()
+      entry = words.get(word)
+      if entry is None:
+        entry = words[word] = classify_word_bytes(word)
+        if len(words) >= BYTES_WORDS_LIMIT:
+          words.clear()
+      (kind, name, lexeme, extra) = entry
+      if kind is None:
+        return scan_line_table(line.decode('utf-8'), lineNumber, lineStart)
+    elif group == 3:
+      (kind, name, lexeme) = BYTES_OPERATORS[match.group()]
+      extra = 0
+    else:
+      (kind, name) = (TokenEnum.STRING.kind, TokenEnum.STRING.name)
+      lexeme = match.group().decode('utf-8')
+      extra = end - i - len(lexeme)
+
+    replacements.append(name)
+    tokens.append(Token(kind, lexeme, lineStart + i - shift))
+    shift += extra
+    i = end
+
+  return (' '.join(replacements), tokens)
+
+def classify_word_bytes(word: bytes) -> tuple[Optional[int], str, str, int]:
+  lexeme = sys.intern(word.decode('utf-8'))
+  token = match_table_word(lexeme) if word.isascii() or WORD_PATTERN.fullmatch(lexeme) else None
+  if token is None:
+    return (None, '', lexeme, 0)
+  return (token.kind, token.name, lexeme, len(word) - len(lexeme))
+
+def text_length(line) -> int:
+  # Chars in a text line or in a UTF-8 line from the bytes engine
+  if isinstance(line, str) or line.isascii():
+    return len(line)
+  return len(line.translate(None, UTF8_CONTINUATION_BYTES))
+
+UTF8_CONTINUATION_BYTES = bytes(range(0x80, 0xc0))
+
+SCANNERS = {
+  'matcher': scan_line,
+  'table': scan_line_table,
+  'bytes': scan_line_bytes,
+}
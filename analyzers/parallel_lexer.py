@@ -0,0 +1,125 @@
+import sys
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterator, List, NamedTuple, Optional
+
+from analyzers.lexical_analyzer import SCANNERS, LexicalError, LineConsumer, stream_lines, text_length
+from utils.file_helper import iter_buffer_lines, iter_lines_from_bytes
+from utils.tokens import LineIndex, Token
+
+# Lines never share lexer state, so a large source is cut at line boundaries
+# and the chunks are lexed in a process pool. The token streams come back in
+# the packed form of the compile cache and are merged in source order.
+DEFAULT_CHUNK_BYTES = 4 * 1024 * 1024
+PARALLEL_MIN_BYTES = 2 * DEFAULT_CHUNK_BYTES # Smaller sources aren't worth the pool
+
+class LexedChunk(NamedTuple):
+  kinds: bytes
+  lexeme_table: List[str]
+  lexemes: bytes # array('I') of indexes into lexeme_table
+  offsets: bytes # array('q') of char offsets from the chunk start
+  line_starts: bytes # array('q'), from the chunk start
+  line_tokens: bytes # array('I'), tokens per line
+  new_lines: Optional[List[str]] # Only when there are consumers to feed
+  length: int # In chars
+  error: Optional[tuple[str, str]] # (message, code_index) of the line where lexing stopped
+
+def split_chunks(buffer, chunkBytes: int) -> Iterator[tuple[bytes, int]]:
+  # Each chunk with its first line number; every chunk but the last ends with "\n"
+  (start, line_number, size) = (0, 1, len(buffer))
+  while start < size:
+    end = buffer.find(b'\n', min(start + chunkBytes, size) - 1) + 1 or size
+    chunk = buffer[start:end]
+    yield (chunk, line_number)
+    line_number += chunk.count(b'\n')
+    start = end
+
+def lex_chunk(chunk: bytes, firstLine: int, engine: str, withLines: bool) -> LexedChunk:
+  scan = SCANNERS[engine]
+  lines = iter_buffer_lines(chunk) if engine == 'bytes' else iter_lines_from_bytes(chunk)
+
+  lexeme_ids = {}
+  (kinds, lexemes, offsets) = (bytearray(), array('I'), array('q'))
+  (line_starts, line_tokens) = (array('q'), array('I'))
+  new_lines = [] if withLines else None
+  (line_start, error) = (0, None)
+
+  for i, line in enumerate(lines):
+    try:
+      (new_line, tokens) = scan(line, firstLine + i, line_start)
+    except LexicalError as e:
+      error = (str(e), e.code_index)
+      break
+
+    line_starts.append(line_start)
+    line_tokens.append(len(tokens))
+    if withLines:
+      new_lines.append(new_line)
+    for token in tokens:
+      kinds.append(token.kind)
+      lexemes.append(lexeme_ids.setdefault(token.lexeme, len(lexeme_ids)))
+      offsets.append(token.offset)
+    line_start += text_length(line)
+
+  return LexedChunk(
+    bytes(kinds), list(lexeme_ids), lexemes.tobytes(), offsets.tobytes(),
+    line_starts.tobytes(), line_tokens.tobytes(), new_lines, line_start, error,
+  )
+
+def stream_parallel(buffer, engine: str = 'bytes', consumers: Optional[List[LineConsumer]] = None, lineIndex: Optional[LineIndex] = None, workers: int = 2, chunkBytes: int = DEFAULT_CHUNK_BYTES) -> Iterator[Token]:
+  # Same tokens, line index and consumer calls as stream_lines over the whole
+  # source, and the same first lexical error at the same point in the stream
+  if engine not in SCANNERS:
+    raise ValueError(f'Unknown lexer engine "{engine}"')
+  if buffer.find(b'\r') != -1:
+    # "\r" alone also ends a line, so "\n" is not a safe cut
+    yield from stream_lines(iter_lines_from_bytes(buffer), engine, consumers, lineIndex, verbose=False)
+    return
+
+  consumers = consumers or []
+  line_index = lineIndex if lineIndex is not None else LineIndex()
+  chunks = split_chunks(buffer, chunkBytes)
+  pending: Deque[Future] = deque()
+  base = 0 # Char offset of the current chunk
+
+  executor = ProcessPoolExecutor(max_workers=workers)
+  try:
+    while True:
+      # Keep a few chunks in flight, so memory stays bounded on huge sources
+      for (chunk, first_line) in chunks:
+        pending.append(executor.submit(lex_chunk, chunk, first_line, engine, bool(consumers)))
+        if len(pending) >= workers * 2:
+          break
+      if not pending:
+        break
+
+      lexed = pending.popleft().result()
+      yield from merge_chunk(lexed, base, line_index, consumers)
+      if lexed.error is not None:
+        (message, code_index) = lexed.error
+        raise LexicalError(message, code_index)
+      base += lexed.length
+  finally:
+    executor.shutdown(wait=False, cancel_futures=True)
+    for consumer in consumers:
+      consumer.close()
+
+def merge_chunk(lexed: LexedChunk, base: int, lineIndex: LineIndex, consumers: List[LineConsumer]) -> Iterator[Token]:
+  intern = sys.intern
+  lexeme_table = [intern(lexeme) for lexeme in lexed.lexeme_table]
+  (lexemes, offsets) = (array('I', lexed.lexemes), array('q', lexed.offsets))
+  (line_starts, line_tokens) = (array('q', lexed.line_starts), array('I', lexed.line_tokens))
+
+  first = 0
+  for i, count in enumerate(line_tokens):
+    lineIndex.add_line(base + line_starts[i])
+    last = first + count
+    tokens = [Token(lexed.kinds[j], lexeme_table[lexemes[j]], base + offsets[j]) for j in range(first, last)]
+    for consumer in consumers:
+      consumer.write_line(lexed.new_lines[i], tokens)
+    yield from tokens
+    first = last
+
+  if lexed.error is not None:
+    lineIndex.add_line(base + lexed.length) # The line that failed
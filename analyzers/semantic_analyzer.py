@@ -1,84 +1,81 @@
-from typing import Dict, List
+from typing import Dict, Iterator, List
 
-from utils.token_enum import TokenEnum
+from analyzers.ast_nodes import Assign, BinaryOp, Escreva, Leia, Node, Para, Program, Se, UnaryOp, Var
+from analyzers.diagnostics import SEMANTIC, CompilerError
+from utils.tokens import LineIndex
 
-class SemanticError(Exception):
-  pass
+class SemanticError(CompilerError):
+  kind = SEMANTIC
 
 class SemanticAnalyzer:
-  def __init__(self, lexemePairs: List[Dict[str, str]]):
-    self.lexeme_pairs = lexemePairs
-    self.declared_vars = []
-    self.pos = 0
-
-  def current_token(self) -> str:
-    if self.pos < len(self.lexeme_pairs):
-      return self.lexeme_pairs[self.pos]['token']
-    
-    return TokenEnum.END_OF_FILE.name
-  
-  def current_lexeme(self) -> str:
-    if self.pos < len(self.lexeme_pairs):
-      return self.lexeme_pairs[self.pos]['lexeme']
-    
-    return ' '
-  
-  def current_code_index(self) -> str:
-    if self.pos < len(self.lexeme_pairs):
-      return self.lexeme_pairs[self.pos]['code_index']
-    
-    return self.lexeme_pairs[-1].get('code_index', 'unknown')
-
-  def advance(self):
-    self.pos += 1
-
-  def check_token(self, expected: TokenEnum) -> bool:
-    return self.current_token() == expected.name
+  # Walks the parsed program once, in source order, against a hashed symbol table
+  def __init__(self, program: Program, lineIndex: LineIndex):
+    self.program = program
+    self.line_index = lineIndex
+    self.declared_vars: Dict[str, Var] = {}
 
   def validate(self):
     self.get_declared_variables()
-    self.validate_variable_usage()
+    self.validate_variable_usage(self.program.body)
 
   # ----------------
   # Validations
   # ----------------
   def get_declared_variables(self):
-    in_var_block = False
+    for var in self.double_declarations():
+      code_index = self.line_index.code_index(var.offset)
+      raise double_declaration_error(var.name, code_index)
 
-    while self.pos < len(self.lexeme_pairs):
-      # Identify the start of the var block
-      if self.check_token(TokenEnum.VAR):
-        in_var_block = True
-      elif self.check_token(TokenEnum.INICIO):
-        break
-      elif in_var_block and self.check_token(TokenEnum.ID):
-        lexeme = self.current_lexeme()
+  def validate_variable_usage(self, statements: List[Node]):
+    for var in self.undeclared_variables(statements):
+      code_index = self.line_index.code_index(var.offset)
+      raise undeclared_variable_error(var.name, code_index)
 
-        if self.is_variable_declared(lexeme):
-          code_index = self.current_code_index()
-          raise SemanticError(f'Double declaration for variable "{lexeme}" at line {code_index}')
-        
-        self.declared_vars.append(self.lexeme_pairs[self.pos])
+  def double_declarations(self) -> Iterator[Var]:
+    for var in self.program.declarations:
+      if self.is_variable_declared(var.name):
+        yield var
+      else:
+        self.declared_vars[var.name] = var
 
-      self.advance()
+  def undeclared_variables(self, statements: List[Node]) -> Iterator[Var]:
+    # Every identifier used in the statements, in source order, that was not declared
+    for statement in statements:
+      if isinstance(statement, Assign):
+        yield from self.undeclared_in_expression(statement.target)
+        yield from self.undeclared_in_expression(statement.value)
+      elif isinstance(statement, Escreva):
+        yield from self.undeclared_in_expression(statement.value)
+      elif isinstance(statement, Leia):
+        yield from self.undeclared_in_expression(statement.target)
+      elif isinstance(statement, Se):
+        yield from self.undeclared_in_expression(statement.condition)
+        yield from self.undeclared_variables(statement.then_body)
+        yield from self.undeclared_variables(statement.else_body)
+      elif isinstance(statement, Para):
+        yield from self.undeclared_in_expression(statement.var)
+        yield from self.undeclared_variables(statement.body)
 
-  def validate_variable_usage(self):
-    self.pos = 0
-    in_code_block = False
+  def undeclared_in_expression(self, expression: Node) -> Iterator[Var]:
+    # Explicit stack, left operand first, so deeply nested expressions don't hit the recursion limit
+    pending = [expression]
+    while pending:
+      node = pending.pop()
+      if isinstance(node, Var):
+        # Check declaration
+        if not self.is_variable_declared(node.name):
+          yield node
+      elif isinstance(node, BinaryOp):
+        pending.append(node.right)
+        pending.append(node.left)
+      elif isinstance(node, UnaryOp):
+        pending.append(node.operand)
 
-    while self.pos < len(self.lexeme_pairs):
-      # Identify the start of the code block
-      if self.check_token(TokenEnum.INICIO):
-        in_code_block = True
-      elif in_code_block and self.check_token(TokenEnum.ID):
-        lexeme = self.current_lexeme()
+  def is_variable_declared(self, name: str) -> bool:
+    return name in self.declared_vars
 
-        # Check declaration
-        if not self.is_variable_declared(lexeme):
-          code_index = self.current_code_index()
-          raise SemanticError(f'Undeclared variable "{lexeme}" used at line {code_index}.')
+def double_declaration_error(name: str, codeIndex: str) -> SemanticError:
+  return SemanticError(f'Double declaration for variable "{name}" at line {codeIndex}', codeIndex)
 
-      self.advance()
-  
-  def is_variable_declared(self, lexeme) -> bool:
-    return any(var['lexeme'] == lexeme for var in self.declared_vars)
+def undeclared_variable_error(name: str, codeIndex: str) -> SemanticError:
+  return SemanticError(f'Undeclared variable "{name}" used at line {codeIndex}.', codeIndex)
@@ -1,229 +1,478 @@
-from typing import Dict, List
+import unicodedata
+from typing import Callable, Dict, FrozenSet, List, Optional
 
+import analyzers.grammar as grammar
+from analyzers.ast_nodes import Assign, BinaryOp, Escreva, Leia, Node, Num, Para, Program, Se, Str, UnaryOp, Var
+from analyzers.diagnostics import SYNTACTIC, CompilerError, DiagnosticCollector
 from utils.token_enum import TokenEnum
+from utils.token_stream import TokenStream
+from utils.tokens import Token
 
-class SyntacticError(Exception):
-  pass
+class SyntacticError(CompilerError):
+  kind = SYNTACTIC
 
-class Parser:
-  def __init__(self, lexemePairs: List[Dict[str, str]]):
-    self.lexeme_pairs = lexemePairs
-    self.pos = 0
+# Token kinds that end each statement list, from the grammar tables
+PROGRAM_END = grammar.lookahead('program', 'statements') | {grammar.END_OF_FILE}
+THEN_END = grammar.lookahead('se', 'statements')
+ELSE_END = grammar.lookahead('else_part', 'statements')
+PARA_END = grammar.lookahead('para', 'statements')
+
+ARITHMETIC_OPERATORS = grammar.FIRST['arithmetic_operator']
+LOGIC_OPERATORS = grammar.FIRST['logic_operator']
+COMPARISON_OPERATORS = grammar.FIRST['comparison_operator']
+COMPARISON_PREFIXES = frozenset([TokenEnum.NAO.kind, TokenEnum.PARAB.kind])
+
+# Panic mode recovery: after an error, tokens are skipped up to one of these
+STATEMENT_KINDS = grammar.FIRST['statement'] - {TokenEnum.ID.kind}
+BLOCK_END_KINDS = grammar.FOLLOW['statements'] | {grammar.END_OF_FILE}
 
-  def current_token(self) -> str:
-    if self.pos < len(self.lexeme_pairs):
-      return self.lexeme_pairs[self.pos]['token']
+class Parser:
+  # Raises on the first error, unless given a DiagnosticCollector: then every
+  # error is collected, the parser resynchronizes on the next statement or
+  # block end, and parse() returns the statements it could build
+  def __init__(self, tokens: TokenStream, diagnostics: Optional[DiagnosticCollector] = None):
+    self.tokens = tokens
+    self.diagnostics = diagnostics
+    self.header_failed = False
+
+  def current_token(self) -> int:
+    token = self.tokens.peek()
+    if token is not None:
+      return token.kind
     
-    return TokenEnum.END_OF_FILE.name
+    return TokenEnum.END_OF_FILE.kind
   
   def current_lexeme(self) -> str:
-    if self.pos < len(self.lexeme_pairs):
-      return self.lexeme_pairs[self.pos]['lexeme']
+    token = self.tokens.peek()
+    if token is not None:
+      return token.lexeme
     
     return ' '
   
   def current_code_index(self) -> str:
-    if self.pos < len(self.lexeme_pairs):
-      return self.lexeme_pairs[self.pos]['code_index']
+    token = self.tokens.peek()
+    if token is not None:
+      return self.tokens.code_index(token)
 
-    return self.lexeme_pairs[-1].get('code_index', 'unknown')
+    return self.tokens.code_index(self.tokens.last)
 
-  def expect_token(self, expected: TokenEnum):
-    if self.current_token() == expected.name:
-      self.pos += 1
-      return
+  def expect_token(self, expected: TokenEnum) -> Token:
+    if self.current_token() == expected.kind:
+      return self.tokens.advance()
     
     lexeme = self.current_lexeme()
     code_index = self.current_code_index()
-    raise SyntacticError(f'Expected "{expected.value}", got "{lexeme}" at line {code_index}')
+    raise SyntacticError(f'Expected "{expected.value}", got "{lexeme}" at line {code_index}', code_index)
   
   def check_token(self, expected: TokenEnum) -> bool:
-    return self.current_token() == expected.name
+    return self.current_token() == expected.kind
   
-  def check_token_any(self, expected: List[TokenEnum]) -> bool:
-    return any(self.current_token() == t.name for t in expected)
+  def parse(self) -> Program:
+    if self.diagnostics is not None:
+      return self.parse_recovering()
 
-  def parse(self):
-    self.expect_token(TokenEnum.ALGORITMO)
-    self.expect_token(TokenEnum.STRING)
+    (start, name, declarations) = self.parse_header()
+
+    body = self.block(PROGRAM_END)
+
+    self.parse_trailer()
+    return Program(name, declarations, body, start.offset)
+
+  # ----------------
+  # Error recovery
+  # ----------------
+  def parse_recovering(self) -> Program:
+    start = self.tokens.peek()
+    try:
+      (_, name, declarations) = self.parse_header()
+    except SyntacticError as e:
+      # Skip to the body; without the var block, undeclared names mean nothing
+      self.report(e)
+      self.header_failed = True
+      (name, declarations) = (Str('""', 0), [])
+      while not (self.check_token(TokenEnum.INICIO) or self.at_sync_point()):
+        self.tokens.advance()
+      if self.check_token(TokenEnum.INICIO):
+        self.tokens.advance()
+
+    body = self.block(PROGRAM_END, topLevel=True)
+    try:
+      self.parse_trailer()
+    except SyntacticError as e:
+      self.report(e)
+    return Program(name, declarations, body, start.offset if start is not None else 0)
+
+  def block(self, terminators: FrozenSet[int], topLevel: bool = False) -> List[Node]:
+    # Statements up to one of `terminators`. When recovering, a block also
+    # stops at an enclosing block's end (the missing terminator is reported
+    # by the caller) and a failed statement is dropped after resyncing.
+    body = []
+    while self.current_token() not in terminators:
+      if self.diagnostics is None:
+        body.append(self.statement())
+        continue
+
+      if not topLevel and self.current_token() in BLOCK_END_KINDS:
+        break
+      try:
+        body.append(self.statement())
+      except SyntacticError as e:
+        self.report(e)
+        if self.synchronize() == 0 and self.current_token() in BLOCK_END_KINDS and self.current_token() not in terminators:
+          self.tokens.advance() # Stray block end at the top level
+
+    return body
+
+  def expect_closing(self, expected: TokenEnum):
+    # expect_token, except that a recovering parser reports a missing
+    # keyword and carries on as if it was there
+    if self.diagnostics is None or self.check_token(expected):
+      self.expect_token(expected)
+      return
 
+    try:
+      self.expect_token(expected)
+    except SyntacticError as e:
+      self.report(e)
+
+  def recover(self, parse: Callable[[], Node], until: TokenEnum) -> Node:
+    # Parses a construct's header part; on error skips to `until` (or the next statement)
+    if self.diagnostics is None:
+      return parse()
+
+    start = self.tokens.peek() or self.tokens.last
+    try:
+      return parse()
+    except SyntacticError as e:
+      self.report(e)
+      while not (self.check_token(until) or self.at_sync_point()):
+        self.tokens.advance()
+      return Num(0, start.offset if start is not None else 0) # Placeholder
+
+  def synchronize(self) -> int:
+    skipped = 0
+    while not self.at_sync_point():
+      self.tokens.advance()
+      skipped += 1
+    return skipped
+
+  def at_sync_point(self) -> bool:
+    kind = self.current_token()
+    if kind in STATEMENT_KINDS or kind in BLOCK_END_KINDS:
+      return True
+    # An assignment starts with "identifier <-"
+    following = self.tokens.peek(1)
+    return kind == TokenEnum.ID.kind and following is not None and following.kind == TokenEnum.ATR.kind
+
+  def report(self, error: SyntacticError):
+    token = self.tokens.peek() or self.tokens.last
+    self.diagnostics.add(SYNTACTIC, error, token.offset if token is not None else 0)
+
+  def parse_header(self) -> tuple[Token, Str, List[Var]]:
+    start = self.expect_token(TokenEnum.ALGORITMO)
+    name = self.expect_token(TokenEnum.STRING)
+
+    declarations = []
     if self.check_token(TokenEnum.VAR):
-      self.grammar_variable_block()
+      declarations = self.grammar_variable_block()
 
     self.expect_token(TokenEnum.INICIO)
+    return (start, Str(name.lexeme, name.offset), declarations)
 
-    while not self.check_token_any([TokenEnum.FIMALGORITMO, TokenEnum.END_OF_FILE]):
-      self.statement()
-
+  def parse_trailer(self):
     self.expect_token(TokenEnum.FIMALGORITMO)
 
-    if self.pos < len(self.lexeme_pairs):
+    if not self.tokens.at_end():
       extra_lexeme = self.current_lexeme()
       code_index = self.current_code_index()
-      raise SyntacticError(f'Unexpected code after "fimalgoritmo": "{extra_lexeme}" at line {code_index}')
+      raise SyntacticError(f'Unexpected code after "fimalgoritmo": "{extra_lexeme}" at line {code_index}', code_index)
 
-  def statement(self):
-    if self.check_token(TokenEnum.ID):
-      self.grammar_var_assignment()
-    elif self.check_token(TokenEnum.ESCREVA):
-      self.grammar_command_escreva()
-    elif self.check_token(TokenEnum.LEIA):
-      self.grammar_command_leia()
-    elif self.check_token(TokenEnum.SE):
-      self.grammar_command_se()
-    elif self.check_token(TokenEnum.PARA):
-      self.grammar_command_para()
-    else:
+  def statement(self) -> Node:
+    # The production is picked by one lookup in the LL(1) table
+    rule = STATEMENT_RULES.get(self.current_token())
+    if rule is None:
       lexeme = self.current_lexeme()
       code_index = self.current_code_index()
-      raise SyntacticError(f'Unexpected "{lexeme}" at line {code_index}')
+      raise SyntacticError(f'Unexpected "{lexeme}" at line {code_index}', code_index)
+
+    return rule(self)
 
   # ----------------
   # Grammars
   # ----------------
-  def grammar_variable_block(self):
+  def grammar_variable_block(self) -> List[Var]:
     self.expect_token(TokenEnum.VAR)
+    declarations = []
 
     while self.check_token(TokenEnum.ID):
-      self.expect_token(TokenEnum.ID)
+      declarations.append(self.grammar_identifier())
 
       # Optional IDs separated by commas
       while self.check_token(TokenEnum.COMMA):
         self.expect_token(TokenEnum.COMMA)
-        self.expect_token(TokenEnum.ID)
+        declarations.append(self.grammar_identifier())
 
       self.expect_token(TokenEnum.COLON)
       self.expect_token(TokenEnum.TIPO)
 
-  def grammar_var_assignment(self):
-    self.expect_token(TokenEnum.ID)
+    return declarations
+
+  def grammar_var_assignment(self) -> Assign:
+    target = self.grammar_identifier()
     self.expect_token(TokenEnum.ATR)
-    self.grammar_arithmetic_expression()
+    value = self.grammar_arithmetic_expression()
+    return Assign(target, value, target.offset)
 
-  def grammar_command_escreva(self):
-    self.expect_token(TokenEnum.ESCREVA)
+  def grammar_command_escreva(self) -> Escreva:
+    start = self.expect_token(TokenEnum.ESCREVA)
     self.expect_token(TokenEnum.PARAB)
 
     # Terms supported by escreva
-    if self.check_token(TokenEnum.ID):
-      self.expect_token(TokenEnum.ID)
-    elif self.check_token(TokenEnum.NUMINT):
-      self.expect_token(TokenEnum.NUMINT)
-    elif self.check_token(TokenEnum.STRING):
-      self.expect_token(TokenEnum.STRING)
-    else:
+    rule = VALUE_RULES.get(self.current_token())
+    if rule is None:
       lexeme = self.current_lexeme()
       code_index = self.current_code_index()
-      raise SyntacticError(f'Unexpected "{lexeme}" in escreva at line {code_index}')
+      raise SyntacticError(f'Unexpected "{lexeme}" in escreva at line {code_index}', code_index)
+    value = rule(self)
 
     self.expect_token(TokenEnum.PARFE)
+    return Escreva(value, start.offset)
 
-  def grammar_command_leia(self):
-    self.expect_token(TokenEnum.LEIA)
+  def grammar_command_leia(self) -> Leia:
+    start = self.expect_token(TokenEnum.LEIA)
     self.expect_token(TokenEnum.PARAB)
 
     # Terms supported by leia
     if self.check_token(TokenEnum.ID):
-      self.expect_token(TokenEnum.ID)
+      target = self.grammar_identifier()
     else:
       lexeme = self.current_lexeme()
       code_index = self.current_code_index()
-      raise SyntacticError(f'Unexpected "{lexeme}" in leia at line {code_index}')
+      raise SyntacticError(f'Unexpected "{lexeme}" in leia at line {code_index}', code_index)
 
     self.expect_token(TokenEnum.PARFE)
+    return Leia(target, start.offset)
   
-  def grammar_command_se(self):
-    self.expect_token(TokenEnum.SE)
-    self.grammar_logic_expression()
+  def grammar_command_se(self) -> Se:
+    start = self.expect_token(TokenEnum.SE)
+    condition = self.recover(self.grammar_logic_expression, TokenEnum.ENTAO)
 
-    self.expect_token(TokenEnum.ENTAO)
-    while not self.check_token_any([TokenEnum.SENAO, TokenEnum.FIMSE]):
-      self.statement()
+    self.expect_closing(TokenEnum.ENTAO)
+    then_body = self.block(THEN_END)
     
+    else_body = []
     if self.check_token(TokenEnum.SENAO):
       self.expect_token(TokenEnum.SENAO)
-      while not self.check_token(TokenEnum.FIMSE):
-        self.statement()
+      else_body = self.block(ELSE_END)
 
-    self.expect_token(TokenEnum.FIMSE)
+    self.expect_closing(TokenEnum.FIMSE)
+    return Se(condition, then_body, else_body, start.offset)
 
-  def grammar_command_para(self):
-    self.expect_token(TokenEnum.PARA)
-    self.expect_token(TokenEnum.ID)
+  def grammar_command_para(self) -> Para:
+    start = self.expect_token(TokenEnum.PARA)
+    header = self.recover(self.grammar_para_header, TokenEnum.FIMPARA)
+    (var, limit, step) = header if isinstance(header, tuple) else (Var('', header.offset), header, None)
+
+    body = self.block(PARA_END)
+
+    self.expect_closing(TokenEnum.FIMPARA)
+    return Para(var, limit, step, body, start.offset)
+
+  def grammar_para_header(self) -> tuple[Var, Num, Optional[Num]]:
+    var = self.grammar_identifier()
     self.expect_token(TokenEnum.ATE)
-    self.expect_token(TokenEnum.NUMINT)
+    limit = self.grammar_number()
 
     # Optional "passo"
+    step = None
     if self.check_token(TokenEnum.PASSO):
       self.expect_token(TokenEnum.PASSO)
-      self.expect_token(TokenEnum.NUMINT)
+      step = self.grammar_number()
 
-    while not self.check_token(TokenEnum.FIMPARA):
-      self.statement()
-
-    self.expect_token(TokenEnum.FIMPARA)
+    return (var, limit, step)
 
   #
   # Fundamental
   #
-  def grammar_arithmetic_expression(self):
-    self.grammar_arithmetic_term()
-    
-    while self.check_token_any([TokenEnum.OPMAIS, TokenEnum.OPMENOS, TokenEnum.OPMULTI, TokenEnum.OPDIVI]):
-      self.pos += 1
-      self.grammar_arithmetic_term()
-
-  def grammar_arithmetic_term(self):
-    if self.check_token(TokenEnum.ID):
-      self.expect_token(TokenEnum.ID)
-    elif self.check_token(TokenEnum.NUMINT):
-      self.expect_token(TokenEnum.NUMINT)
-    elif self.check_token(TokenEnum.PARAB):
-      self.expect_token(TokenEnum.PARAB)
-      self.grammar_arithmetic_expression()
-      self.expect_token(TokenEnum.PARFE)
-    else:
+  def grammar_identifier(self) -> Var:
+    token = self.expect_token(TokenEnum.ID)
+    return Var(token.lexeme, token.offset)
+
+  def grammar_number(self) -> Num:
+    token = self.expect_token(TokenEnum.NUMINT)
+    return Num(parse_number(token.lexeme), token.offset)
+
+  # Expressions are parsed with explicit stacks instead of one Python call per
+  # parenthesis or "não", so nesting depth is only bounded by memory. Each
+  # open parenthesis saves the enclosing level's operands and operators; its
+  # ")" folds the level by precedence and hands the result back as one operand.
+  def grammar_arithmetic_expression(self) -> Node:
+    enclosing: List[tuple[List[Node], List[Token]]] = []
+    (operands, operators) = ([], [])
+
+    while True:
+      # Term: any number of "(" then an identifier or a number
+      while self.check_token(TokenEnum.PARAB):
+        self.tokens.advance()
+        enclosing.append((operands, operators))
+        (operands, operators) = ([], [])
+
+      rule = TERM_RULES.get(self.current_token())
+      if rule is None:
+        code_index = self.current_code_index()
+        raise SyntacticError(f'Expected identifier or value in expression at line {code_index}', code_index)
+      operands.append(rule(self))
+
+      # Then an operator, or the end of as many levels as are closed here
+      while self.current_token() not in ARITHMETIC_OPERATORS:
+        expression = build_binary_tree(operands, operators, ARITHMETIC_PRECEDENCE)
+        if not enclosing:
+          return expression
+
+        self.expect_token(TokenEnum.PARFE)
+        (operands, operators) = enclosing.pop()
+        operands.append(expression)
+
+      operators.append(self.tokens.advance())
+
+  def grammar_logic_expression(self) -> Node:
+    # A level is (operands, operators, pending "não" tokens, and the
+    # comparison waiting for the level as its right operand, if any)
+    enclosing: List[tuple[List[Node], List[Token], List[Token], Optional[tuple[Node, Token]]]] = []
+    (operands, operators, negations, comparison) = ([], [], [], None)
+
+    while True:
+      # Comparison: any number of "não" and "(", then "operand op operand"
+      while self.current_token() in COMPARISON_PREFIXES:
+        if self.check_token(TokenEnum.NAO):
+          negations.append(self.tokens.advance())
+        else:
+          self.tokens.advance()
+          enclosing.append((operands, operators, negations, comparison))
+          (operands, operators, negations, comparison) = ([], [], [], None)
+
+      left = self.grammar_logic_operand()
+      if self.current_token() not in COMPARISON_OPERATORS:
+        code_index = self.current_code_index()
+        raise SyntacticError(f'Missing comparison operator in logical expression at line {code_index}', code_index)
+      operator = self.tokens.advance()
+
+      if self.check_token(TokenEnum.PARAB):
+        # Parenthesized right operand: a whole logic expression
+        self.tokens.advance()
+        enclosing.append((operands, operators, negations, comparison))
+        (operands, operators, negations, comparison) = ([], [], [], (left, operator))
+        continue
+
+      node = BinaryOp(operator.kind, left, self.grammar_logic_operand(), left.offset)
+
+      # Close the comparison, then every level that ends here
+      while True:
+        for negation in reversed(negations):
+          node = UnaryOp(negation.kind, node, negation.offset)
+        operands.append(node)
+
+        if self.current_token() in LOGIC_OPERATORS:
+          break
+
+        expression = build_binary_tree(operands, operators, LOGIC_PRECEDENCE)
+        if not enclosing:
+          return expression
+
+        self.expect_token(TokenEnum.PARFE)
+        right_of = comparison
+        (operands, operators, negations, comparison) = enclosing.pop()
+        if right_of is None:
+          node = expression
+        else:
+          (left, operator) = right_of
+          node = BinaryOp(operator.kind, left, expression, left.offset)
+
+      operators.append(self.tokens.advance())
+      negations = []
+
+  def grammar_logic_operand(self) -> Node:
+    # Left operands never start with "(" (that opens a nested expression), and
+    # a "(" right operand is handled by grammar_logic_expression
+    rule = VALUE_RULES.get(self.current_token())
+    if rule is None:
       code_index = self.current_code_index()
-      raise SyntacticError(f'Expected identifier or value in expression at line {code_index}')
-
-  def grammar_logic_expression(self):
-    self.grammar_logic_comparison()
-    while self.check_token_any([TokenEnum.E, TokenEnum.OU]):
-      self.pos += 1
-      self.grammar_logic_comparison()
-
-  def grammar_logic_comparison(self):
-    if self.check_token(TokenEnum.NAO):
-      self.expect_token(TokenEnum.NAO)
-      self.grammar_logic_comparison()
-    elif self.check_token(TokenEnum.PARAB):
-      self.expect_token(TokenEnum.PARAB)
-      self.grammar_logic_expression()
-      self.expect_token(TokenEnum.PARFE)
-    else:
-      self.grammar_logic_operand()
-      if self.check_token_any([
-        TokenEnum.LOGIGUAL, TokenEnum.LOGDIFF,
-        TokenEnum.LOGMENOR, TokenEnum.LOGMENORIGUAL,
-        TokenEnum.LOGMAIOR, TokenEnum.LOGMAIORIGUAL
-      ]):
-        self.pos += 1
-        self.grammar_logic_operand()
+      raise SyntacticError(f'Expected operand in logical expression at line {code_index}', code_index)
+
+    return rule(self)
+
+  def grammar_string(self) -> Str:
+    token = self.expect_token(TokenEnum.STRING)
+    return Str(token.lexeme, token.offset)
+
+def table_rules(nonterminal: str, handlers: Dict[str, Callable[[Parser], Node]]) -> Dict[int, Callable[[Parser], Node]]:
+  # Token kind -> parse method, from the LL(1) table row of `nonterminal`.
+  # `handlers` maps the first symbol of each alternative to its method;
+  # alternatives left out are parsed inline (e.g. "(" on the expression stacks).
+  alternatives = grammar.GRAMMAR[nonterminal]
+  rules = {}
+  for kind, index in grammar.TABLE[nonterminal].items():
+    if alternatives[index][0] in handlers:
+      rules[kind] = handlers[alternatives[index][0]]
+  return rules
+
+STATEMENT_RULES = table_rules('statement', {
+  'assignment': Parser.grammar_var_assignment,
+  'escreva': Parser.grammar_command_escreva,
+  'leia': Parser.grammar_command_leia,
+  'se': Parser.grammar_command_se,
+  'para': Parser.grammar_command_para,
+})
+
+TERM_RULES = table_rules('arithmetic_term', {
+  'ID': Parser.grammar_identifier,
+  'NUMINT': Parser.grammar_number,
+})
+
+# escreva(...) and comparison operands take the same values
+VALUE_RULES = table_rules('logic_operand', {
+  'ID': Parser.grammar_identifier,
+  'NUMINT': Parser.grammar_number,
+  'STRING': Parser.grammar_string,
+})
+
+# Binding strength of binary operators (higher binds tighter)
+ARITHMETIC_PRECEDENCE = {
+  TokenEnum.OPMAIS.kind: 1,
+  TokenEnum.OPMENOS.kind: 1,
+  TokenEnum.OPMULTI.kind: 2,
+  TokenEnum.OPDIVI.kind: 2,
+}
+
+LOGIC_PRECEDENCE = {
+  TokenEnum.OU.kind: 1,
+  TokenEnum.E.kind: 2,
+}
+
+def build_binary_tree(operands: List[Node], operators: List[Token], precedence: Dict[int, int]) -> Node:
+  # Folds "a op b op c ..." into left-associative nodes, tightest operators first
+  if not operators:
+    return operands[0]
+
+  for level in sorted(set(precedence.values()), reverse=True):
+    folded_operands = [operands[0]]
+    folded_operators = []
+
+    for operator, operand in zip(operators, operands[1:]):
+      if precedence[operator.kind] == level:
+        left = folded_operands.pop()
+        folded_operands.append(BinaryOp(operator.kind, left, operand, left.offset))
       else:
-        code_index = self.current_code_index()
-        raise SyntacticError(f'Missing comparison operator in logical expression at line {code_index}')
+        folded_operators.append(operator)
+        folded_operands.append(operand)
 
-  def grammar_logic_operand(self):
-    if self.check_token(TokenEnum.ID):
-      self.expect_token(TokenEnum.ID)
-    elif self.check_token(TokenEnum.NUMINT):
-      self.expect_token(TokenEnum.NUMINT)
-    elif self.check_token(TokenEnum.STRING):
-      self.expect_token(TokenEnum.STRING)
-    elif self.check_token(TokenEnum.PARAB):
-      self.expect_token(TokenEnum.PARAB)
-      self.grammar_logic_expression()
-      self.expect_token(TokenEnum.PARFE)
-    else:
-      code_index = self.current_code_index()
-      raise SyntacticError(f'Expected operand in logical expression at line {code_index}')
+    operands = folded_operands
+    operators = folded_operators
+
+  return operands[0]
+
+def parse_number(lexeme: str) -> int:
+  # The lexer accepts any Unicode digit (str.isdigit), int() only decimals
+  if lexeme.isdecimal():
+    return int(lexeme)
+  return int(''.join(str(unicodedata.digit(char)) for char in lexeme))
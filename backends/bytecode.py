@@ -0,0 +1,226 @@
+from array import array
+from typing import Dict, List, Optional
+
+from analyzers.ast_nodes import Assign, Escreva, Leia, Node, Num, Para, Program, Se, Str, UnaryOp, Var
+from utils.token_enum import TokenEnum
+from utils.tokens import LineIndex
+
+# ----------------
+# Opcodes
+# ----------------
+# Each instruction is its opcode followed by a fixed number of int operands
+LOAD_CONST = 0     # const_index
+LOAD_VAR = 1       # slot
+STORE_VAR = 2      # slot
+ADD = 3
+SUB = 4
+MUL = 5
+DIV = 6
+CMP_EQ = 7
+CMP_NE = 8
+CMP_LT = 9
+CMP_LE = 10
+CMP_GT = 11
+CMP_GE = 12
+NOT = 13
+JUMP = 14          # target
+JUMP_IF_FALSE = 15 # target (pops the condition)
+JUMP_IF_FALSE_OR_POP = 16 # target ("e": keeps a false left side as the result)
+JUMP_IF_TRUE_OR_POP = 17  # target ("ou": keeps a true left side as the result)
+PRINT = 18
+READ = 19          # slot
+FOR_TEST = 20      # slot, limit const_index, exit target
+FOR_STEP = 21      # slot, step const_index, test target
+HALT = 22
+
+OPCODE_NAMES = [
+  'LOAD_CONST', 'LOAD_VAR', 'STORE_VAR', 'ADD', 'SUB', 'MUL', 'DIV',
+  'CMP_EQ', 'CMP_NE', 'CMP_LT', 'CMP_LE', 'CMP_GT', 'CMP_GE', 'NOT',
+  'JUMP', 'JUMP_IF_FALSE', 'JUMP_IF_FALSE_OR_POP', 'JUMP_IF_TRUE_OR_POP',
+  'PRINT', 'READ', 'FOR_TEST', 'FOR_STEP', 'HALT',
+]
+
+OPERAND_COUNTS = [1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 0, 1, 3, 3, 0]
+
+BINARY_OPCODES = {
+  TokenEnum.OPMAIS.kind: ADD,
+  TokenEnum.OPMENOS.kind: SUB,
+  TokenEnum.OPMULTI.kind: MUL,
+  TokenEnum.OPDIVI.kind: DIV,
+  TokenEnum.LOGIGUAL.kind: CMP_EQ,
+  TokenEnum.LOGDIFF.kind: CMP_NE,
+  TokenEnum.LOGMENOR.kind: CMP_LT,
+  TokenEnum.LOGMENORIGUAL.kind: CMP_LE,
+  TokenEnum.LOGMAIOR.kind: CMP_GT,
+  TokenEnum.LOGMAIORIGUAL.kind: CMP_GE,
+}
+
+SHORT_CIRCUIT_OPCODES = {
+  TokenEnum.E.kind: JUMP_IF_FALSE_OR_POP,
+  TokenEnum.OU.kind: JUMP_IF_TRUE_OR_POP,
+}
+
+# Work stack entries of BytecodeCompiler.expression, as (action, value)
+EMIT_OPERATOR = 0      # node: both operands have been emitted
+EMIT_SHORT_CIRCUIT = 1 # node: the left operand has been emitted
+EMIT_NOT = 2           # node: the operand has been emitted
+PATCH_JUMP = 3         # jump operand: the right operand has been emitted
+
+class CodeObject:
+  # code: flat instruction stream, constants: literal pool, slot_names: the
+  # var block in declaration order (variables live in a list indexed by slot),
+  # positions: "line:col" of every instruction that can fail at run time
+  __slots__ = ('name', 'code', 'constants', 'slot_names', 'positions')
+
+  def __init__(self, name: str, code: array, constants: list, slotNames: List[str], positions: Dict[int, str]):
+    self.name = name
+    self.code = code
+    self.constants = constants
+    self.slot_names = slotNames
+    self.positions = positions
+
+  def position(self, pc: int) -> str:
+    return self.positions.get(pc, 'unknown')
+
+class BytecodeCompiler:
+  # Lowers a validated Program to a CodeObject in one walk
+  def __init__(self, lineIndex: Optional[LineIndex] = None):
+    self.line_index = lineIndex
+    self.code = array('q')
+    self.constants: list = []
+    self.constant_ids: Dict[tuple, int] = {}
+    self.slots: Dict[str, int] = {}
+    self.positions: Dict[int, str] = {}
+
+  def compile(self, program: Program) -> CodeObject:
+    for var in program.declarations:
+      self.slots.setdefault(var.name, len(self.slots))
+
+    self.statements(program.body)
+    self.emit(HALT)
+    return CodeObject(program.name.value, self.code, self.constants, list(self.slots), self.positions)
+
+  # ----------------
+  # Statements
+  # ----------------
+  def statements(self, statements: List[Node]):
+    for statement in statements:
+      self.statement(statement)
+
+  def statement(self, statement: Node):
+    if isinstance(statement, Assign):
+      self.expression(statement.value)
+      self.emit(STORE_VAR, self.slots[statement.target.name])
+    elif isinstance(statement, Escreva):
+      self.expression(statement.value)
+      self.emit(PRINT)
+    elif isinstance(statement, Leia):
+      self.mark(statement)
+      self.emit(READ, self.slots[statement.target.name])
+    elif isinstance(statement, Se):
+      self.expression(statement.condition)
+      to_else = self.emit_jump(JUMP_IF_FALSE)
+      self.statements(statement.then_body)
+      if statement.else_body:
+        to_end = self.emit_jump(JUMP)
+        self.patch(to_else)
+        self.statements(statement.else_body)
+        self.patch(to_end)
+      else:
+        self.patch(to_else)
+    elif isinstance(statement, Para):
+      slot = self.slots[statement.var.name]
+      step = statement.step.value if statement.step is not None else 1
+      test = len(self.code)
+      self.emit(FOR_TEST, slot, self.constant(statement.limit.value), 0)
+      self.statements(statement.body)
+      self.mark(statement) # Run limits are checked on the step
+      self.emit(FOR_STEP, slot, self.constant(step), test)
+      self.code[test + 3] = len(self.code)
+
+  # ----------------
+  # Expressions
+  # ----------------
+  def expression(self, expression: Node):
+    # Explicit work stack, left operand first, so deep or very long
+    # expressions don't hit the recursion limit. Besides nodes, it holds
+    # what is left to emit once an operand is done
+    pending: list = [expression]
+    while pending:
+      item = pending.pop()
+      if isinstance(item, tuple):
+        (action, value) = item
+        if action == EMIT_OPERATOR:
+          opcode = BINARY_OPCODES[value.op]
+          if opcode >= MUL:
+            self.mark(value) # Integer limit, division by zero, comparing text with numbers
+          self.emit(opcode)
+        elif action == EMIT_SHORT_CIRCUIT:
+          pending.append((PATCH_JUMP, self.emit_jump(SHORT_CIRCUIT_OPCODES[value.op])))
+          pending.append(value.right)
+        elif action == EMIT_NOT:
+          self.emit(NOT)
+        else:
+          self.patch(value)
+      elif isinstance(item, Var):
+        self.emit(LOAD_VAR, self.slots[item.name])
+      elif isinstance(item, Num):
+        self.emit(LOAD_CONST, self.constant(item.value))
+      elif isinstance(item, Str):
+        self.emit(LOAD_CONST, self.constant(item.value))
+      elif isinstance(item, UnaryOp):
+        pending.append((EMIT_NOT, item))
+        pending.append(item.operand)
+      elif item.op in SHORT_CIRCUIT_OPCODES:
+        pending.append((EMIT_SHORT_CIRCUIT, item))
+        pending.append(item.left)
+      else:
+        pending.append((EMIT_OPERATOR, item))
+        pending.append(item.right)
+        pending.append(item.left)
+
+  # ----------------
+  # Emitting
+  # ----------------
+  def emit(self, opcode: int, *operands: int):
+    self.code.append(opcode)
+    self.code.extend(operands)
+
+  def emit_jump(self, opcode: int) -> int:
+    self.emit(opcode, 0)
+    return len(self.code) - 1
+
+  def patch(self, operand: int):
+    self.code[operand] = len(self.code)
+
+  def mark(self, node: Node):
+    # Remember where the next instruction comes from, for run time errors
+    if self.line_index is not None:
+      self.positions[len(self.code)] = self.line_index.code_index(node.offset)
+
+  def constant(self, value) -> int:
+    # Keyed by type too, so 1 and True never share a slot
+    key = (type(value), value)
+    if key not in self.constant_ids:
+      self.constant_ids[key] = len(self.constants)
+      self.constants.append(value)
+    return self.constant_ids[key]
+
+def compile_program(program: Program, lineIndex: Optional[LineIndex] = None) -> CodeObject:
+  return BytecodeCompiler(lineIndex).compile(program)
+
+def disassemble(codeObject: CodeObject) -> str:
+  lines = []
+  code = codeObject.code
+  pc = 0
+  while pc < len(code):
+    opcode = code[pc]
+    operands = list(code[pc + 1:pc + 1 + OPERAND_COUNTS[opcode]])
+    detail = ''
+    if opcode == LOAD_CONST:
+      detail = f'  ({codeObject.constants[operands[0]]!r})'
+    elif opcode in (LOAD_VAR, STORE_VAR, READ, FOR_TEST, FOR_STEP):
+      detail = f'  ({codeObject.slot_names[operands[0]]})'
+    lines.append(f'{pc:>6} {OPCODE_NAMES[opcode]:<20} {" ".join(map(str, operands))}{detail}')
+    pc += 1 + OPERAND_COUNTS[opcode]
+  return '\n'.join(lines)
@@ -0,0 +1,417 @@
+import atexit
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Optional, TextIO
+
+from analyzers.ast_nodes import Assign, BinaryOp, Escreva, Leia, Node, Num, Para, Program, Se, Str, UnaryOp, Var
+from backends.optimizer import optimize
+from backends.runtime import ExecutionError
+from pipeline import load_program
+from utils.compile_cache import CompileCache
+from utils.token_enum import TokenEnum
+from utils.tokens import LineIndex
+
+CACHE_ARTIFACT = 'c'
+C_COMPILERS = ['cc', 'gcc', 'clang']
+# -fwrapv: signed overflow wraps instead of being undefined
+C_FLAGS = ['-O2', '-fwrapv', '-w']
+LONG_MIN = -2**63
+LONG_MAX = 2**63 - 1
+
+OPERATORS = {
+  TokenEnum.OPMAIS.kind: '+',
+  TokenEnum.OPMENOS.kind: '-',
+  TokenEnum.OPMULTI.kind: '*',
+  TokenEnum.LOGIGUAL.kind: '==',
+  TokenEnum.LOGDIFF.kind: '!=',
+  TokenEnum.LOGMENOR.kind: '<',
+  TokenEnum.LOGMENORIGUAL.kind: '<=',
+  TokenEnum.LOGMAIOR.kind: '>',
+  TokenEnum.LOGMAIORIGUAL.kind: '>=',
+  TokenEnum.E.kind: '&&',
+  TokenEnum.OU.kind: '||',
+}
+
+# Deepest expression nesting written inline, see CTranspiler.expression
+MAX_INLINE_DEPTH = 32
+
+SHORT_CIRCUIT_OPERATORS = {TokenEnum.E.kind, TokenEnum.OU.kind}
+
+# Work stack entries of CTranspiler.expression besides nodes, as (action, node)
+COMBINE = 0            # the operands of node are on the value stack
+OPEN_RIGHT_OPERAND = 1 # the left operand of an "e"/"ou" node is on the value stack
+
+TEXT_COMPARISONS = {
+  TokenEnum.LOGIGUAL.kind: lambda left, right: left == right,
+  TokenEnum.LOGDIFF.kind: lambda left, right: left != right,
+  TokenEnum.LOGMENOR.kind: lambda left, right: left < right,
+  TokenEnum.LOGMENORIGUAL.kind: lambda left, right: left <= right,
+  TokenEnum.LOGMAIOR.kind: lambda left, right: left > right,
+  TokenEnum.LOGMAIORIGUAL.kind: lambda left, right: left >= right,
+}
+
+# Errors are reported on stderr as "line:col<TAB>message" with exit status 2;
+# on success the final variable values follow a "=" line
+PRELUDE = r'''#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <ctype.h>
+#include <errno.h>
+
+static void pt_fail(const char *where, const char *message, const char *first, const char *second) {
+  /* message takes first and second as its %s, in order (unused ones are ignored) */
+  fflush(stdout);
+  fprintf(stderr, "%s\t", where);
+  fprintf(stderr, message, first, second);
+  fputc('\n', stderr);
+  exit(2);
+}
+
+static long pt_div(long left, long right, const char *where) {
+  if (right == 0)
+    pt_fail(where, "Division by zero at line %s", where, "");
+  if (right == -1)
+    return (long)(0UL - (unsigned long)left);
+  return left / right; /* C truncates toward zero */
+}
+
+static long pt_read(const char *where) {
+  static char line[4096];
+  char *end, *start;
+  long value;
+
+  fflush(stdout);
+  if (!fgets(line, sizeof line, stdin))
+    pt_fail(where, "No input left for leia at line %s", where, "");
+
+  for (start = line; isspace((unsigned char)*start); start++);
+  for (end = start + strlen(start); end > start && isspace((unsigned char)end[-1]); end--);
+  *end = '\0';
+
+  errno = 0;
+  value = strtol(start, &end, 10);
+  if (end == start || *end != '\0' || errno == ERANGE)
+    pt_fail(where, "Invalid integer input \"%s\" for leia at line %s", start, where);
+  return value;
+}
+
+static long pt_compare_error(const char *message, const char *where) {
+  pt_fail(where, message, where, "");
+  return 0;
+}
+'''
+
+class CBackendError(ExecutionError):
+  pass
+
+class CTranspiler:
+  # Emits a standalone C program: the var block becomes "long" locals of main,
+  # escreva/leia go through stdio. Text only exists as literals, so every
+  # comparison involving text is decided here.
+  def __init__(self, lineIndex: Optional[LineIndex] = None):
+    self.line_index = lineIndex
+    self.names: Dict[str, str] = {}
+    self.lines: List[str] = []
+    self.temporaries: List[str] = []
+
+  def transpile(self, program: Program) -> str:
+    for var in program.declarations:
+      self.names.setdefault(var.name, f'v{len(self.names)}')
+
+    self.lines = [PRELUDE, f'/* algoritmo {c_comment(program.name.text)} */', 'int main(void) {']
+    for name, local in self.names.items():
+      self.emit(1, f'long {local} = 0; /* {c_comment(name)} */')
+    declarations = len(self.lines)
+    self.statements(program.body, 1)
+    # Temporaries are assigned under guards, so they are declared up front
+    self.lines[declarations:declarations] = ['  ' + f'long {temporary};' for temporary in self.temporaries]
+
+    self.emit(1, 'fflush(stdout);')
+    self.emit(1, 'fputs("=\\n", stderr);')
+    for local in self.names.values():
+      self.emit(1, f'fprintf(stderr, "%ld\\n", {local});')
+    self.emit(1, 'return 0;')
+    self.lines.append('}')
+    return '\n'.join(self.lines) + '\n'
+
+  # ----------------
+  # Statements
+  # ----------------
+  def statements(self, statements: List[Node], indent: int):
+    for statement in statements:
+      self.statement(statement, indent)
+
+  def statement(self, statement: Node, indent: int):
+    if isinstance(statement, Assign):
+      self.emit(indent, f'{self.names[statement.target.name]} = {self.expression(statement.value, indent)};')
+    elif isinstance(statement, Escreva):
+      if isinstance(statement.value, Str):
+        self.emit(indent, f'fputs({c_string(statement.value.value)}, stdout);')
+      else:
+        self.emit(indent, f'printf("%ld", {self.expression(statement.value, indent)});')
+    elif isinstance(statement, Leia):
+      self.emit(indent, f'{self.names[statement.target.name]} = pt_read({self.position(statement)});')
+    elif isinstance(statement, Se):
+      self.emit(indent, f'if ({self.expression(statement.condition, indent)}) {{')
+      self.statements(statement.then_body, indent + 1)
+      if statement.else_body:
+        self.emit(indent, '} else {')
+        self.statements(statement.else_body, indent + 1)
+      self.emit(indent, '}')
+    elif isinstance(statement, Para):
+      counter = self.names[statement.var.name]
+      step = statement.step.value if statement.step is not None else 1
+      self.emit(indent, f'for (; {counter} <= {self.number(statement.limit)}; {counter} += {self.literal(step, statement.limit)}) {{')
+      self.statements(statement.body, indent + 1)
+      self.emit(indent, '}')
+
+  # ----------------
+  # Expressions
+  # ----------------
+  # C leaves the order of operands (and of function arguments) unspecified,
+  # so every operation that can fail (pt_div, ordering text with numbers) is
+  # stored in a temporary by a statement of its own as soon as it is built:
+  # they run in source order, as in the VM, and what stays inline is pure. A
+  # subexpression that gets MAX_INLINE_DEPTH levels deep goes to a temporary
+  # too, so nesting never reaches the C compiler's limits. Inside the right
+  # operand of "e"/"ou" those statements only run under a guard variable.
+  def expression(self, expression: Node, indent: int) -> str:
+    # Post-order walk with explicit stacks. A value is [text, depth, number
+    # of enclosing right operands], text None for a text literal; a guard is
+    # [node, index of its left operand in values, guard variable once needed]
+    values: List[list] = []
+    guards: List[list] = []
+    pending: list = [expression]
+    while pending:
+      item = pending.pop()
+      kind = type(item)
+      if kind is tuple:
+        (action, node) = item
+        if action == OPEN_RIGHT_OPERAND:
+          guards.append([node, len(values) - 1, None])
+          continue
+        fallible = self.combine(node, values, guards)
+        if fallible or values[-1][1] >= MAX_INLINE_DEPTH:
+          self.spill(len(values) - 1, values, guards, indent)
+      elif kind is BinaryOp:
+        pending.append((COMBINE, item))
+        pending.append(item.right)
+        if item.op in SHORT_CIRCUIT_OPERATORS:
+          pending.append((OPEN_RIGHT_OPERAND, item))
+        pending.append(item.left)
+      elif kind is UnaryOp:
+        pending.append((COMBINE, item))
+        pending.append(item.operand)
+      elif kind is Var:
+        values.append([self.names[item.name], 0, len(guards)])
+      elif kind is Num:
+        values.append([self.number(item), 0, len(guards)])
+      else:
+        values.append([None, 0, len(guards)])
+
+    if values[0][0] is None:
+      # Only reachable as a comparison operand, handled in combine
+      raise CBackendError('Text outside a comparison', self.code_index(expression))
+    return values[0][0]
+
+  def combine(self, node: Node, values: List[list], guards: List[list]) -> bool:
+    # Replaces the operands on top of `values` by the text of `node`;
+    # true when that text can fail at run time
+    fallible = False
+    if isinstance(node, UnaryOp):
+      (operand, depth, _) = values.pop()
+      if operand is None:
+        raise CBackendError('Text outside a comparison', self.code_index(node.operand))
+      text = f'(!{operand})'
+    else:
+      if node.op in SHORT_CIRCUIT_OPERATORS:
+        guards.pop()
+      (right, right_depth, _) = values.pop()
+      (left, left_depth, _) = values.pop()
+      depth = max(left_depth, right_depth)
+      if isinstance(node.left, Str) or isinstance(node.right, Str):
+        (text, fallible) = self.text_comparison(node)
+      elif left is None or right is None:
+        raise CBackendError('Text outside a comparison', self.code_index(node))
+      elif node.op == TokenEnum.OPDIVI.kind:
+        (text, fallible) = (f'pt_div({left}, {right}, {self.position(node)})', True)
+      else:
+        text = f'({left} {OPERATORS[node.op]} {right})'
+
+    values.append([text, depth + 1, len(guards)])
+    return fallible
+
+  def spill(self, index: int, values: List[list], guards: List[list], indent: int):
+    (text, depth, level) = values[index]
+    if depth == 0:
+      return
+    temporary = self.temporary('t')
+    guard = self.guard(level, values, guards, indent)
+    self.emit(indent, f'{temporary} = {text};' if guard is None else f'if ({guard}) {temporary} = {text};')
+    values[index] = [temporary, 0, level]
+
+  def guard(self, level: int, values: List[list], guards: List[list], indent: int) -> Optional[str]:
+    # Variable that is true when code `level` right operands deep runs. Guards
+    # are created outermost first, each from the one enclosing it
+    if level == 0:
+      return None
+    first = level
+    while first > 1 and guards[first - 2][2] is None:
+      first -= 1
+
+    for current in range(first, level + 1):
+      entry = guards[current - 1]
+      if entry[2] is not None:
+        continue
+      (node, left_index, _) = entry
+      self.spill(left_index, values, guards, indent)
+      left = values[left_index][0]
+      condition = left if node.op == TokenEnum.E.kind else f'!{left}'
+      enclosing = guards[current - 2][2] if current > 1 else None
+      entry[2] = self.temporary('g')
+      self.emit(indent, f'{entry[2]} = {condition};' if enclosing is None else f'{entry[2]} = {enclosing} && {condition};')
+    return guards[level - 1][2]
+
+  def temporary(self, prefix: str) -> str:
+    name = f'{prefix}{len(self.temporaries)}'
+    self.temporaries.append(name)
+    return name
+
+  def text_comparison(self, expression: BinaryOp) -> tuple[str, bool]:
+    # The other operand is pure or already stored, so only the result matters
+    (left, right) = (expression.left, expression.right)
+    if isinstance(left, Str) and isinstance(right, Str):
+      return ('1' if TEXT_COMPARISONS[expression.op](left.value, right.value) else '0', False)
+
+    # Text against a number or a condition: never equal, cannot be ordered
+    if expression.op in (TokenEnum.LOGIGUAL.kind, TokenEnum.LOGDIFF.kind):
+      return ('0' if expression.op == TokenEnum.LOGIGUAL.kind else '1', False)
+
+    (left_kind, right_kind) = ('text', 'number') if isinstance(left, Str) else ('number', 'text')
+    message = c_string(f'Cannot compare {left_kind} with {right_kind} at line %s')
+    return (f'pt_compare_error({message}, {self.position(expression)})', True)
+
+  def number(self, number: Num) -> str:
+    return self.literal(number.value, number)
+
+  def literal(self, value: int, node: Node) -> str:
+    if not LONG_MIN < value <= LONG_MAX:
+      raise CBackendError(f'Number {value} does not fit a C long at line {self.code_index(node)}', self.code_index(node))
+    return f'{value}L'
+
+  def emit(self, indent: int, line: str):
+    self.lines.append('  ' * indent + line)
+
+  def code_index(self, node: Node) -> str:
+    return self.line_index.code_index(node.offset) if self.line_index is not None else 'unknown'
+
+  def position(self, node: Node) -> str:
+    return c_string(self.code_index(node))
+
+def c_string(text: str) -> str:
+  # Printable ASCII as is, everything else as octal escapes of its UTF-8 bytes
+  parts = []
+  for byte in text.encode('utf-8'):
+    char = chr(byte)
+    if 32 <= byte < 127 and char not in '"\\?':
+      parts.append(char)
+    else:
+      parts.append(f'\\{byte:03o}')
+  return f'"{"".join(parts)}"'
+
+def c_comment(text: str) -> str:
+  return text.replace('*/', '* /')
+
+def transpile(program: Program, lineIndex: Optional[LineIndex] = None) -> str:
+  return CTranspiler(lineIndex).transpile(program)
+
+# ----------------
+# Building and running
+# ----------------
+def find_c_compiler() -> str:
+  for compiler in ([os.environ['CC']] if os.environ.get('CC') else []) + C_COMPILERS:
+    path = shutil.which(compiler)
+    if path is not None:
+      return path
+  raise CBackendError('No C compiler found (set CC or install cc/gcc/clang)')
+
+def build(cSource: str, outputPath: str):
+  with tempfile.TemporaryDirectory() as directory:
+    source_path = os.path.join(directory, 'program.c')
+    with open(source_path, 'w', encoding='utf-8') as file:
+      file.write(cSource)
+
+    command = [find_c_compiler(), *C_FLAGS, '-o', outputPath, source_path]
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+      raise CBackendError(f'C compiler failed:\n{process.stderr.strip()}')
+
+_build_directory: Optional[str] = None
+
+def load_binary(source: bytes, cache: Optional[CompileCache] = None, engine: str = 'table', optimized: bool = False) -> str:
+  # Path of the native executable for a valid source, built on a cache miss.
+  # Without a cache it goes to a temporary directory removed at exit
+  global _build_directory
+
+  if cache is not None:
+    key = cache.key(source, CACHE_ARTIFACT + ('-O' if optimized else ''))
+    path = cache.locate(key)
+    if path is not None:
+      return path
+
+  (program, line_index) = load_program(source, engine)
+  if optimized:
+    optimize(program)
+  c_source = transpile(program, line_index)
+
+  if _build_directory is None:
+    _build_directory = tempfile.mkdtemp(prefix='portugol-c-')
+    atexit.register(shutil.rmtree, _build_directory, True)
+  (fd, binary_path) = tempfile.mkstemp(dir=_build_directory)
+  os.close(fd)
+  build(c_source, binary_path)
+
+  if cache is None:
+    return binary_path
+
+  with open(binary_path, 'rb') as file:
+    cache.put(key, file.read(), 0o755)
+  if not os.path.exists(cache.path(key)):
+    # Evicted right away by a cache smaller than the executable
+    return binary_path
+  os.unlink(binary_path)
+  return cache.path(key)
+
+def execute(binaryPath: str, stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None) -> list:
+  # Runs the executable and returns the final variable values, by slot.
+  # The real stdin/stdout are passed straight through (interactive use)
+  stdin = stdin if stdin is not None else sys.stdin
+  stdout = stdout if stdout is not None else sys.stdout
+  (stdin_fd, stdout_fd) = (file_descriptor(stdin), file_descriptor(stdout))
+  if stdout_fd is not None:
+    stdout.flush()
+
+  process = subprocess.run(
+    [binaryPath],
+    stdin=stdin_fd, input=stdin.read().encode('utf-8') if stdin_fd is None else None,
+    stdout=stdout_fd if stdout_fd is not None else subprocess.PIPE,
+    stderr=subprocess.PIPE,
+  )
+  if stdout_fd is None:
+    stdout.write(process.stdout.decode('utf-8', errors='replace'))
+
+  report = process.stderr.decode('utf-8', errors='replace')
+  if process.returncode != 0:
+    (code_index, _, message) = report.strip().partition('\t')
+    raise ExecutionError(message or f'Program exited with status {process.returncode}', code_index or 'unknown')
+
+  return [int(value) for value in report.split('=\n', 1)[1].split()]
+
+def file_descriptor(stream: TextIO) -> Optional[int]:
+  try:
+    return stream.fileno()
+  except (AttributeError, OSError, ValueError):
+    return None # In-memory stream
@@ -0,0 +1,337 @@
+from typing import Dict, List, NamedTuple
+
+from analyzers.ast_nodes import Assign, BinaryOp, Escreva, Leia, Node, Num, Para, Program, Se, Str, UnaryOp, Var
+from backends.runtime import divide
+from utils.token_enum import TokenEnum
+
+# Conditions fold to Num(1) / Num(0): every backend treats them as true / false
+# and compares them with numbers the way it compares condition results
+
+ARITHMETIC = {
+  TokenEnum.OPMAIS.kind: lambda left, right: left + right,
+  TokenEnum.OPMENOS.kind: lambda left, right: left - right,
+  TokenEnum.OPMULTI.kind: lambda left, right: left * right,
+}
+
+COMPARISONS = {
+  TokenEnum.LOGIGUAL.kind: lambda left, right: left == right,
+  TokenEnum.LOGDIFF.kind: lambda left, right: left != right,
+  TokenEnum.LOGMENOR.kind: lambda left, right: left < right,
+  TokenEnum.LOGMENORIGUAL.kind: lambda left, right: left <= right,
+  TokenEnum.LOGMAIOR.kind: lambda left, right: left > right,
+  TokenEnum.LOGMAIORIGUAL.kind: lambda left, right: left >= right,
+}
+
+ORDERING = {TokenEnum.LOGMENOR.kind, TokenEnum.LOGMENORIGUAL.kind, TokenEnum.LOGMAIOR.kind, TokenEnum.LOGMAIORIGUAL.kind}
+
+# Results of x op c that are just x
+IDENTITIES = {
+  TokenEnum.OPMAIS.kind: (0, 0), # (right identity, left identity)
+  TokenEnum.OPMENOS.kind: (0, None),
+  TokenEnum.OPMULTI.kind: (1, 1),
+  TokenEnum.OPDIVI.kind: (1, None),
+}
+
+# Child expressions of each operator node, for the walks that rewrite in place
+OPERAND_FIELDS = {BinaryOp: ('left', 'right'), UnaryOp: ('operand',)}
+
+# ----------------
+# Passes
+# ----------------
+class ConstantFolding:
+  # Evaluates arithmetic, comparisons and e/ou/não on literals. Anything that
+  # fails at run time (division by zero, ordering text against numbers) is left
+  # in place so the error still happens.
+  name = 'constant_folding'
+
+  def __init__(self):
+    self.changes = 0
+
+  def statements(self, statements: List[Node]) -> List[Node]:
+    return [self.statement(statement) for statement in statements]
+
+  def statement(self, statement: Node) -> Node:
+    if isinstance(statement, Assign):
+      statement.value = self.expression(statement.value)
+    elif isinstance(statement, Escreva):
+      statement.value = self.expression(statement.value)
+    elif isinstance(statement, Se):
+      statement.condition = self.expression(statement.condition)
+      statement.then_body = self.statements(statement.then_body)
+      statement.else_body = self.statements(statement.else_body)
+    elif isinstance(statement, Para):
+      statement.body = self.statements(statement.body)
+    return statement
+
+  def expression(self, expression: Node) -> Node:
+    # Post-order over an explicit stack, so deep or long expressions don't
+    # hit the recursion limit; `results` holds the folded operands
+    results: List[Node] = []
+    pending = [(expression, False)]
+    while pending:
+      (node, operands_done) = pending.pop()
+      if isinstance(node, BinaryOp):
+        if not operands_done:
+          pending.append((node, True))
+          pending.append((node.right, False))
+          pending.append((node.left, False))
+          continue
+        right = results.pop()
+        results.append(self.binary(node, results.pop(), right))
+      elif isinstance(node, UnaryOp):
+        if not operands_done:
+          pending.append((node, True))
+          pending.append((node.operand, False))
+          continue
+        results.append(self.unary(node, results.pop()))
+      else:
+        results.append(node)
+    return results[0]
+
+  def unary(self, expression: UnaryOp, operand: Node) -> Node:
+    if isinstance(operand, Num):
+      return self.folded(Num(int(not operand.value), expression.offset))
+    expression.operand = operand
+    return expression
+
+  def binary(self, expression: BinaryOp, left: Node, right: Node) -> Node:
+    (expression.left, expression.right) = (left, right)
+    op = expression.op
+
+    if op == TokenEnum.E.kind or op == TokenEnum.OU.kind:
+      if isinstance(left, Num):
+        # The left side alone decides, or the result is the right side
+        if bool(left.value) == (op == TokenEnum.OU.kind):
+          return self.folded(Num(int(bool(left.value)), expression.offset))
+        return self.folded(right)
+      return expression
+
+    if isinstance(left, Num) and isinstance(right, Num):
+      if op in ARITHMETIC:
+        return self.folded(Num(ARITHMETIC[op](left.value, right.value), expression.offset))
+      if op == TokenEnum.OPDIVI.kind and right.value != 0:
+        return self.folded(Num(divide(left.value, right.value), expression.offset))
+      if op in COMPARISONS:
+        return self.folded(Num(int(COMPARISONS[op](left.value, right.value)), expression.offset))
+    elif isinstance(left, Str) and isinstance(right, Str):
+      return self.folded(Num(int(COMPARISONS[op](left.value, right.value)), expression.offset))
+    elif isinstance(left, (Num, Str)) and isinstance(right, (Num, Str)) and op not in ORDERING:
+      # Text is never equal to a number
+      return self.folded(Num(int(op == TokenEnum.LOGDIFF.kind), expression.offset))
+
+    if op in IDENTITIES:
+      (right_identity, left_identity) = IDENTITIES[op]
+      if isinstance(right, Num) and right.value == right_identity:
+        return self.folded(left)
+      if isinstance(left, Num) and left.value == left_identity:
+        return self.folded(right)
+
+    return expression
+
+  def folded(self, node: Node) -> Node:
+    self.changes += 1
+    return node
+
+class DeadBranchElimination:
+  # Replaces "se" on a constant condition with the branch that runs, and drops
+  # "se" blocks with nothing in either branch
+  name = 'dead_branch_elimination'
+
+  def __init__(self):
+    self.changes = 0
+
+  def statements(self, statements: List[Node]) -> List[Node]:
+    result = []
+    for statement in statements:
+      if isinstance(statement, Se):
+        statement.then_body = self.statements(statement.then_body)
+        statement.else_body = self.statements(statement.else_body)
+        if isinstance(statement.condition, Num):
+          result.extend(statement.then_body if statement.condition.value else statement.else_body)
+          self.changes += 1
+          continue
+        if not statement.then_body and not statement.else_body and not may_fail(statement.condition):
+          self.changes += 1
+          continue
+      elif isinstance(statement, Para):
+        statement.body = self.statements(statement.body)
+      result.append(statement)
+    return result
+
+class ConstantPropagation:
+  # A variable assigned exactly once, at the top level, to a literal reads as
+  # that literal in every later top-level statement (and as 0 before it,
+  # variables start at 0). Never assigned variables always read 0.
+  name = 'constant_propagation'
+
+  def __init__(self, declarations: List[Var]):
+    self.declared = [var.name for var in declarations]
+    self.changes = 0
+
+  def statements(self, statements: List[Node]) -> List[Node]:
+    counts: Dict[str, int] = {}
+    count_assignments(statements, counts)
+
+    # Top-level index of the single constant assignment of each variable
+    constants: Dict[str, tuple] = {}
+    for i, statement in enumerate(statements):
+      if isinstance(statement, Assign) and isinstance(statement.value, Num) and counts.get(statement.target.name) == 1:
+        constants[statement.target.name] = (i, statement.value.value)
+
+    never_assigned = {name for name in self.declared if name not in counts}
+    for i, statement in enumerate(statements):
+      known = {name: 0 for name in never_assigned}
+      for name, (index, value) in constants.items():
+        if i != index:
+          known[name] = value if i > index else 0
+      if known:
+        self.changes += substitute_statement(statement, known)
+    return statements
+
+class LoopSimplification:
+  # "para" loops with an empty body only move their counter: replace them with
+  # the counter's final value (first value past the limit, when the loop runs)
+  name = 'loop_simplification'
+
+  def __init__(self):
+    self.changes = 0
+
+  def statements(self, statements: List[Node]) -> List[Node]:
+    result = []
+    for statement in statements:
+      if isinstance(statement, Se):
+        statement.then_body = self.statements(statement.then_body)
+        statement.else_body = self.statements(statement.else_body)
+      elif isinstance(statement, Para):
+        statement.body = self.statements(statement.body)
+        if not statement.body:
+          step = statement.step.value if statement.step is not None else 1
+          if step != 0: # Step 0 never ends, keep it
+            result.append(final_counter(statement, step))
+            self.changes += 1
+            continue
+      result.append(statement)
+    return result
+
+def final_counter(loop: Para, step: int) -> Se:
+  # se v <= N então v <- v + ((N - v) / S + 1) * S fim_se
+  (offset, var, limit) = (loop.offset, loop.var, loop.limit)
+  counter = lambda: Var(var.name, var.offset)
+  distance = BinaryOp(TokenEnum.OPMENOS.kind, Num(limit.value, limit.offset), counter(), offset)
+  passes = BinaryOp(TokenEnum.OPMAIS.kind, BinaryOp(TokenEnum.OPDIVI.kind, distance, Num(step, offset), offset), Num(1, offset), offset)
+  value = BinaryOp(TokenEnum.OPMAIS.kind, counter(), BinaryOp(TokenEnum.OPMULTI.kind, passes, Num(step, offset), offset), offset)
+  condition = BinaryOp(TokenEnum.LOGMENORIGUAL.kind, counter(), Num(limit.value, limit.offset), offset)
+  return Se(condition, [Assign(counter(), value, offset)], [], offset)
+
+# ----------------
+# Helpers
+# ----------------
+def may_fail(node: Node) -> bool:
+  # Explicit stack, like the rest of the expression walks
+  pending = [node]
+  while pending:
+    node = pending.pop()
+    if isinstance(node, UnaryOp):
+      pending.append(node.operand)
+    elif isinstance(node, BinaryOp):
+      if node.op == TokenEnum.OPDIVI.kind and not (isinstance(node.right, Num) and node.right.value != 0):
+        return True
+      if node.op in ORDERING and isinstance(node.left, Str) != isinstance(node.right, Str):
+        return True
+      pending.append(node.right)
+      pending.append(node.left)
+  return False
+
+def count_assignments(statements: List[Node], counts: Dict[str, int]):
+  for statement in statements:
+    if isinstance(statement, (Assign, Leia)):
+      counts[statement.target.name] = counts.get(statement.target.name, 0) + 1
+    elif isinstance(statement, Se):
+      count_assignments(statement.then_body, counts)
+      count_assignments(statement.else_body, counts)
+    elif isinstance(statement, Para):
+      counts[statement.var.name] = counts.get(statement.var.name, 0) + 2 # Assigned in a loop
+      count_assignments(statement.body, counts)
+
+def substitute_statement(statement: Node, known: Dict[str, int]) -> int:
+  # Replaces reads of known variables in place, returns how many were replaced
+  replaced = 0
+  pending = [statement]
+  while pending:
+    statement = pending.pop()
+    if isinstance(statement, (Assign, Escreva)):
+      (statement.value, count) = substitute_expression(statement.value, known)
+      replaced += count
+    elif isinstance(statement, Se):
+      (statement.condition, count) = substitute_expression(statement.condition, known)
+      replaced += count
+      pending.extend(statement.then_body)
+      pending.extend(statement.else_body)
+    elif isinstance(statement, Para):
+      pending.extend(statement.body)
+  return replaced
+
+def substitute_expression(expression: Node, known: Dict[str, int]) -> tuple[Node, int]:
+  # The expression with known variables replaced in place, and how many were
+  if isinstance(expression, Var):
+    if expression.name in known:
+      return (Num(known[expression.name], expression.offset), 1)
+    return (expression, 0)
+
+  replaced = 0
+  pending = [expression]
+  while pending:
+    node = pending.pop()
+    for field in OPERAND_FIELDS.get(type(node), ()):
+      operand = getattr(node, field)
+      if isinstance(operand, Var):
+        if operand.name in known:
+          setattr(node, field, Num(known[operand.name], operand.offset))
+          replaced += 1
+      else:
+        pending.append(operand)
+  return (expression, replaced)
+
+def count_nodes(nodes: List[Node]) -> int:
+  total = 0
+  pending = list(nodes)
+  while pending:
+    node = pending.pop()
+    total += 1
+    if isinstance(node, (Assign, Escreva)):
+      pending.append(node.value)
+    elif isinstance(node, Se):
+      pending.append(node.condition)
+      pending.extend(node.then_body)
+      pending.extend(node.else_body)
+    elif isinstance(node, Para):
+      pending.extend(node.body)
+    elif isinstance(node, BinaryOp):
+      pending.append(node.left)
+      pending.append(node.right)
+    elif isinstance(node, UnaryOp):
+      pending.append(node.operand)
+  return total
+
+# ----------------
+# Driver
+# ----------------
+class PassReport(NamedTuple):
+  rewrites: int      # Expressions/statements the pass replaced
+  nodes_removed: int # AST nodes gone because of it (negative if it added some)
+
+def optimize(program: Program, maxRounds: int = 10) -> Dict[str, PassReport]:
+  # Runs the passes in place, in rounds, until a round changes nothing
+  passes = [ConstantPropagation(program.declarations), ConstantFolding(), DeadBranchElimination(), LoopSimplification()]
+  removed = {optimization.name: 0 for optimization in passes}
+
+  for _ in range(maxRounds):
+    changes = sum(optimization.changes for optimization in passes)
+    for optimization in passes:
+      before = count_nodes(program.body)
+      program.body = optimization.statements(program.body)
+      removed[optimization.name] += before - count_nodes(program.body)
+    if sum(optimization.changes for optimization in passes) == changes:
+      break
+
+  return {optimization.name: PassReport(optimization.changes, removed[optimization.name]) for optimization in passes}
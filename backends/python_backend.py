@@ -0,0 +1,299 @@
+import builtins
+import functools
+import marshal
+import sys
+from importlib.util import MAGIC_NUMBER
+from types import CodeType
+from typing import Dict, List, Optional, Set, TextIO
+
+from analyzers.ast_nodes import Assign, BinaryOp, Escreva, Leia, Node, Num, Para, Program, Se, Str, UnaryOp, Var
+from backends.optimizer import optimize
+from backends.runtime import compare_error, divide, read_integer
+from pipeline import load_program
+from utils.compile_cache import CompileCache
+from utils.token_enum import TokenEnum
+from utils.tokens import LineIndex
+
+CACHE_ARTIFACT = 'python'
+ENTRY_FUNCTION = 'main'
+
+OPERATORS = {
+  TokenEnum.OPMAIS.kind: '+',
+  TokenEnum.OPMENOS.kind: '-',
+  TokenEnum.OPMULTI.kind: '*',
+  TokenEnum.LOGIGUAL.kind: '==',
+  TokenEnum.LOGDIFF.kind: '!=',
+  TokenEnum.LOGMENOR.kind: '<',
+  TokenEnum.LOGMENORIGUAL.kind: '<=',
+  TokenEnum.LOGMAIOR.kind: '>',
+  TokenEnum.LOGMAIORIGUAL.kind: '>=',
+  TokenEnum.E.kind: 'and',
+  TokenEnum.OU.kind: 'or',
+}
+
+# Deepest expression nesting written inline, see PythonTranspiler.expression
+MAX_INLINE_DEPTH = 32
+
+SHORT_CIRCUIT_OPERATORS = {TokenEnum.E.kind, TokenEnum.OU.kind}
+
+# Work stack entries of PythonTranspiler.expression besides nodes, as (action, node)
+COMBINE = 0            # the operands of node are on the value stack
+OPEN_RIGHT_OPERAND = 1 # the left operand of an "e"/"ou" node is on the value stack
+
+ORDERING = {TokenEnum.LOGMENOR.kind, TokenEnum.LOGMENORIGUAL.kind, TokenEnum.LOGMAIOR.kind, TokenEnum.LOGMAIORIGUAL.kind}
+
+class PythonTranspiler:
+  # Emits one Python function for a validated Program. The var block becomes
+  # its locals (v0, v1... by declaration order, so any Portugol name is safe),
+  # "para" becomes a for/range loop whenever the body leaves the counter alone.
+  def __init__(self, lineIndex: Optional[LineIndex] = None):
+    self.line_index = lineIndex
+    self.names: Dict[str, str] = {}
+    self.lines: List[str] = []
+    self.ranges = 0
+    self.temporaries = 0
+    self.settled = 0
+
+  def transpile(self, program: Program) -> str:
+    for var in program.declarations:
+      self.names.setdefault(var.name, f'v{len(self.names)}')
+
+    self.lines = [f'# algoritmo {program.name.text}', f'def {ENTRY_FUNCTION}():']
+    for name, local in self.names.items():
+      self.emit(1, f'{local} = 0 # {name}')
+    self.statements(program.body, 1)
+    self.emit(1, f'return [{", ".join(self.names.values())}]')
+    return '\n'.join(self.lines) + '\n'
+
+  # ----------------
+  # Statements
+  # ----------------
+  def statements(self, statements: List[Node], indent: int):
+    if not statements:
+      self.emit(indent, 'pass')
+    for statement in statements:
+      self.statement(statement, indent)
+
+  def statement(self, statement: Node, indent: int):
+    if isinstance(statement, Assign):
+      self.emit(indent, f'{self.names[statement.target.name]} = {self.expression(statement.value, indent)}')
+    elif isinstance(statement, Escreva):
+      self.emit(indent, f"print({self.expression(statement.value, indent)}, end='')")
+    elif isinstance(statement, Leia):
+      self.emit(indent, f'{self.names[statement.target.name]} = __leia({self.position(statement)!r})')
+    elif isinstance(statement, Se):
+      self.emit(indent, f'if {self.expression(statement.condition, indent)}:')
+      self.statements(statement.then_body, indent + 1)
+      if statement.else_body:
+        self.emit(indent, 'else:')
+        self.statements(statement.else_body, indent + 1)
+    elif isinstance(statement, Para):
+      self.command_para(statement, indent)
+
+  def command_para(self, statement: Para, indent: int):
+    counter = self.names[statement.var.name]
+    limit = statement.limit.value
+    step = statement.step.value if statement.step is not None else 1
+
+    if step == 0 or statement.var.name in assigned_names(statement.body):
+      # The body moves the counter (or never does): keep the exact loop
+      self.emit(indent, f'while {counter} <= {limit}:')
+      self.statements(statement.body, indent + 1)
+      self.emit(indent + 1, f'{counter} += {step}')
+      return
+
+    # After the loop the counter holds the first value past the limit
+    loop_range = f'__range{self.ranges}'
+    self.ranges += 1
+    self.emit(indent, f'{loop_range} = range({counter}, {limit + 1}, {step})')
+    self.emit(indent, f'for {counter} in {loop_range}:')
+    self.statements(statement.body, indent + 1)
+    self.emit(indent, f'{counter} = {loop_range}.start + len({loop_range}) * {step}')
+
+  # ----------------
+  # Expressions
+  # ----------------
+  # CPython rejects deeply nested code (200 parentheses, a few thousand
+  # levels in its compiler), so a subexpression that gets MAX_INLINE_DEPTH
+  # levels deep is first stored in a temporary by a statement of its own.
+  # Operands are evaluated in source order all the same: every earlier
+  # operand still pending is stored before it. Inside the right operand of
+  # "e"/"ou" those statements only run when the left one lets it run, under
+  # a guard variable, so the code stays flat and short-circuits as before.
+  def expression(self, expression: Node, indent: int) -> str:
+    # Post-order walk with explicit stacks. A value is [text, depth, number
+    # of enclosing right operands]; a guard is [node, index of its left
+    # operand in values, guard variable once one is needed]
+    text = self.leaf(expression)
+    if text is not None:
+      return text
+
+    values: List[list] = []
+    guards: List[list] = []
+    self.settled = 0 # values below this index are plain names or literals
+    pending: list = [expression]
+    while pending:
+      item = pending.pop()
+      kind = type(item)
+      if kind is tuple:
+        (action, node) = item
+        if action == OPEN_RIGHT_OPERAND:
+          guards.append([node, len(values) - 1, None])
+          continue
+        self.combine(node, values, guards)
+        if values[-1][1] >= MAX_INLINE_DEPTH:
+          self.spill_pending(values, guards, indent)
+      elif kind is BinaryOp:
+        pending.append((COMBINE, item))
+        pending.append(item.right)
+        if item.op in SHORT_CIRCUIT_OPERATORS:
+          pending.append((OPEN_RIGHT_OPERAND, item))
+        pending.append(item.left)
+      elif kind is UnaryOp:
+        pending.append((COMBINE, item))
+        pending.append(item.operand)
+      else:
+        values.append([self.leaf(item), 0, len(guards)])
+
+    return values[0][0]
+
+  def leaf(self, node: Node) -> Optional[str]:
+    kind = type(node)
+    if kind is Var:
+      return self.names[node.name]
+    elif kind is Num:
+      return str(node.value)
+    elif kind is Str:
+      return repr(node.value)
+    return None
+
+  def combine(self, node: Node, values: List[list], guards: List[list]):
+    # Replaces the operands on top of `values` by the text of `node`
+    if isinstance(node, UnaryOp):
+      (operand, depth, _) = values.pop()
+      text = f'(not {operand})'
+    else:
+      if node.op in SHORT_CIRCUIT_OPERATORS:
+        guards.pop()
+      (right, right_depth, _) = values.pop()
+      (left, left_depth, _) = values.pop()
+      depth = max(left_depth, right_depth)
+      if node.op == TokenEnum.OPDIVI.kind:
+        text = f'__div({left}, {right}, {self.position(node)!r})'
+      elif node.op in ORDERING and (isinstance(node.left, Str) != isinstance(node.right, Str)):
+        # Text against a number or a condition, always fails when reached
+        text = f'__compare_error({left}, {right}, {self.position(node)!r})'
+      else:
+        text = f'({left} {OPERATORS[node.op]} {right})'
+
+    values.append([text, depth + 1, len(guards)])
+    self.settled = min(self.settled, len(values) - 1)
+
+  def spill_pending(self, values: List[list], guards: List[list], indent: int):
+    # Stores every value not yet settled in a temporary, oldest first
+    for index in range(self.settled, len(values)):
+      self.spill(index, values, guards, indent)
+    self.settled = len(values)
+
+  def spill(self, index: int, values: List[list], guards: List[list], indent: int):
+    (text, depth, level) = values[index]
+    if depth == 0:
+      return
+    temporary = self.temporary()
+    guard = self.guard(level, values, guards, indent)
+    self.emit(indent, f'{temporary} = {text}' if guard is None else f'if {guard}: {temporary} = {text}')
+    values[index] = [temporary, 0, level]
+
+  def guard(self, level: int, values: List[list], guards: List[list], indent: int) -> Optional[str]:
+    # Variable that is true when code `level` right operands deep runs. Guards
+    # are created outermost first, each from the one enclosing it
+    if level == 0:
+      return None
+    first = level
+    while first > 1 and guards[first - 2][2] is None:
+      first -= 1
+
+    for current in range(first, level + 1):
+      entry = guards[current - 1]
+      if entry[2] is not None:
+        continue
+      (node, left_index, _) = entry
+      self.spill(left_index, values, guards, indent)
+      left = values[left_index][0]
+      condition = left if node.op == TokenEnum.E.kind else f'not {left}'
+      enclosing = guards[current - 2][2] if current > 1 else None
+      entry[2] = self.temporary('__g')
+      self.emit(indent, f'{entry[2]} = {condition}' if enclosing is None else f'{entry[2]} = {enclosing} and {condition}')
+    return guards[level - 1][2]
+
+  def temporary(self, prefix: str = '__t') -> str:
+    self.temporaries += 1
+    return f'{prefix}{self.temporaries}'
+
+  def emit(self, indent: int, line: str):
+    self.lines.append('  ' * indent + line)
+
+  def position(self, node: Node) -> str:
+    return self.line_index.code_index(node.offset) if self.line_index is not None else 'unknown'
+
+def assigned_names(statements: List[Node]) -> Set[str]:
+  # Explicit stack, nested blocks don't hit the recursion limit
+  names = set()
+  pending = list(statements)
+  while pending:
+    statement = pending.pop()
+    if isinstance(statement, Assign):
+      names.add(statement.target.name)
+    elif isinstance(statement, Leia):
+      names.add(statement.target.name)
+    elif isinstance(statement, Se):
+      pending.extend(statement.then_body)
+      pending.extend(statement.else_body)
+    elif isinstance(statement, Para):
+      names.add(statement.var.name)
+      pending.extend(statement.body)
+  return names
+
+def transpile(program: Program, lineIndex: Optional[LineIndex] = None) -> str:
+  return PythonTranspiler(lineIndex).transpile(program)
+
+def compile_program(program: Program, lineIndex: Optional[LineIndex] = None) -> CodeType:
+  return compile(transpile(program, lineIndex), f'<portugol {program.name.value}>', 'exec')
+
+def load_code(source: bytes, cache: Optional[CompileCache] = None, engine: str = 'table', optimized: bool = False) -> CodeType:
+  # Code object for a valid source; a cache hit skips the whole front end.
+  # marshal's code format is tied to the interpreter version, hence the magic number
+  if cache is not None:
+    key = cache.key(source, CACHE_ARTIFACT + ('-O' if optimized else ''))
+    data = cache.get(key)
+    if data is not None:
+      try:
+        (magic, code) = marshal.loads(data)
+        if magic == MAGIC_NUMBER:
+          return code
+      except (EOFError, ValueError, TypeError):
+        pass # Corrupt entry, rebuild it
+
+  (program, line_index) = load_program(source, engine)
+  if optimized:
+    optimize(program)
+  code = compile_program(program, line_index)
+  if cache is not None:
+    cache.put(key, marshal.dumps((MAGIC_NUMBER, code)))
+  return code
+
+def execute(code: CodeType, stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None) -> list:
+  # Runs the generated function and returns the final variable values, by slot
+  stdin = stdin if stdin is not None else sys.stdin
+  namespace = {
+    '__builtins__': builtins,
+    'print': functools.partial(print, file=stdout if stdout is not None else sys.stdout),
+    '__leia': functools.partial(read_integer, stdin),
+    '__div': divide,
+    '__compare_error': raise_compare_error,
+  }
+  exec(code, namespace)
+  return namespace[ENTRY_FUNCTION]()
+
+def raise_compare_error(left, right, codeIndex: str):
+  raise compare_error(left, right, codeIndex)
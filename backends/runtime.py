@@ -0,0 +1,87 @@
+import time
+from typing import Optional, TextIO
+
+from analyzers.diagnostics import CompilerError
+
+# Semantics shared by every backend:
+# - "inteiro" variables start at 0
+# - "/" is integer division truncated toward zero (as in C)
+# - "para v até N passo S" runs while v <= N, adding S (default 1) to v after
+#   each pass; v keeps its value from before the loop
+# - "escreva" writes its value without a newline, "leia" reads one integer per line
+
+class ExecutionError(CompilerError):
+  pass
+
+class StepLimitExceeded(ExecutionError):
+  pass
+
+class TimeLimitExceeded(ExecutionError):
+  pass
+
+class IntegerLimitExceeded(ExecutionError):
+  pass
+
+class ExecutionLimits:
+  # Caps on the "para" passes, the wall time and the integer size of one run.
+  # Code without loops always ends, so the VM only counts at the loop back
+  # edge: it runs the number of passes returned by start/check, then calls
+  # check again. A time limit is checked on every pass, and the integer cap
+  # keeps a single multiplication from taking unbounded time and memory.
+  # Neither stops straight-line code that is slow on its own, so callers
+  # with a hard deadline (the grader) also run the VM in a process they kill.
+  CHECK_INTERVAL = 1024 # Passes between checks without a time limit
+
+  def __init__(self, maxSteps: Optional[int] = None, timeLimit: Optional[float] = None, maxIntegerBits: Optional[int] = None):
+    self.max_steps = maxSteps
+    self.time_limit = timeLimit
+    self.max_integer_bits = maxIntegerBits
+    self.steps = 0
+    self.deadline: Optional[float] = None
+    self.granted = 0
+
+  def start(self) -> int:
+    self.steps = 0
+    self.deadline = time.perf_counter() + self.time_limit if self.time_limit is not None else None
+    return self.grant()
+
+  def check(self, codeIndex: str) -> int:
+    self.steps += self.granted
+    if self.max_steps is not None and self.steps > self.max_steps:
+      raise StepLimitExceeded(f'Step limit of {self.max_steps} loop passes exceeded at line {codeIndex}', codeIndex)
+    if self.deadline is not None and time.perf_counter() > self.deadline:
+      raise TimeLimitExceeded(f'Time limit of {self.time_limit}s exceeded at line {codeIndex}', codeIndex)
+    return self.grant()
+
+  def integer_error(self, codeIndex: str) -> IntegerLimitExceeded:
+    return IntegerLimitExceeded(f'Integer larger than {self.max_integer_bits} bits at line {codeIndex}', codeIndex)
+
+  def grant(self) -> int:
+    # Passes until the next check; the one past max_steps always lands on a check
+    self.granted = 1 if self.deadline is not None else self.CHECK_INTERVAL
+    if self.max_steps is not None:
+      self.granted = max(1, min(self.granted, self.max_steps + 1 - self.steps))
+    return self.granted
+
+def divide(left: int, right: int, codeIndex: str = 'unknown') -> int:
+  if right == 0:
+    raise ExecutionError(f'Division by zero at line {codeIndex}', codeIndex)
+  if (left >= 0) == (right > 0):
+    return left // right
+  return -(-left // right)
+
+def read_integer(stdin: TextIO, codeIndex: str = 'unknown') -> int:
+  line = stdin.readline()
+  if not line:
+    raise ExecutionError(f'No input left for leia at line {codeIndex}', codeIndex)
+
+  try:
+    return int(line)
+  except ValueError:
+    raise ExecutionError(f'Invalid integer input "{line.strip()}" for leia at line {codeIndex}', codeIndex) from None
+
+def compare_error(left, right, codeIndex: str) -> ExecutionError:
+  return ExecutionError(f'Cannot compare {describe(left)} with {describe(right)} at line {codeIndex}', codeIndex)
+
+def describe(value) -> str:
+  return 'text' if isinstance(value, str) else 'number'
@@ -0,0 +1,126 @@
+import sys
+from typing import Optional, TextIO
+
+from backends.bytecode import (
+  ADD, CMP_EQ, CMP_GE, CMP_GT, CMP_LE, CMP_LT, CMP_NE, DIV, FOR_STEP, FOR_TEST, HALT, JUMP,
+  JUMP_IF_FALSE, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP, LOAD_CONST, LOAD_VAR, MUL, NOT,
+  PRINT, READ, STORE_VAR, SUB, CodeObject,
+)
+from backends.runtime import ExecutionError, ExecutionLimits, compare_error, divide, read_integer
+
+def execute(codeObject: CodeObject, stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None, limits: Optional[ExecutionLimits] = None) -> list:
+  # Runs the program and returns the final variable values, by slot.
+  # `limits` (default: none) raise once too many "para" passes or too much
+  # time went by, or a product gets too large.
+  stdin = stdin if stdin is not None else sys.stdin
+  write = (stdout if stdout is not None else sys.stdout).write
+
+  code = codeObject.code.tolist() # List indexing is faster than array indexing
+  constants = codeObject.constants
+  variables = [0] * len(codeObject.slot_names)
+  stack = []
+  push = stack.append
+  pop = stack.pop
+  pc = 0
+  limits = limits if limits is not None else ExecutionLimits()
+  max_bits = limits.max_integer_bits
+  passes_left = limits.start()
+
+  try:
+    # Opcodes roughly ordered by how often loop bodies run them
+    while True:
+      opcode = code[pc]
+      if opcode == LOAD_VAR:
+        push(variables[code[pc + 1]])
+        pc += 2
+      elif opcode == LOAD_CONST:
+        push(constants[code[pc + 1]])
+        pc += 2
+      elif opcode == STORE_VAR:
+        variables[code[pc + 1]] = pop()
+        pc += 2
+      elif opcode == FOR_TEST:
+        if variables[code[pc + 1]] <= constants[code[pc + 2]]:
+          pc += 4
+        else:
+          pc = code[pc + 3]
+      elif opcode == FOR_STEP:
+        variables[code[pc + 1]] += constants[code[pc + 2]]
+        passes_left -= 1
+        if not passes_left:
+          passes_left = limits.check(codeObject.position(pc))
+        pc = code[pc + 3]
+      elif opcode == ADD:
+        right = pop()
+        stack[-1] += right
+        pc += 1
+      elif opcode == SUB:
+        right = pop()
+        stack[-1] -= right
+        pc += 1
+      elif opcode == MUL:
+        right = pop()
+        stack[-1] *= right
+        if max_bits is not None and stack[-1].bit_length() > max_bits:
+          raise limits.integer_error(codeObject.position(pc))
+        pc += 1
+      elif opcode == DIV:
+        right = pop()
+        stack[-1] = divide(stack[-1], right, codeObject.position(pc))
+        pc += 1
+      elif opcode == JUMP_IF_FALSE:
+        pc = pc + 2 if pop() else code[pc + 1]
+      elif opcode == JUMP:
+        pc = code[pc + 1]
+      elif opcode == CMP_LT:
+        right = pop()
+        stack[-1] = stack[-1] < right
+        pc += 1
+      elif opcode == CMP_LE:
+        right = pop()
+        stack[-1] = stack[-1] <= right
+        pc += 1
+      elif opcode == CMP_GT:
+        right = pop()
+        stack[-1] = stack[-1] > right
+        pc += 1
+      elif opcode == CMP_GE:
+        right = pop()
+        stack[-1] = stack[-1] >= right
+        pc += 1
+      elif opcode == CMP_EQ:
+        right = pop()
+        stack[-1] = stack[-1] == right
+        pc += 1
+      elif opcode == CMP_NE:
+        right = pop()
+        stack[-1] = stack[-1] != right
+        pc += 1
+      elif opcode == NOT:
+        stack[-1] = not stack[-1]
+        pc += 1
+      elif opcode == JUMP_IF_FALSE_OR_POP:
+        if stack[-1]:
+          pop()
+          pc += 2
+        else:
+          pc = code[pc + 1]
+      elif opcode == JUMP_IF_TRUE_OR_POP:
+        if stack[-1]:
+          pc = code[pc + 1]
+        else:
+          pop()
+          pc += 2
+      elif opcode == PRINT:
+        write(str(pop()))
+        pc += 1
+      elif opcode == READ:
+        variables[code[pc + 1]] = read_integer(stdin, codeObject.position(pc))
+        pc += 2
+      elif opcode == HALT:
+        return variables
+      else:
+        raise ExecutionError(f'Bad opcode {opcode} at {pc}')
+  except TypeError:
+    # Ordering text against numbers; the operands are still on the stack
+    raise compare_error(stack[-1], right, codeObject.position(pc)) from None
@@ -0,0 +1,87 @@
+import argparse
+import glob
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+from pipeline import CompileResult, compile_file
+from utils.compile_cache import DEFAULT_MAX_BYTES, CompileCache
+
+DEFAULT_REPORT_PATH = 'output/batch_report.json'
+
+# Per-process cache, set up once by each worker
+worker_cache: CompileCache = None
+
+def init_worker(cacheDir: Optional[str], cacheBytes: int):
+  global worker_cache
+  worker_cache = CompileCache(cacheDir, cacheBytes) if cacheDir else None
+
+def compile_one(path: str) -> CompileResult:
+  return compile_file(path, cache=worker_cache)
+
+def collect_files(target: str) -> List[str]:
+  # A directory is searched recursively for .por files, anything else is a glob
+  if os.path.isdir(target):
+    target = os.path.join(target, '**', '*.por')
+
+  return sorted(path for path in glob.glob(target, recursive=True) if os.path.isfile(path))
+
+def compile_all(paths: List[str], workers: int, cacheDir: Optional[str] = None, cacheBytes: int = DEFAULT_MAX_BYTES) -> List[CompileResult]:
+  if workers <= 1:
+    init_worker(cacheDir, cacheBytes)
+    return [compile_one(path) for path in paths]
+
+  # Hand out files in chunks so tiny submissions don't pay one round-trip each
+  chunk_size = max(1, len(paths) // (workers * 8))
+  with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(cacheDir, cacheBytes)) as executor:
+    return list(executor.map(compile_one, paths, chunksize=chunk_size))
+
+def write_report(path: str, results: List[CompileResult], elapsed: float, workers: int):
+  counts = Counter(result.status for result in results)
+  report = {
+    'total': len(results),
+    'workers': workers,
+    'elapsed_seconds': round(elapsed, 3),
+    'counts': dict(counts),
+    'cache_hits': sum(1 for result in results if result.cached),
+    'results': [result._asdict() for result in results],
+  }
+
+  directory = os.path.dirname(path)
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+  with open(path, 'w', encoding='utf-8') as report_file:
+    json.dump(report, report_file, ensure_ascii=False, indent=2)
+
+def main():
+  arg_parser = argparse.ArgumentParser(description='Compile many .por files in parallel.')
+  arg_parser.add_argument('target', help='directory (searched recursively) or glob pattern')
+  arg_parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (default: CPU count)')
+  arg_parser.add_argument('--report', default=DEFAULT_REPORT_PATH, help='aggregate JSON report path')
+  arg_parser.add_argument('--cache', metavar='DIR', help='reuse results of unchanged files from this cache directory')
+  arg_parser.add_argument('--cache-size', type=int, default=64, metavar='MB', help='cache size cap in MB (default: 64)')
+  args = arg_parser.parse_args()
+
+  paths = collect_files(args.target)
+  if not paths:
+    raise SystemExit(f'No .por files found for "{args.target}"')
+
+  start = time.perf_counter()
+  results = compile_all(paths, args.workers, args.cache, args.cache_size * 1024 * 1024)
+  elapsed = time.perf_counter() - start
+
+  write_report(args.report, results, elapsed, args.workers)
+
+  counts = Counter(result.status for result in results)
+  summary = ', '.join(f'{status}: {count}' for status, count in sorted(counts.items()))
+  print(f'Compiled {len(results)} files in {elapsed:.2f}s ({len(results) / elapsed:,.0f} files/s) [{summary}]')
+  if args.cache:
+    hits = sum(1 for result in results if result.cached)
+    print(f'Cache: {hits} hits, {len(results) - hits} misses')
+  print(f'Report written to {args.report}')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,106 @@
+import argparse
+import io
+import tempfile
+import time
+
+import backends.c_backend as c_backend
+import backends.python_backend as python_backend
+from backends.bytecode import compile_program
+from backends.optimizer import optimize
+from backends.vm import execute
+from pipeline import load_program
+from utils.compile_cache import CompileCache
+
+# "limite", "fator" and the "depurar" branch are there for the optimizer
+LOOP_PROGRAM = '''algoritmo "laco"
+var
+  i, j, soma, limite, fator, depurar: inteiro
+inicio
+  soma <- 0
+  limite <- 1000 * 1000
+  fator <- 2 * 3 - 5
+  para i até {outer}
+    j <- 0
+    para j até {inner}
+      soma <- soma + i * j * fator - (i + j) / 3 + 0
+      se (soma > limite) então
+        soma <- soma - limite
+      fim_se
+      se (depurar = 1) ou ("a" = "b") então
+        escreva(soma)
+      fim_se
+    fim_para
+  fim_para
+  escreva(soma)
+fimalgoritmo
+'''
+
+def loop_program(outer: int, inner: int) -> bytes:
+  return LOOP_PROGRAM.format(outer=outer, inner=inner).encode('utf-8')
+
+def run_vm(source: bytes, optimized: bool) -> tuple[float, float, str]:
+  # (front end + lowering time, execution time, program output)
+  start = time.perf_counter()
+  (program, line_index) = load_program(source)
+  if optimized:
+    optimize(program)
+  code = compile_program(program, line_index)
+  lowered = time.perf_counter()
+
+  output = io.StringIO()
+  execute(code, io.StringIO(), output)
+  return (lowered - start, time.perf_counter() - lowered, output.getvalue())
+
+def run_python(source: bytes, cache: CompileCache, optimized: bool) -> tuple[float, float, str]:
+  start = time.perf_counter()
+  code = python_backend.load_code(source, cache, optimized=optimized)
+  loaded = time.perf_counter()
+
+  output = io.StringIO()
+  python_backend.execute(code, io.StringIO(), output)
+  return (loaded - start, time.perf_counter() - loaded, output.getvalue())
+
+def run_c(source: bytes, cache: CompileCache, optimized: bool) -> tuple[float, float, str]:
+  start = time.perf_counter()
+  binary = c_backend.load_binary(source, cache, optimized=optimized)
+  built = time.perf_counter()
+
+  output = io.StringIO()
+  c_backend.execute(binary, io.StringIO(), output)
+  return (built - start, time.perf_counter() - built, output.getvalue())
+
+def main():
+  arg_parser = argparse.ArgumentParser(description='Measure execution throughput on a loop-heavy program.')
+  arg_parser.add_argument('--outer', type=int, default=1000, help='outer loop limit')
+  arg_parser.add_argument('--inner', type=int, default=1000, help='inner loop limit')
+  arg_parser.add_argument('-O', '--optimize', action='store_true', help='also run every backend on the optimized program')
+  args = arg_parser.parse_args()
+
+  source = loop_program(args.outer, args.inner)
+  iterations = (args.outer + 1) * (args.inner + 1)
+  variants = [False, True] if args.optimize else [False]
+
+  if args.optimize:
+    (program, _) = load_program(source)
+    for name, report in optimize(program).items():
+      print(f'{name:>24}: {report.rewrites:>4} rewrites  {report.nodes_removed:>4} nodes removed')
+
+  with tempfile.TemporaryDirectory() as cache_path:
+    cache = CompileCache(cache_path)
+    runs = []
+    for optimized in variants:
+      suffix = ' -O' if optimized else ''
+      runs += [
+        (f'vm{suffix}', lambda optimized=optimized: run_vm(source, optimized)),
+        (f'python{suffix}', lambda optimized=optimized: run_python(source, cache, optimized)),
+        (f'python{suffix} (cached)', lambda optimized=optimized: run_python(source, cache, optimized)),
+        (f'c{suffix}', lambda optimized=optimized: run_c(source, cache, optimized)),
+        (f'c{suffix} (cached)', lambda optimized=optimized: run_c(source, cache, optimized)),
+      ]
+
+    for name, run in runs:
+      (compile_time, run_time, output) = run()
+      print(f'{name:>19}: compile {compile_time * 1000:7.2f} ms  run {run_time:7.3f}s  {iterations / run_time:>14,.0f} iterations/s  output {output}')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,55 @@
+import argparse
+import time
+
+from analyzers.lexical_analyzer import SCANNERS
+from utils.file_helper import read_lines_from_file
+
+SAMPLE_FILES = ['input.por', 'input-2.por']
+
+def build_lines(repeat: int) -> list[str]:
+  sample = []
+  for fileName in SAMPLE_FILES:
+    sample.extend(read_lines_from_file(fileName))
+
+  return sample * repeat
+
+def run_engine(engine: str, lines: list[str]) -> tuple[float, list]:
+  scan = SCANNERS[engine]
+  results = []
+  if engine == 'bytes':
+    lines = [line.encode('utf-8') for line in lines] # Scanned undecoded
+
+  start = time.perf_counter()
+  for i, line in enumerate(lines):
+    results.append(scan(line, i+1))
+  elapsed = time.perf_counter() - start
+
+  return (elapsed, results)
+
+def main():
+  arg_parser = argparse.ArgumentParser(description='Compare lexer engine throughput.')
+  arg_parser.add_argument('--repeat', type=int, default=2000, help='times the sample files are repeated')
+  args = arg_parser.parse_args()
+
+  lines = build_lines(args.repeat)
+  timings = {}
+  outputs = {}
+
+  for engine in SCANNERS:
+    (elapsed, results) = run_engine(engine, lines)
+    timings[engine] = elapsed
+    outputs[engine] = results
+
+    token_count = sum(len(token_lexem) for _, token_lexem in results)
+    print(f'{engine:>8}: {elapsed:.3f}s\t{len(lines) / elapsed:,.0f} lines/s\t{token_count / elapsed:,.0f} tokens/s')
+
+  reference = outputs['matcher']
+  for engine, results in outputs.items():
+    if results != reference:
+      raise SystemExit(f'Engine "{engine}" output differs from "matcher"')
+
+  print(f'Speedup (table vs matcher): {timings["matcher"] / timings["table"]:.1f}x')
+  print(f'Speedup (bytes vs matcher): {timings["matcher"] / timings["bytes"]:.1f}x')
+
+if __name__ == '__main__':
+  main()
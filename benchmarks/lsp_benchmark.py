@@ -0,0 +1,94 @@
+import argparse
+import random
+import threading
+import time
+
+from benchmarks.program_generator import ERROR_LINES, generate_program
+from language_server import LanguageServer
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+URI = 'file:///benchmark.por'
+
+class PublishWaiter:
+  # Output stream of the server under test; signals each published diagnostics
+  def __init__(self):
+    self.published = threading.Event()
+
+  def write(self, data: bytes):
+    if b'"textDocument/publishDiagnostics"' in data:
+      self.published.set()
+
+  def flush(self):
+    pass
+
+def percentile(values: list, fraction: float) -> float:
+  ordered = sorted(values)
+  return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def measure(size: int, edits: int, seed: int) -> dict:
+  # Time from a one-line didChange to its published diagnostics, with no
+  # debounce, over random statement edits that sometimes break the program
+  text = generate_program(size, seed=seed)
+  lines = text.splitlines(keepends=True)
+  body_start = lines.index('inicio\n') + 1
+  randomizer = random.Random(seed)
+
+  output = PublishWaiter()
+  server = LanguageServer(output, debounce=0)
+  start = time.perf_counter()
+  server.handle({'jsonrpc': '2.0', 'method': 'textDocument/didOpen', 'params': {'textDocument': {'uri': URI, 'text': text, 'version': 0}}})
+  output.published.wait()
+  open_time = time.perf_counter() - start
+
+  latencies = []
+  broken = None # Line of the error planted by the previous edit
+  for version in range(1, edits + 1):
+    if broken is not None:
+      # Fix the error: replace the broken line
+      (line, end, statement) = (broken, broken + 1, f'  v0 <- v1 + {version}\n')
+      lines[line] = statement
+      broken = None
+    else:
+      # Insert a statement; a few plant an error, fixed by the next edit
+      line = end = randomizer.randrange(body_start, len(lines) - 1)
+      if randomizer.random() < 0.1:
+        (statement, broken) = ('  ' + ERROR_LINES[randomizer.choice(list(ERROR_LINES))] + '\n', line)
+      else:
+        statement = f'  v{randomizer.randrange(20)} <- v{randomizer.randrange(20)} * {version}\n'
+      lines.insert(line, statement)
+
+    change = {'range': {'start': {'line': line, 'character': 0}, 'end': {'line': end, 'character': 0}}, 'text': statement}
+    output.published.clear()
+    start = time.perf_counter()
+    server.handle({'jsonrpc': '2.0', 'method': 'textDocument/didChange', 'params': {'textDocument': {'uri': URI, 'version': version}, 'contentChanges': [change]}})
+    output.published.wait()
+    latencies.append(time.perf_counter() - start)
+
+  return {
+    'lines': len(lines),
+    'open_ms': open_time * 1000,
+    'p50_ms': percentile(latencies, 0.5) * 1000,
+    'p95_ms': percentile(latencies, 0.95) * 1000,
+    'max_ms': max(latencies) * 1000,
+  }
+
+def main():
+  arg_parser = argparse.ArgumentParser(description='Measure language server diagnostic latency after single-line edits.')
+  arg_parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='comma-separated program line counts')
+  arg_parser.add_argument('--edits', type=int, default=200, help='edits per program size')
+  arg_parser.add_argument('--seed', type=int, default=0)
+  arg_parser.add_argument('--max-p95', type=float, metavar='MS', help='exit with status 1 if any p95 latency is above this')
+  args = arg_parser.parse_args()
+
+  failed = False
+  for size in map(int, args.sizes.split(',')):
+    result = measure(size, args.edits, args.seed)
+    print(f'{result["lines"]:>9,} lines: open {result["open_ms"]:8.1f} ms  edit p50 {result["p50_ms"]:6.2f} ms  p95 {result["p95_ms"]:6.2f} ms  max {result["max_ms"]:7.2f} ms')
+    if args.max_p95 is not None and result['p95_ms'] > args.max_p95:
+      failed = True
+
+  if failed:
+    raise SystemExit(f'p95 latency above {args.max_p95} ms')
+
+if __name__ == '__main__':
+  main()
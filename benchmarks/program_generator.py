@@ -0,0 +1,144 @@
+import argparse
+import random
+from typing import List, Optional
+
+# Broken programs get one faulty statement at a random top-level position
+ERROR_KINDS = ['lexical', 'syntactic', 'semantic']
+
+ERROR_LINES = {
+  'lexical': 'v0 <- v0 @ 1',
+  'syntactic': 'v0 <- <- 1',
+  'semantic': 'nao_declarada <- 1',
+}
+
+COMPARISONS = ['=', '<>', '<', '<=', '>', '>=']
+ARITHMETIC = ['+', '-', '*', '/']
+STRINGS = ['"Digite um valor: "', '"Resultado: "', '"Você tem autorização? (1 para sim, 0 para não)"', '"fim"']
+
+class ProgramGenerator:
+  # Seeded generator of Portugol programs of a given size. The same arguments
+  # always give the same program.
+  def __init__(self, variables: int = 20, depth: int = 2, expressionLength: int = 4, seed: int = 0):
+    self.random = random.Random(seed)
+    self.names = [f'v{i}' for i in range(max(variables, 1))]
+    self.depth = depth
+    self.expression_length = max(expressionLength, 1)
+    self.lines: List[str] = []
+
+  def generate(self, lineCount: int, error: Optional[str] = None) -> str:
+    self.lines = ['algoritmo "gerado"', 'var']
+    for i in range(0, len(self.names), 8):
+      self.lines.append(f'  {", ".join(self.names[i:i + 8])}: inteiro')
+    self.lines.append('inicio')
+
+    statement_starts = []
+    while len(self.lines) < lineCount - 1:
+      statement_starts.append(len(self.lines))
+      self.statement(1, self.depth)
+
+    if error is not None:
+      if error not in ERROR_LINES:
+        raise ValueError(f'Unknown error kind "{error}"')
+      position = self.random.choice(statement_starts) if statement_starts else len(self.lines)
+      self.lines.insert(position, '  ' + ERROR_LINES[error])
+
+    self.lines.append('fimalgoritmo')
+    return '\n'.join(self.lines) + '\n'
+
+  # ----------------
+  # Statements
+  # ----------------
+  def statement(self, indent: int, depth: int):
+    choice = self.random.random()
+    if depth > 0 and choice < 0.15:
+      self.command_se(indent, depth)
+    elif depth > 0 and choice < 0.25:
+      self.command_para(indent, depth)
+    elif choice < 0.35:
+      self.emit(indent, f'escreva({self.write_term()})')
+    elif choice < 0.45:
+      self.emit(indent, f'leia({self.variable()})')
+    else:
+      self.emit(indent, f'{self.variable()} <- {self.arithmetic_expression(self.expression_length)}')
+
+  def command_se(self, indent: int, depth: int):
+    self.emit(indent, f'se {self.logic_expression()} então')
+    self.block(indent + 1, depth - 1)
+    if self.random.random() < 0.5:
+      self.emit(indent, 'senão')
+      self.block(indent + 1, depth - 1)
+    self.emit(indent, 'fim_se')
+
+  def command_para(self, indent: int, depth: int):
+    step = f' passo {self.random.randint(1, 3)}' if self.random.random() < 0.5 else ''
+    self.emit(indent, f'para {self.variable()} até {self.random.randint(1, 100)}{step}')
+    self.block(indent + 1, depth - 1)
+    self.emit(indent, 'fim_para')
+
+  def block(self, indent: int, depth: int):
+    for _ in range(self.random.randint(1, 3)):
+      self.statement(indent, depth)
+
+  def emit(self, indent: int, line: str):
+    self.lines.append('  ' * indent + line)
+
+  # ----------------
+  # Expressions
+  # ----------------
+  def arithmetic_expression(self, length: int) -> str:
+    parts = [self.arithmetic_term()]
+    for _ in range(self.random.randint(1, length) - 1):
+      parts.append(self.random.choice(ARITHMETIC))
+      parts.append(self.arithmetic_term())
+
+    expression = ' '.join(parts)
+    if len(parts) > 1 and self.random.random() < 0.2:
+      expression = f'({expression})'
+    return expression
+
+  def arithmetic_term(self) -> str:
+    return self.variable() if self.random.random() < 0.6 else self.number()
+
+  def logic_expression(self) -> str:
+    comparisons = [self.comparison() for _ in range(self.random.randint(1, 2))]
+    return f' {self.random.choice(["e", "ou"])} '.join(comparisons)
+
+  def comparison(self) -> str:
+    comparison = f'({self.variable()} {self.random.choice(COMPARISONS)} {self.arithmetic_term()})'
+    return f'não {comparison}' if self.random.random() < 0.1 else comparison
+
+  def write_term(self) -> str:
+    choice = self.random.random()
+    if choice < 0.5:
+      return self.random.choice(STRINGS)
+    return self.variable() if choice < 0.8 else self.number()
+
+  def variable(self) -> str:
+    return self.random.choice(self.names)
+
+  def number(self) -> str:
+    return str(self.random.randint(0, 1000))
+
+def generate_program(lineCount: int, variables: int = 20, depth: int = 2, expressionLength: int = 4, seed: int = 0, error: Optional[str] = None) -> str:
+  return ProgramGenerator(variables, depth, expressionLength, seed).generate(lineCount, error)
+
+def main():
+  arg_parser = argparse.ArgumentParser(description='Generate a synthetic Portugol program.')
+  arg_parser.add_argument('--lines', type=int, default=1000, help='approximate line count')
+  arg_parser.add_argument('--variables', type=int, default=20, help='declared variables')
+  arg_parser.add_argument('--depth', type=int, default=2, help='max nesting of se/para blocks')
+  arg_parser.add_argument('--expression-length', type=int, default=4, help='max operands per arithmetic expression')
+  arg_parser.add_argument('--seed', type=int, default=0)
+  arg_parser.add_argument('--error', choices=ERROR_KINDS, help='insert one statement with this kind of error')
+  arg_parser.add_argument('-o', '--output', help='output file (default: stdout)')
+  args = arg_parser.parse_args()
+
+  program = generate_program(args.lines, args.variables, args.depth, args.expression_length, args.seed, args.error)
+  if args.output:
+    with open(args.output, 'w', encoding='utf-8') as file:
+      file.write(program)
+  else:
+    print(program, end='')
+
+if __name__ == '__main__':
+  main()
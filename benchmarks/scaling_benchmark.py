@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import analyzers.lexical_analyzer as lexical_analyzer
+from analyzers.semantic_analyzer import SemanticAnalyzer
+from analyzers.syntax_analyzer import Parser
+from benchmarks.program_generator import generate_program
+from pipeline import STATUS_OK, compile_source
+from utils.file_helper import split_lines
+from utils.token_stream import TokenStream
+from utils.tokens import LineIndex
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+PHASES = ['lex', 'parse', 'semantic', 'pipeline']
+
+def best_of(repeat: int, run) -> tuple[float, object]:
+  best = None
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = run()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return (best, result)
+
+def measure(size: int, engine: str, repeat: int, seed: int) -> dict:
+  source = generate_program(size, seed=seed).encode('utf-8')
+  lines = split_lines(source.decode('utf-8'))
+
+  def lex():
+    line_index = LineIndex()
+    return (list(lexical_analyzer.stream_lines(lines, engine, lineIndex=line_index, verbose=False)), line_index)
+
+  # Each phase is timed on the previous phase's output; "pipeline" is the
+  # streamed end-to-end compile the compiler actually runs
+  (lex_time, (tokens, line_index)) = best_of(repeat, lex)
+  (parse_time, program) = best_of(repeat, lambda: Parser(TokenStream(tokens, line_index)).parse())
+  (semantic_time, _) = best_of(repeat, lambda: SemanticAnalyzer(program, line_index).validate())
+  (pipeline_time, result) = best_of(repeat, lambda: compile_source(source, 'generated', engine))
+  if result.status != STATUS_OK:
+    raise SystemExit(f'Generated program failed to compile: {result.message}')
+
+  # Peak memory on a separate run, tracemalloc slows everything down
+  tracemalloc.start()
+  compile_source(source, 'generated', engine)
+  (_, peak) = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+
+  measurement = {'lines': len(lines), 'tokens': len(tokens), 'peak_mb': round(peak / 2**20, 2)}
+  for phase, elapsed in zip(PHASES, [lex_time, parse_time, semantic_time, pipeline_time]):
+    measurement[phase] = {
+      'seconds': round(elapsed, 4),
+      'lines_per_s': round(len(lines) / elapsed),
+      'tokens_per_s': round(len(tokens) / elapsed),
+    }
+  return measurement
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+  # Throughput below, or peak memory above, the baseline by more than `tolerance`
+  found = []
+  for size, measurement in results.items():
+    reference = baseline.get(size)
+    if reference is None:
+      continue
+
+    for phase in PHASES:
+      (current, expected) = (measurement[phase]['lines_per_s'], reference[phase]['lines_per_s'])
+      if current < expected * (1 - tolerance):
+        found.append(f'{size} lines, {phase}: {current:,} lines/s vs baseline {expected:,} ({current / expected - 1:+.0%})')
+
+    (current, expected) = (measurement['peak_mb'], reference['peak_mb'])
+    if current > expected * (1 + tolerance):
+      found.append(f'{size} lines, peak memory: {current} MB vs baseline {expected} MB ({current / expected - 1:+.0%})')
+
+  return found
+
+def main():
+  arg_parser = argparse.ArgumentParser(description='Measure per-phase compiler throughput on generated programs.')
+  arg_parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='comma separated line counts')
+  arg_parser.add_argument('--engine', default='table', choices=list(lexical_analyzer.SCANNERS))
+  arg_parser.add_argument('--repeat', type=int, default=3, help='runs per phase, the best one counts')
+  arg_parser.add_argument('--seed', type=int, default=0)
+  arg_parser.add_argument('--baseline', default=BASELINE_PATH)
+  arg_parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown / memory growth (0.25 = 25%%)')
+  arg_parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+  args = arg_parser.parse_args()
+
+  results = {}
+  for size in map(int, args.sizes.split(',')):
+    measurement = measure(size, args.engine, args.repeat, args.seed)
+    results[str(size)] = measurement
+
+    print(f'{size:>9,} lines  {measurement["tokens"]:>10,} tokens  peak {measurement["peak_mb"]:>8.1f} MB')
+    for phase in PHASES:
+      timing = measurement[phase]
+      print(f'  {phase:>9}: {timing["seconds"]:8.3f}s  {timing["lines_per_s"]:>12,} lines/s  {timing["tokens_per_s"]:>12,} tokens/s')
+
+  if args.save_baseline:
+    with open(args.baseline, 'w', encoding='utf-8') as file:
+      json.dump({'engine': args.engine, 'seed': args.seed, 'results': results}, file, indent=2)
+    print(f'Baseline written to {args.baseline}')
+    return
+
+  if not os.path.exists(args.baseline):
+    print('No baseline stored, run with --save-baseline to create one')
+    return
+
+  with open(args.baseline, encoding='utf-8') as file:
+    baseline = json.load(file)
+
+  if baseline['engine'] != args.engine or baseline['seed'] != args.seed:
+    print(f'Baseline was recorded with engine "{baseline["engine"]}" and seed {baseline["seed"]}, not comparing')
+    return
+
+  found = regressions(results, baseline['results'], args.tolerance)
+  for regression in found:
+    print(f'REGRESSION {regression}')
+  if found:
+    sys.exit(1)
+  print('No regressions against the baseline')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,106 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_baseline.json')
+SAMPLE_FILE = os.path.join(ROOT, 'input', 'input.por')
+
+# compiler.py runs to measure, with the modules each one must never import
+HEAVY_MODULES = ['json', 'backends', 'concurrent.futures', 'analyzers.parallel_lexer', 'analyzers.dataflow']
+SCENARIOS = {
+  'lex-only': (['--lex-only', '--no-artifacts'], HEAVY_MODULES + ['analyzers.syntax_analyzer', 'analyzers.semantic_analyzer', 'hashlib']),
+  'syntax-only': (['--syntax-only', '--no-artifacts'], HEAVY_MODULES + ['analyzers.semantic_analyzer', 'hashlib']),
+  'cached': (['--no-artifacts'], HEAVY_MODULES + ['analyzers.syntax_analyzer', 'analyzers.semantic_analyzer']),
+  'full': (['--no-artifacts', '--no-cache'], HEAVY_MODULES),
+}
+
+def run_compiler(arguments: list, importTime: bool) -> tuple[float, str]:
+  # (wall time, stderr) of one `python compiler.py` process
+  command = [sys.executable] + (['-X', 'importtime'] if importTime else []) + ['compiler.py', SAMPLE_FILE, '-q'] + arguments
+  start = time.perf_counter()
+  process = subprocess.run(command, cwd=ROOT, capture_output=True, text=True)
+  elapsed = time.perf_counter() - start
+  if process.returncode != 0:
+    raise SystemExit(f'compiler.py {" ".join(arguments)} failed:\n{process.stdout}{process.stderr}')
+  return (elapsed, process.stderr)
+
+def imports(report: str) -> dict:
+  # Module -> cumulative import microseconds, from -X importtime output
+  modules = {}
+  for line in report.splitlines():
+    if not line.startswith('import time:') or 'cumulative' in line:
+      continue
+    (_, cumulative, name) = line[len('import time:'):].split('|')
+    modules[name.strip()] = (int(cumulative), len(name) - len(name.lstrip()))
+  return modules
+
+def measure(arguments: list, repeat: int) -> dict:
+  # Best of `repeat`: process wall time and time spent importing the
+  # project's own modules (site and interpreter startup not included)
+  (wall, import_ms, loaded) = (None, None, set())
+  for _ in range(repeat):
+    (elapsed, _) = run_compiler(arguments, False)
+    (_, report) = run_compiler(arguments, True)
+    modules = imports(report)
+    own = sum(cumulative for name, (cumulative, depth) in modules.items() if depth == 1 and name not in ('site', 'encodings') and not name.startswith('_'))
+    wall = elapsed if wall is None else min(wall, elapsed)
+    import_ms = own / 1000 if import_ms is None else min(import_ms, own / 1000)
+    loaded = set(modules)
+  return {'wall_ms': round(wall * 1000, 2), 'import_ms': round(import_ms, 2), 'modules': len(loaded), 'loaded': sorted(loaded)}
+
+def forbidden_imports(loaded: list, forbidden: list) -> list:
+  return sorted(name for name in loaded if any(name == module or name.startswith(module + '.') for module in forbidden))
+
+def main():
+  arg_parser = argparse.ArgumentParser(description='Measure compiler.py startup and import time for each kind of run.')
+  arg_parser.add_argument('--repeat', type=int, default=5, help='runs per scenario, the best one counts')
+  arg_parser.add_argument('--baseline', default=BASELINE_PATH)
+  arg_parser.add_argument('--tolerance', type=float, default=0.5, help='allowed import time growth (0.5 = 50%%); timings are noisy, the module count is compared exactly')
+  arg_parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+  args = arg_parser.parse_args()
+
+  results = {}
+  problems = []
+  with tempfile.TemporaryDirectory() as cache_path:
+    for (name, (arguments, forbidden)) in SCENARIOS.items():
+      if name == 'cached':
+        arguments = arguments + ['--cache', cache_path]
+        run_compiler(arguments, False) # Fill the cache
+      result = measure(arguments, args.repeat)
+      loaded = result.pop('loaded')
+      results[name] = result
+      print(f'{name:>12}: {result["wall_ms"]:7.1f} ms wall  {result["import_ms"]:6.1f} ms importing  {result["modules"]:>4} modules')
+      for module in forbidden_imports(loaded, forbidden):
+        problems.append(f'{name}: imports {module}')
+
+  if args.save_baseline:
+    with open(args.baseline, 'w', encoding='utf-8') as file:
+      json.dump(results, file, indent=2)
+    print(f'Baseline written to {args.baseline}')
+  elif os.path.exists(args.baseline):
+    with open(args.baseline, encoding='utf-8') as file:
+      baseline = json.load(file)
+    for (name, result) in results.items():
+      expected = baseline.get(name)
+      if expected is None:
+        continue
+      if result['modules'] > expected['modules']:
+        problems.append(f'{name}: {result["modules"]} modules loaded vs baseline {expected["modules"]}')
+      if result['import_ms'] > expected['import_ms'] * (1 + args.tolerance):
+        problems.append(f'{name}: {result["import_ms"]} ms importing vs baseline {expected["import_ms"]} ms ({result["import_ms"] / expected["import_ms"] - 1:+.0%})')
+  else:
+    print('No baseline stored, run with --save-baseline to create one')
+
+  for problem in problems:
+    print(f'REGRESSION {problem}')
+  if problems:
+    sys.exit(1)
+  print('No startup regressions')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+
+import analyzers.lexical_analyzer as lexical_analyzer
+import utils.token_file as token_file
+from benchmarks.program_generator import generate_program
+from pipeline import load_program
+from utils.file_helper import split_lines
+from utils.tokens import LineIndex
+
+DEFAULT_SIZES = [10000, 100000]
+
+def timed(run) -> tuple[float, object]:
+  start = time.perf_counter()
+  result = run()
+  return (time.perf_counter() - start, result)
+
+def measure(size: int, lookups: int, seed: int, directory: str) -> list[tuple[str, float, int]]:
+  # (operation, seconds, file size) for the JSON dump and the token file
+  source = generate_program(size, seed=seed)
+  line_index = LineIndex()
+  tokens = list(lexical_analyzer.stream_lines(split_lines(source), 'table', lineIndex=line_index, verbose=False))
+  (program, _) = load_program(source.encode('utf-8'))
+  json_path = os.path.join(directory, 'tokens.tem')
+  binary_path = os.path.join(directory, 'tokens.tok')
+  ast_path = os.path.join(directory, 'tokens-ast.tok')
+
+  def write_json():
+    lexical_analyzer.replay_lines(tokens, line_index, [lexical_analyzer.LexemeJsonWriter(json_path, line_index)])
+
+  def read_json():
+    with open(json_path, encoding='utf-8') as file:
+      return json.load(file)
+
+  # Random access: a JSON reader has to load the whole array first
+  randomizer = random.Random(seed)
+  indexes = [randomizer.randrange(len(tokens)) for _ in range(lookups)]
+  lines = [randomizer.randrange(1, len(line_index.starts) + 1) for _ in range(lookups)]
+
+  def seek_json():
+    document = read_json()
+    return [document[i] for i in indexes]
+
+  def seek_binary():
+    with token_file.TokenFile.open(binary_path) as tokens_file:
+      found = [tokens_file[i] for i in indexes]
+      found += [tokens_file.line_tokens(line) for line in lines]
+    return found
+
+  rows = []
+  for (name, run, path) in [
+    ('json write', write_json, json_path),
+    ('json read', read_json, json_path),
+    (f'json {lookups} lookups', seek_json, json_path),
+    ('binary write', lambda: token_file.write(binary_path, tokens, line_index), binary_path),
+    ('binary read', lambda: token_file.read(binary_path), binary_path),
+    (f'binary {2 * lookups} lookups', seek_binary, binary_path),
+    ('binary write +ast', lambda: token_file.write(ast_path, tokens, line_index, program), ast_path),
+    ('binary read +ast', lambda: token_file.read(ast_path), ast_path),
+  ]:
+    (elapsed, _) = timed(run)
+    rows.append((name, elapsed, os.path.getsize(path)))
+
+  (binary_tokens, _, _) = token_file.read(binary_path)
+  if binary_tokens != tokens:
+    raise SystemExit('Token file read back different tokens')
+  return rows
+
+def main():
+  arg_parser = argparse.ArgumentParser(description='Compare the binary token file with the JSON lexeme dump.')
+  arg_parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)), help='comma-separated program line counts')
+  arg_parser.add_argument('--lookups', type=int, default=1000, help='random token and line lookups')
+  arg_parser.add_argument('--seed', type=int, default=0)
+  args = arg_parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as directory:
+    for size in map(int, args.sizes.split(',')):
+      print(f'{size:,} lines:')
+      for (name, elapsed, file_size) in measure(size, args.lookups, args.seed, directory):
+        print(f'  {name:>22}: {elapsed * 1000:9.1f} ms  {file_size / 2**20:7.2f} MB')
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,74 @@
+import json
+import os
+import socket
+import sys
+
+# Kept to the standard library on purpose: the client starts, sends one
+# request per file to the running server and exits, so it never pays for
+# importing the compiler itself unless the server is down.
+from utils.server_address import DEFAULT_SOCKET_PATH
+
+def compile_remote(paths: list, socketPath: str) -> list:
+  with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+    connection.connect(socketPath)
+    requests = ''.join(json.dumps({'id': i, 'path': os.path.abspath(path)}) + '\n' for i, path in enumerate(paths))
+    connection.sendall(requests.encode('utf-8'))
+
+    # Replies come back in request order. A connection closed early or a
+    # garbled reply ends the list, the caller compiles the rest itself.
+    reader = connection.makefile('r', encoding='utf-8')
+    responses = []
+    for _ in paths:
+      try:
+        responses.append(json.loads(reader.readline()))
+      except (OSError, ValueError):
+        break
+    return responses
+
+def compile_local(paths: list) -> list:
+  # Server not running or gone: compile in this process instead
+  from pipeline import STATUS_OK, compile_file
+  from analyzers.diagnostics import split_code_index
+
+  responses = []
+  for path in paths:
+    result = compile_file(path)
+    diagnostics = []
+    if result.status != STATUS_OK:
+      (line, column) = split_code_index(result.code_index)
+      diagnostics.append({'kind': result.status, 'message': result.message, 'line': line, 'column': column})
+    responses.append({'file': path, 'status': result.status, 'diagnostics': diagnostics, 'cached': result.cached})
+  return responses
+
+def main():
+  args = sys.argv[1:]
+  as_json = '--json' in args
+  socket_path = DEFAULT_SOCKET_PATH
+  paths = [arg for arg in args if arg != '--json']
+  if not paths:
+    print('usage: python client.py [--json] FILE...', file=sys.stderr)
+    sys.exit(2)
+
+  try:
+    responses = compile_remote(paths, socket_path)
+  except OSError:
+    responses = []
+  if len(responses) < len(paths):
+    responses += compile_local(paths[len(responses):])
+
+  failed = False
+  for response in responses:
+    if as_json:
+      print(json.dumps(response, ensure_ascii=False))
+    elif 'error' in response:
+      print(f'{response.get("file", "")}: [COMPILATION ERROR]:\n\t{response["error"]}')
+    elif response['status'] == 'ok':
+      print(f'{response["file"]}: [COMPILED SUCCESSFULLY]')
+    else:
+      print(f'{response["file"]}: [COMPILATION ERROR]:\n\t{response["diagnostics"][0]["message"]}')
+    failed = failed or 'error' in response or response['status'] != 'ok'
+
+  sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+  main()
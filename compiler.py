@@ -1,29 +1,212 @@
+import argparse
+import os
+import sys
+from typing import TYPE_CHECKING, List, Optional
+
+# Only what every run needs is imported up front. Phases, backends, the
+# cache, instrumentation and json are imported where they are used, so a
+# lex-only or cached check doesn't pay for loading them.
 import analyzers.lexical_analyzer as lexical_analyzer
-import analyzers.syntax_analyzer as syntax_analyzer
-import analyzers.semantic_analyzer as semantic_analyzer
+from analyzers.diagnostics import DEFAULT_DIAGNOSTIC_LIMIT, LEXICAL, SYNTACTIC, split_code_index
+from pipeline import PHASE_LEX, PHASE_SEMANTIC, PHASE_SYNTAX, STATUS_OK, CompileResult, compile_source, diagnose, load_program
+from utils.file_helper import BASE_INPUT_PATH, map_file
+from utils.tokens import LineIndex
+
+if TYPE_CHECKING:
+  from utils.compile_cache import CompileCache
+  from utils.instrumentation import Instrumentation
+
+LEXER_ENGINE = 'bytes' # 'matcher' | 'table' | 'bytes'
+CACHE_PATH = 'output/cache' # Default --cache directory; None disables the compilation cache
+STDIN_NAME = 'stdin.por' # Artifact name of a program read from stdin
+
+# Exit codes
+EXIT_OK = 0
+EXIT_COMPILE_ERROR = 1 # Lexical, syntactic or semantic error
+EXIT_USAGE = 2 # Bad arguments or unreadable input
+EXIT_RUNTIME_ERROR = 3 # --run: the program failed while running
+
+SUCCESS_MESSAGES = {
+  PHASE_LEX: '[LEXED SUCCESSFULLY]',
+  PHASE_SYNTAX: '[PARSED SUCCESSFULLY]',
+  PHASE_SEMANTIC: '[COMPILED SUCCESSFULLY]',
+}
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+  arg_parser = argparse.ArgumentParser(description='Compile a Portugol program.', epilog=f'exit status: {EXIT_OK} ok, {EXIT_COMPILE_ERROR} compile error, {EXIT_USAGE} bad arguments or input, {EXIT_RUNTIME_ERROR} runtime error')
+  arg_parser.add_argument('file', help=f'path of the .por file, a file name inside {BASE_INPUT_PATH}/, or - for stdin')
+  phase = arg_parser.add_mutually_exclusive_group()
+  phase.add_argument('--lex-only', dest='phase', action='store_const', const=PHASE_LEX, help='stop after lexical analysis')
+  phase.add_argument('--syntax-only', dest='phase', action='store_const', const=PHASE_SYNTAX, help='stop after syntax analysis')
+  arg_parser.add_argument('-f', '--format', choices=['text', 'json'], default='text', help='result format (default: text)')
+  arg_parser.add_argument('-q', '--quiet', action='store_true', help='only print the final result')
+  arg_parser.add_argument('--no-artifacts', action='store_true', help='do not write the .tem/.tok files to output/lexic_analyzer')
+  arg_parser.add_argument('--token-format', choices=['json', 'binary'], default='json', help='token artifact: indented JSON (.tem) or binary token file (.tok)')
+  arg_parser.add_argument('--stats', nargs='?', const='-', metavar='PATH', help='write per-phase stats as JSON (default: stdout)')
+  arg_parser.add_argument('--memory', action='store_true', help='track the tracemalloc peak of each phase (slower)')
+  arg_parser.add_argument('--profile', metavar='DIR', help='write a cProfile <phase>.prof file per phase to DIR')
+  arg_parser.add_argument('-O', '--optimize', action='store_true', help='run the optimizer passes before the backend')
+  arg_parser.add_argument('-j', '--jobs', type=int, default=1, metavar='N', help='lex large files in N processes')
+  arg_parser.add_argument('--all-errors', action='store_true', help='report every error of a failed compile, not just the first')
+  arg_parser.add_argument('-W', '--warnings', action='store_true', help='report possible reads of unassigned variables, unread values and unreachable code')
+  arg_parser.add_argument('--cache', default=CACHE_PATH, metavar='DIR', help=f'compilation cache directory (default: {CACHE_PATH})')
+  arg_parser.add_argument('--no-cache', action='store_true', help='ignore the compilation cache')
+  arg_parser.add_argument('--run', nargs='?', const='vm', choices=['vm', 'python', 'c'], help='run the program after compiling it: bytecode VM (default), Python code or native C build')
+  args = arg_parser.parse_args(argv)
+
+  args.phase = args.phase or PHASE_SEMANTIC
+  if args.phase != PHASE_SEMANTIC and (args.warnings or args.run):
+    arg_parser.error('--warnings and --run need a full compile')
+  if args.run and args.format == 'json':
+    arg_parser.error('--run writes the program output, it can\'t be combined with --format json')
+  return args
+
+def main(argv: Optional[List[str]] = None) -> int:
+  args = parse_args(argv)
+  instrumentation = None
+  if args.stats or args.memory or args.profile:
+    from utils.instrumentation import Instrumentation
+    instrumentation = Instrumentation(memory=args.memory, profile=bool(args.profile))
+
+  try:
+    if args.file == '-':
+      return compile_input(sys.stdin.buffer.read(), STDIN_NAME, args, instrumentation)
+
+    path = input_path(args.file)
+    # The source is mapped, not read: the bytes engine scans it in place
+    with map_file(path) as source:
+      return compile_input(source, os.path.basename(path), args, instrumentation)
+
+  except OSError as e:
+    print(f'[INPUT ERROR]:\n\t{e}', file=sys.stderr)
+    return EXIT_USAGE
+
+  finally:
+    if instrumentation is not None:
+      report(instrumentation, args)
+
+def input_path(file: str) -> str:
+  # A path as given, else a file name inside input/ (the original layout)
+  if os.path.exists(file) or os.path.dirname(file):
+    return file
+  return os.path.join(BASE_INPUT_PATH, file)
+
+def compile_input(source: bytes, name: str, args: argparse.Namespace, instrumentation: Optional['Instrumentation']) -> int:
+  cache = None
+  if args.cache and not args.no_cache and args.phase == PHASE_SEMANTIC:
+    from utils.compile_cache import CompileCache
+    cache = CompileCache(args.cache)
+
+  # Lexer (streams tokens into the parser as it scans) -> Parser -> Semantic Analyzer
+  line_index = LineIndex()
+  artifacts = None
+  if not args.no_artifacts:
+    artifacts = lexical_analyzer.artifact_writers(name, line_index, args.token_format)
+  verbose = not args.quiet and args.format == 'text'
+  result = compile_source(source, name, LEXER_ENGINE, cache, artifacts, line_index, verbose, instrumentation, args.jobs, args.phase)
+
+  if result.cached and verbose:
+    print('(Unchanged source, result served from cache)')
+
+  (diagnostics, truncated) = ([], False)
+  if result.status != STATUS_OK:
+    if args.all_errors:
+      # Recompile in recovery mode only once the file is known to fail
+      (diagnostics, truncated) = all_errors(source, args.phase)
+    else:
+      diagnostics = [error_item(result.status, result.message, result.code_index)]
+
+  warnings = []
+  if result.status == STATUS_OK and args.warnings:
+    warnings = flow_warnings(source)
+
+  if args.format == 'json':
+    print_json(result, args.phase, diagnostics, truncated, warnings)
+  elif result.status != STATUS_OK:
+    messages = [item['message'] for item in diagnostics]
+    if truncated:
+      messages.append(f'(stopped after {DEFAULT_DIAGNOSTIC_LIMIT} errors)')
+    print('[COMPILATION ERROR]:\n\t' + '\n\t'.join(messages))
+  else:
+    print(SUCCESS_MESSAGES[args.phase])
+    for warning in warnings:
+      print(f'[WARNING]: {warning["message"]}')
+
+  if result.status != STATUS_OK:
+    return EXIT_COMPILE_ERROR
+  if args.run:
+    return run(source, args.run, cache, args.optimize)
+  return EXIT_OK
+
+def error_item(kind: str, message: str, codeIndex: str) -> dict:
+  (line, column) = split_code_index(codeIndex)
+  return {'kind': kind, 'message': message, 'line': line, 'column': column}
+
+def all_errors(source: bytes, phase: str) -> tuple[List[dict], bool]:
+  # Errors of the phases that were asked for, in source order, and whether the list was cut short
+  kinds = {PHASE_LEX: {LEXICAL}, PHASE_SYNTAX: {LEXICAL, SYNTACTIC}}.get(phase)
+  (diagnostics, line_index) = diagnose(source, LEXER_ENGINE)
+  items = [
+    error_item(diagnostic.kind, diagnostic.message, line_index.code_index(diagnostic.offset))
+    for diagnostic in diagnostics.in_source_order()
+    if kinds is None or diagnostic.kind in kinds
+  ]
+  return (items, diagnostics.truncated)
+
+def flow_warnings(source: bytes) -> List[dict]:
+  import analyzers.dataflow as dataflow
+  (program, line_index) = load_program(source, LEXER_ENGINE)
+  return [error_item(warning.kind, warning.message, line_index.code_index(warning.offset)) for warning in dataflow.flow_warnings(program, line_index)]
 
-INPUT_FILE_NAME = 'input-2.por'
+def print_json(result: CompileResult, phase: str, diagnostics: List[dict], truncated: bool, warnings: List[dict]):
+  import json
+  document = {
+    'file': result.file_name, 'phase': phase, 'status': result.status, 'cached': result.cached,
+    'diagnostics': diagnostics, 'truncated': truncated, 'warnings': warnings,
+  }
+  print(json.dumps(document, ensure_ascii=False))
 
-def main():
+def run(source: bytes, backend: str, cache: Optional['CompileCache'], optimized: bool) -> int:
+  from backends.runtime import ExecutionError
   try:
-    # Lexer
-    lexeme_pairs = lexical_analyzer.compile(INPUT_FILE_NAME)
+    if backend == 'python':
+      import backends.python_backend as python_backend
+      # Cached code objects skip the front end entirely
+      (code, execute) = (python_backend.load_code(source, cache, LEXER_ENGINE, optimized), python_backend.execute)
+    elif backend == 'c':
+      import backends.c_backend as c_backend
+      (code, execute) = (c_backend.load_binary(source, cache, LEXER_ENGINE, optimized), c_backend.execute)
+    else:
+      import backends.bytecode as bytecode
+      import backends.vm as vm
+      (program, line_index) = load_program(source, LEXER_ENGINE)
+      if optimized:
+        from backends.optimizer import optimize
+        optimize(program)
+      (code, execute) = (bytecode.compile_program(program, line_index), vm.execute)
 
-    # Parser
-    parser = syntax_analyzer.Parser(lexeme_pairs)
-    parser.parse()
-    print('✅ Syntax is valid.')
+    execute(code)
+    print()
+  except ExecutionError as e:
+    print(f'\n[RUNTIME ERROR]:\n\t{e}')
+    return EXIT_RUNTIME_ERROR
+  return EXIT_OK
 
-    # Semantic Analyzer
-    semantic = semantic_analyzer.SemanticAnalyzer(lexeme_pairs)
-    semantic.validate()
-    print('✅ Semantic is valid.')
+def report(instrumentation: 'Instrumentation', args: argparse.Namespace):
+  if args.profile:
+    instrumentation.dump_profiles(args.profile)
 
-    print('[COMPILED SUCCESSFULLY]')
+  if args.stats is None or instrumentation.stats is None:
+    return
 
-  except Exception as e:
-    print(f'[COMPILATION ERROR]:\n\t{e}')
+  import json
+  stats = json.dumps(instrumentation.stats, indent=2, ensure_ascii=False)
+  if args.stats == '-':
+    print(stats)
+  else:
+    with open(args.stats, 'w', encoding='utf-8') as file:
+      file.write(stats + '\n')
 
 
 if __name__ == "__main__":
-  main()
\ No newline at end of file
+  sys.exit(main())
@@ -0,0 +1,254 @@
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.connection import Connection, wait
+from typing import Dict, List, NamedTuple, Optional
+
+import backends.vm as vm
+from backends.bytecode import CodeObject, compile_program
+from backends.runtime import ExecutionError, ExecutionLimits, StepLimitExceeded, TimeLimitExceeded
+from pipeline import load_program
+from utils.file_helper import map_file
+
+DEFAULT_REPORT_PATH = 'output/grade_report.json'
+DEFAULT_MAX_STEPS = 10_000_000 # "para" passes per case
+DEFAULT_TIME_LIMIT = 2.0 # Seconds per case
+DEFAULT_MAX_INTEGER_BITS = 1 << 16 # Largest product a case may compute
+KILL_GRACE = 0.5 # Seconds past the time limit before a case's worker is killed
+
+STATUS_PASS = 'pass'
+STATUS_FAIL = 'fail' # Ran to the end with the wrong output
+STATUS_RUNTIME = 'runtime_error'
+STATUS_STEP_LIMIT = 'step_limit'
+STATUS_TIME_LIMIT = 'time_limit'
+
+class TestCase(NamedTuple):
+  name: str
+  input: str # Fed to "leia", one integer per line
+  expected: str # Everything "escreva" should write
+
+class CaseResult(NamedTuple):
+  name: str
+  status: str
+  elapsed: float # Seconds spent running the case
+  output: str
+  message: str = ''
+
+def load_cases(path: str) -> List[TestCase]:
+  # A JSON list of {"name"?, "input", "expected"}; "input" is a string or a
+  # list of integers, one per "leia"
+  with open(path, encoding='utf-8') as cases_file:
+    document = json.load(cases_file)
+
+  cases = []
+  for (index, case) in enumerate(document):
+    values = case.get('input', '')
+    if isinstance(values, list):
+      values = ''.join(f'{value}\n' for value in values)
+    cases.append(TestCase(str(case.get('name', index + 1)), values, str(case['expected'])))
+  return cases
+
+def compile_once(source: bytes) -> CodeObject:
+  # Front end and lowering run once; every case reuses the CodeObject
+  (program, line_index) = load_program(source)
+  return compile_program(program, line_index)
+
+def run_case(codeObject: CodeObject, case: TestCase, limits: ExecutionLimits) -> CaseResult:
+  stdout = io.StringIO()
+  start = time.perf_counter()
+  try:
+    vm.execute(codeObject, io.StringIO(case.input), stdout, limits)
+    (status, message) = (STATUS_PASS if stdout.getvalue() == case.expected else STATUS_FAIL, '')
+  except StepLimitExceeded as e:
+    (status, message) = (STATUS_STEP_LIMIT, str(e))
+  except TimeLimitExceeded as e:
+    (status, message) = (STATUS_TIME_LIMIT, str(e))
+  except ExecutionError as e:
+    (status, message) = (STATUS_RUNTIME, str(e))
+  return CaseResult(case.name, status, time.perf_counter() - start, stdout.getvalue(), message)
+
+# Per-process program and limits, set up once by each worker
+worker_code: CodeObject = None
+worker_limits: ExecutionLimits = None
+
+def init_worker(codeObject: CodeObject, maxSteps: Optional[int], timeLimit: Optional[float], maxIntegerBits: Optional[int]):
+  global worker_code, worker_limits
+  worker_code = codeObject
+  worker_limits = ExecutionLimits(maxSteps, timeLimit, maxIntegerBits)
+
+def run_one(case: TestCase) -> CaseResult:
+  return run_case(worker_code, case, worker_limits)
+
+def run_all(codeObject: CodeObject, cases: List[TestCase], workers: int, maxSteps: Optional[int] = DEFAULT_MAX_STEPS, timeLimit: Optional[float] = DEFAULT_TIME_LIMIT, maxIntegerBits: Optional[int] = DEFAULT_MAX_INTEGER_BITS) -> List[CaseResult]:
+  if timeLimit is not None:
+    # The VM's own clock checks run between "para" passes, so a single slow
+    # pass or slow straight-line code is only stopped by killing its process
+    return run_supervised(codeObject, cases, max(1, workers), maxSteps, timeLimit, maxIntegerBits)
+
+  if workers <= 1:
+    init_worker(codeObject, maxSteps, timeLimit, maxIntegerBits)
+    return [run_one(case) for case in cases]
+
+  # The program is shipped once per worker, not once per case
+  chunk_size = max(1, len(cases) // (workers * 8))
+  with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(codeObject, maxSteps, timeLimit, maxIntegerBits)) as executor:
+    return list(executor.map(run_one, cases, chunksize=chunk_size))
+
+# ----------------
+# Supervised workers
+# ----------------
+def serve_cases(connection: Connection, codeObject: CodeObject, maxSteps: Optional[int], timeLimit: Optional[float], maxIntegerBits: Optional[int]):
+  # Worker process: runs the cases it is sent until it gets None
+  init_worker(codeObject, maxSteps, timeLimit, maxIntegerBits)
+  while True:
+    case = connection.recv()
+    if case is None:
+      return
+    connection.send(run_one(case))
+
+class Worker:
+  # A worker process and the case it is running, if any
+  def __init__(self, codeObject: CodeObject, maxSteps: Optional[int], timeLimit: Optional[float], maxIntegerBits: Optional[int]):
+    (self.connection, child) = multiprocessing.Pipe()
+    self.process = multiprocessing.Process(target=serve_cases, args=(child, codeObject, maxSteps, timeLimit, maxIntegerBits), daemon=True)
+    self.process.start()
+    child.close()
+    self.index = -1
+    self.started = 0.0
+
+  def send(self, index: int, case: TestCase):
+    self.connection.send(case)
+    (self.index, self.started) = (index, time.perf_counter())
+
+  def kill(self):
+    self.process.kill()
+    self.process.join()
+    self.connection.close()
+
+  def stop(self):
+    try:
+      self.connection.send(None)
+    except OSError:
+      pass
+    self.process.join(KILL_GRACE)
+    if self.process.is_alive():
+      self.process.kill()
+      self.process.join()
+    self.connection.close()
+
+def run_supervised(codeObject: CodeObject, cases: List[TestCase], workers: int, maxSteps: Optional[int], timeLimit: float, maxIntegerBits: Optional[int]) -> List[CaseResult]:
+  # Hands one case at a time to each worker. A worker still busy KILL_GRACE
+  # after the time limit is killed, its case becomes time_limit and a fresh
+  # worker takes its place.
+  start_worker = lambda: Worker(codeObject, maxSteps, timeLimit, maxIntegerBits)
+  results: List[Optional[CaseResult]] = [None] * len(cases)
+  pending = deque(enumerate(cases))
+  idle = [start_worker() for _ in range(min(workers, len(cases)))]
+  busy: Dict[Connection, Worker] = {}
+
+  try:
+    while pending or busy:
+      while pending and idle:
+        worker = idle.pop()
+        worker.send(*pending.popleft())
+        busy[worker.connection] = worker
+
+      deadline = min(worker.started for worker in busy.values()) + timeLimit + KILL_GRACE
+      for connection in wait(list(busy), max(0.0, deadline - time.perf_counter())):
+        worker = busy.pop(connection)
+        try:
+          results[worker.index] = connection.recv()
+        except (EOFError, OSError):
+          # Died without answering (out of memory, killed from outside)
+          case = cases[worker.index]
+          results[worker.index] = CaseResult(case.name, STATUS_RUNTIME, time.perf_counter() - worker.started, '', 'Worker process died while running the case')
+          worker.kill()
+          if pending:
+            idle.append(start_worker())
+          continue
+        idle.append(worker)
+
+      now = time.perf_counter()
+      for worker in [worker for worker in busy.values() if now - worker.started >= timeLimit + KILL_GRACE]:
+        del busy[worker.connection]
+        worker.kill()
+        case = cases[worker.index]
+        results[worker.index] = CaseResult(case.name, STATUS_TIME_LIMIT, now - worker.started, '', f'Time limit of {timeLimit}s exceeded')
+        if pending:
+          idle.append(start_worker())
+  finally:
+    for worker in idle:
+      worker.stop()
+    for worker in busy.values():
+      worker.kill()
+
+  return results
+
+def write_report(path: str, fileName: str, results: List[CaseResult], compileTime: float, elapsed: float, workers: int):
+  report = {
+    'file': fileName,
+    'total': len(results),
+    'workers': workers,
+    'compile_seconds': round(compileTime, 6),
+    'elapsed_seconds': round(elapsed, 3),
+    'counts': dict(Counter(result.status for result in results)),
+    'results': [result._asdict() for result in results],
+  }
+
+  directory = os.path.dirname(path)
+  if directory:
+    os.makedirs(directory, exist_ok=True)
+  with open(path, 'w', encoding='utf-8') as report_file:
+    json.dump(report, report_file, ensure_ascii=False, indent=2)
+
+def main():
+  arg_parser = argparse.ArgumentParser(description='Run one .por program against a file of leia/escreva test cases.')
+  arg_parser.add_argument('program', help='path of the .por file')
+  arg_parser.add_argument('cases', help='JSON list of {"name", "input", "expected"} cases')
+  arg_parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (default: CPU count)')
+  arg_parser.add_argument('--max-steps', type=int, default=DEFAULT_MAX_STEPS, metavar='N', help=f'"para" passes allowed per case (default: {DEFAULT_MAX_STEPS:,})')
+  arg_parser.add_argument('--time-limit', type=float, default=DEFAULT_TIME_LIMIT, metavar='SECONDS', help=f'wall time allowed per case (default: {DEFAULT_TIME_LIMIT})')
+  arg_parser.add_argument('--max-integer-bits', type=int, default=DEFAULT_MAX_INTEGER_BITS, metavar='N', help=f'size allowed for a product (default: {DEFAULT_MAX_INTEGER_BITS:,} bits)')
+  arg_parser.add_argument('--report', default=DEFAULT_REPORT_PATH, help='JSON report path')
+  args = arg_parser.parse_args()
+
+  cases = load_cases(args.cases)
+  if not cases:
+    raise SystemExit(f'No test cases in "{args.cases}"')
+
+  start = time.perf_counter()
+  try:
+    with map_file(args.program) as source:
+      code = compile_once(source)
+  except Exception as e:
+    raise SystemExit(f'[COMPILATION ERROR]:\n\t{e}')
+  compile_time = time.perf_counter() - start
+
+  # Small suites finish before a pool would have started
+  workers = min(args.workers, len(cases))
+  results = run_all(code, cases, workers, args.max_steps, args.time_limit, args.max_integer_bits)
+  elapsed = time.perf_counter() - start
+
+  write_report(args.report, args.program, results, compile_time, elapsed, workers)
+
+  for result in results:
+    if result.status != STATUS_PASS:
+      detail = result.message or f'wrote {result.output!r}'
+      print(f'[{result.status.upper()}] {result.name}: {detail}')
+
+  counts = Counter(result.status for result in results)
+  summary = ', '.join(f'{status}: {count}' for status, count in sorted(counts.items()))
+  run_time = sum(result.elapsed for result in results)
+  print(f'Ran {len(results)} cases in {elapsed:.2f}s (compile {compile_time * 1000:.1f} ms, run {run_time:.3f}s) [{summary}]')
+  print(f'Report written to {args.report}')
+
+  if counts[STATUS_PASS] != len(results):
+    raise SystemExit(1)
+
+if __name__ == '__main__':
+  main()
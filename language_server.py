@@ -0,0 +1,406 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from bisect import bisect_right
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from analyzers.diagnostics import WARNING, Diagnostic
+from analyzers.incremental import IncrementalDocument
+from utils.token_enum import TokenEnum
+from utils.tokens import Token
+
+DEFAULT_DEBOUNCE = 0.15 # Seconds of quiet typing before diagnostics run
+CANCEL_CHECK_INTERVAL = 256 # Tokens parsed between checks for a newer edit
+
+# JSON-RPC error codes
+METHOD_NOT_FOUND = -32601
+INTERNAL_ERROR = -32603
+
+# Diagnostic severities
+SEVERITY_ERROR = 1
+SEVERITY_WARNING = 2
+
+# ----------------
+# Semantic tokens
+# ----------------
+TOKEN_TYPES = ['keyword', 'variable', 'number', 'string', 'operator', 'type']
+TOKEN_MODIFIERS = ['declaration']
+DECLARATION = 1 # Bit of the "declaration" modifier
+
+OPERATOR_TOKENS = [
+  TokenEnum.ATR, TokenEnum.LOGDIFF, TokenEnum.LOGIGUAL, TokenEnum.LOGMAIOR, TokenEnum.LOGMAIORIGUAL,
+  TokenEnum.LOGMENOR, TokenEnum.LOGMENORIGUAL, TokenEnum.OPDIVI, TokenEnum.OPMAIS, TokenEnum.OPMENOS,
+  TokenEnum.OPMULTI, TokenEnum.PARAB, TokenEnum.PARFE, TokenEnum.COMMA, TokenEnum.COLON,
+]
+
+# Semantic token type of every token kind; the rest are keywords
+SEMANTIC_TYPES = [TOKEN_TYPES.index('keyword')] * len(TokenEnum)
+SEMANTIC_TYPES[TokenEnum.ID.kind] = TOKEN_TYPES.index('variable')
+SEMANTIC_TYPES[TokenEnum.NUMINT.kind] = TOKEN_TYPES.index('number')
+SEMANTIC_TYPES[TokenEnum.STRING.kind] = TOKEN_TYPES.index('string')
+SEMANTIC_TYPES[TokenEnum.TIPO.kind] = TOKEN_TYPES.index('type')
+for operator in OPERATOR_TOKENS:
+  SEMANTIC_TYPES[operator.kind] = TOKEN_TYPES.index('operator')
+
+class DiagnosticsCancelled(Exception):
+  pass
+
+class OpenDocument(IncrementalDocument):
+  # An editor buffer. The lock guards the document between the message loop
+  # (edits, requests) and the diagnostics thread. Setting `cancelled` makes a
+  # running diagnostics pass stop at its next check; the parser state it
+  # leaves behind is the same as before the pass, so the next one resumes.
+  def __init__(self, uri: str, text: str, version: int):
+    self.uri = uri
+    self.version = version
+    self.closed = False
+    self.lock = threading.Lock()
+    self.cancelled = threading.Event()
+    super().__init__(text)
+
+  def iter_tokens(self, line: int, col: int) -> Iterator[Token]:
+    cancelled = self.cancelled.is_set
+    for (count, token) in enumerate(super().iter_tokens(line, col)):
+      if not count % CANCEL_CHECK_INTERVAL and cancelled():
+        raise DiagnosticsCancelled()
+      yield token
+
+  def declarations_by_name(self) -> Dict[str, Token]:
+    # First declaration of each name in the var block, straight from the
+    # tokens, so it stays current while the program does not parse
+    declarations = {}
+    in_var_block = False
+    for (line, tokens) in enumerate(self.line_tokens):
+      for token in tokens:
+        if token.kind == TokenEnum.VAR.kind:
+          in_var_block = True
+        elif token.kind == TokenEnum.INICIO.kind:
+          return declarations
+        elif in_var_block and token.kind == TokenEnum.ID.kind:
+          declarations.setdefault(token.lexeme, Token(token.kind, token.lexeme, self.line_index.starts[line] + token.offset))
+    return declarations
+
+  def token_at(self, line: int, col: int) -> Optional[Token]:
+    # Offsets of the returned token are relative to the line start
+    for token in self.line_tokens[line] if line < len(self.line_tokens) else ():
+      if token.offset <= col < token.offset + len(token.lexeme):
+        return token
+    return None
+
+  def location(self, offset: int) -> Tuple[int, int]:
+    # (line, col) of a char offset; (0, 0) when it has no position
+    if offset < 0:
+      return (0, 0)
+    line = bisect_right(self.line_index.starts, offset) - 1
+    return (line, offset - self.line_index.starts[line])
+
+class DiagnosticsWorker(threading.Thread):
+  # Runs diagnostics off the message loop. A document is diagnosed once no
+  # edit came in for `delay` seconds; results of a version that was edited
+  # meanwhile are dropped instead of published.
+  def __init__(self, publish: Callable[[OpenDocument, List[Diagnostic], float], None], delay: float = DEFAULT_DEBOUNCE):
+    super().__init__(name='diagnostics', daemon=True)
+    self.publish = publish
+    self.delay = delay
+    self.pending: Dict[str, Tuple[float, OpenDocument]] = {}
+    self.condition = threading.Condition()
+
+  def schedule(self, document: OpenDocument):
+    with self.condition:
+      self.pending[document.uri] = (time.perf_counter() + self.delay, document)
+      self.condition.notify()
+
+  def run(self):
+    while True:
+      document = self.next_due()
+      start = time.perf_counter()
+      with document.lock:
+        if document.closed:
+          continue
+        try:
+          diagnostics = document.diagnostics()
+        except DiagnosticsCancelled:
+          continue # The edit that cancelled it scheduled a new run
+        self.publish(document, diagnostics, time.perf_counter() - start)
+
+  def next_due(self) -> OpenDocument:
+    with self.condition:
+      while True:
+        if not self.pending:
+          self.condition.wait()
+          continue
+        (uri, (due, document)) = min(self.pending.items(), key=lambda item: item[1][0])
+        wait = due - time.perf_counter()
+        if wait > 0:
+          self.condition.wait(wait)
+          continue
+        del self.pending[uri]
+        return document
+
+class LanguageServer:
+  # LSP over JSON-RPC: full and incremental text sync, published
+  # diagnostics, semantic tokens and go-to-definition of variables.
+  # Requests are answered on the message loop; diagnostics run on the
+  # DiagnosticsWorker thread.
+  def __init__(self, output: BinaryIO, debounce: float = DEFAULT_DEBOUNCE):
+    self.output = output
+    self.output_lock = threading.Lock()
+    self.documents: Dict[str, OpenDocument] = {}
+    self.utf16 = True # Column unit; "utf-32" (code points) when the client supports it
+    self.shutdown_requested = False
+    self.latencies: List[float] = [] # Seconds spent in each published diagnostics run
+    self.worker = DiagnosticsWorker(self.publish_diagnostics, debounce)
+    self.worker.start()
+
+    self.requests = {
+      'initialize': self.initialize,
+      'shutdown': self.shutdown,
+      'textDocument/semanticTokens/full': self.semantic_tokens,
+      'textDocument/definition': self.definition,
+    }
+    self.notifications = {
+      'textDocument/didOpen': self.did_open,
+      'textDocument/didChange': self.did_change,
+      'textDocument/didClose': self.did_close,
+    }
+
+  def handle(self, message: dict):
+    method = message.get('method')
+    if 'id' not in message:
+      handler = self.notifications.get(method)
+      if handler is not None:
+        handler(message.get('params') or {})
+      return # Unknown notifications ($/cancelRequest, initialized...) need no answer
+
+    handler = self.requests.get(method)
+    if handler is None:
+      self.send({'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': METHOD_NOT_FOUND, 'message': f'Unknown method "{method}"'}})
+      return
+    try:
+      result = handler(message.get('params') or {})
+    except Exception as e:
+      self.send({'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': INTERNAL_ERROR, 'message': str(e)}})
+      return
+    self.send({'jsonrpc': '2.0', 'id': message['id'], 'result': result})
+
+  def send(self, message: dict):
+    with self.output_lock:
+      write_message(self.output, message)
+
+  # ----------------
+  # Lifecycle
+  # ----------------
+  def initialize(self, params: dict) -> dict:
+    encodings = params.get('capabilities', {}).get('general', {}).get('positionEncodings', [])
+    self.utf16 = 'utf-32' not in encodings
+    return {
+      'capabilities': {
+        'positionEncoding': 'utf-16' if self.utf16 else 'utf-32',
+        'textDocumentSync': {'openClose': True, 'change': 2}, # Incremental
+        'semanticTokensProvider': {'legend': {'tokenTypes': TOKEN_TYPES, 'tokenModifiers': TOKEN_MODIFIERS}, 'full': True},
+        'definitionProvider': True,
+      },
+      'serverInfo': {'name': 'portugol-language-server'},
+    }
+
+  def shutdown(self, params: dict):
+    self.shutdown_requested = True
+    return None
+
+  # ----------------
+  # Documents
+  # ----------------
+  def did_open(self, params: dict):
+    item = params['textDocument']
+    document = OpenDocument(item['uri'], item['text'], item.get('version', 0))
+    self.documents[document.uri] = document
+    self.worker.schedule(document)
+
+  def did_change(self, params: dict):
+    document = self.documents.get(params['textDocument']['uri'])
+    if document is None:
+      return
+
+    # Stop a diagnostics pass of the old text instead of waiting for it
+    document.cancelled.set()
+    with document.lock:
+      document.cancelled.clear()
+      for change in params['contentChanges']:
+        self.apply_change(document, change)
+      document.version = params['textDocument'].get('version', document.version + 1)
+    self.worker.schedule(document)
+
+  def apply_change(self, document: OpenDocument, change: dict):
+    if 'range' not in change:
+      document.replace(change['text'])
+      return
+
+    lines = document.lines
+    (start_line, start_col) = self.from_position(document, change['range']['start'])
+    (end_line, end_col) = self.from_position(document, change['range']['end'])
+    prefix = lines[start_line][:start_col] if start_line < len(lines) else ''
+    suffix = lines[end_line][end_col:] if end_line < len(lines) else ''
+    document.edit(start_line, min(end_line + 1, len(lines)), prefix + change['text'] + suffix)
+
+  def did_close(self, params: dict):
+    document = self.documents.pop(params['textDocument']['uri'], None)
+    if document is None:
+      return
+    document.cancelled.set()
+    with document.lock:
+      document.closed = True
+    self.send_diagnostics(document.uri, None, [])
+
+  # ----------------
+  # Diagnostics
+  # ----------------
+  def publish_diagnostics(self, document: OpenDocument, diagnostics: List[Diagnostic], elapsed: float):
+    # Called by the worker, with the document locked
+    items = []
+    for diagnostic in diagnostics:
+      (line, col) = document.location(diagnostic.offset)
+      text = document.lines[line] if line < len(document.lines) else ''
+      items.append({
+        'range': {'start': self.to_position(text, line, col), 'end': self.to_position(text, line, error_end(text, col))},
+        'severity': SEVERITY_WARNING if diagnostic.kind == WARNING else SEVERITY_ERROR,
+        'source': 'portugol',
+        'code': diagnostic.kind,
+        'message': diagnostic.message,
+      })
+    self.latencies.append(elapsed)
+    self.send_diagnostics(document.uri, document.version, items)
+
+  def send_diagnostics(self, uri: str, version: Optional[int], items: List[dict]):
+    params = {'uri': uri, 'diagnostics': items}
+    if version is not None:
+      params['version'] = version
+    self.send({'jsonrpc': '2.0', 'method': 'textDocument/publishDiagnostics', 'params': params})
+
+  # ----------------
+  # Requests
+  # ----------------
+  def semantic_tokens(self, params: dict) -> Optional[dict]:
+    document = self.documents.get(params['textDocument']['uri'])
+    if document is None:
+      return None
+
+    # Five ints per token: line delta, start delta (on the same line), length, type, modifiers
+    data = []
+    (previous_line, previous_col) = (0, 0)
+    with document.lock:
+      declared = {token.offset for token in document.declarations_by_name().values()}
+      starts = document.line_index.starts
+      for (line, tokens) in enumerate(document.line_tokens):
+        if not tokens:
+          continue
+        text = document.lines[line]
+        convert = self.utf16 and not text.isascii()
+        for token in tokens:
+          (col, length) = (token.offset, len(token.lexeme))
+          if convert:
+            (col, length) = (utf16_length(text[:col]), utf16_length(token.lexeme))
+          modifiers = DECLARATION if starts[line] + token.offset in declared else 0
+          data += (line - previous_line, col - previous_col if line == previous_line else col, length, SEMANTIC_TYPES[token.kind], modifiers)
+          (previous_line, previous_col) = (line, col)
+    return {'data': data}
+
+  def definition(self, params: dict) -> Optional[dict]:
+    document = self.documents.get(params['textDocument']['uri'])
+    if document is None:
+      return None
+
+    with document.lock:
+      (line, col) = self.from_position(document, params['position'])
+      token = document.token_at(line, col)
+      if token is None or token.kind != TokenEnum.ID.kind:
+        return None
+      declaration = document.declarations_by_name().get(token.lexeme)
+      if declaration is None:
+        return None
+
+      (line, col) = document.location(declaration.offset)
+      text = document.lines[line]
+      return {
+        'uri': document.uri,
+        'range': {'start': self.to_position(text, line, col), 'end': self.to_position(text, line, col + len(declaration.lexeme))},
+      }
+
+  # ----------------
+  # Positions
+  # ----------------
+  def from_position(self, document: OpenDocument, position: dict) -> Tuple[int, int]:
+    # Client (line, character) -> (line, col) in code points
+    (line, character) = (position['line'], position['character'])
+    if not self.utf16 or line >= len(document.lines):
+      return (line, character)
+    text = document.lines[line]
+    if text.isascii():
+      return (line, character)
+
+    units = 0
+    for (col, char) in enumerate(text):
+      if units >= character:
+        return (line, col)
+      units += 2 if ord(char) > 0xFFFF else 1
+    return (line, len(text))
+
+  def to_position(self, text: str, line: int, col: int) -> dict:
+    if self.utf16 and not text.isascii():
+      col = utf16_length(text[:col])
+    return {'line': line, 'character': col}
+
+def utf16_length(text: str) -> int:
+  return len(text.encode('utf-16-le')) // 2
+
+def error_end(text: str, col: int) -> int:
+  # Diagnostics underline the word at their position, or one char
+  end = col
+  while end < len(text) and (text[end].isalnum() or text[end] == '_'):
+    end += 1
+  return max(end, min(col + 1, len(text.rstrip('\r\n'))))
+
+# ----------------
+# Transport
+# ----------------
+def read_message(stream: BinaryIO) -> Optional[dict]:
+  # One "Content-Length" framed JSON message; None at end of input
+  length = None
+  while True:
+    header = stream.readline()
+    if not header:
+      return None
+    header = header.strip()
+    if not header:
+      break
+    (name, _, value) = header.partition(b':')
+    if name.strip().lower() == b'content-length':
+      length = int(value)
+
+  if length is None:
+    return read_message(stream) # Headers without a body
+  return json.loads(stream.read(length).decode('utf-8'))
+
+def write_message(stream: BinaryIO, message: dict):
+  body = json.dumps(message, ensure_ascii=False).encode('utf-8')
+  stream.write(b'Content-Length: %d\r\n\r\n' % len(body) + body)
+  stream.flush()
+
+def serve(input: BinaryIO, output: BinaryIO, debounce: float = DEFAULT_DEBOUNCE) -> int:
+  server = LanguageServer(output, debounce)
+  while True:
+    message = read_message(input)
+    if message is None or message.get('method') == 'exit':
+      return 0 if server.shutdown_requested else 1
+    server.handle(message)
+
+def main():
+  arg_parser = argparse.ArgumentParser(description='Portugol language server (LSP over stdin/stdout).')
+  arg_parser.add_argument('--debounce', type=int, default=int(DEFAULT_DEBOUNCE * 1000), metavar='MS', help=f'quiet time before diagnostics run (default: {int(DEFAULT_DEBOUNCE * 1000)})')
+  args = arg_parser.parse_args()
+
+  sys.exit(serve(sys.stdin.buffer, sys.stdout.buffer, args.debounce / 1000))
+
+if __name__ == '__main__':
+  main()
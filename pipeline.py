@@ -0,0 +1,281 @@
+import threading
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, NamedTuple, Optional, Union
+
+import analyzers.lexical_analyzer as lexical_analyzer
+from analyzers.ast_nodes import Program
+from analyzers.diagnostics import DEFAULT_DIAGNOSTIC_LIMIT, LEXICAL, SEMANTIC, SYNTACTIC, CompilerError, Diagnostic, DiagnosticCollector, TooManyDiagnostics
+from utils.file_helper import iter_buffer_lines, iter_lines_from_bytes, map_file
+from utils.token_stream import TokenStream
+from utils.tokens import LineIndex, Token
+
+if TYPE_CHECKING:
+  from utils.compile_cache import CompileCache
+  from utils.instrumentation import Instrumentation
+
+STATUS_OK = 'ok'
+STATUS_LEXICAL = LEXICAL
+STATUS_SYNTACTIC = SYNTACTIC
+STATUS_SEMANTIC = SEMANTIC
+STATUS_ERROR = 'error' # Anything else (unreadable file, bad encoding...)
+
+# How far a compile goes. The later phases' modules (and the parallel lexer)
+# are only imported once a compile needs them, so a lex-only or cached run
+# never pays for loading them.
+PHASE_LEX = 'lex'
+PHASE_SYNTAX = 'syntax'
+PHASE_SEMANTIC = 'semantic'
+PHASES = [PHASE_LEX, PHASE_SYNTAX, PHASE_SEMANTIC]
+
+class CompileResult(NamedTuple):
+  file_name: str
+  status: str
+  message: str
+  cached: bool = False
+  code_index: str = '' # "line:col" of the error, "unknown" when it has no position
+
+class Artifacts(NamedTuple):
+  replaced_lines: List[str]
+  tokens: List[Token]
+  line_index: LineIndex
+
+  def lexemes(self) -> List[Dict[str, str]]:
+    # The document of the "_lexic-lexems.tem" file
+    return [token.to_dict(self.line_index) for token in self.tokens]
+
+def source_lines(source: bytes, engine: str) -> Iterable:
+  # The 'bytes' engine scans ASCII lines without decoding them
+  if engine == 'bytes':
+    return iter_buffer_lines(source)
+  return iter_lines_from_bytes(source)
+
+def lex(source: bytes, engine: str, consumers: Optional[List[lexical_analyzer.LineConsumer]], lineIndex: LineIndex, verbose: bool, jobs: int = 1) -> Iterator[Token]:
+  # Large sources are lexed in `jobs` processes; the tokens are the same
+  if jobs > 1:
+    import analyzers.parallel_lexer as parallel_lexer
+    if len(source) >= parallel_lexer.PARALLEL_MIN_BYTES:
+      if verbose:
+        print(f'(Lexing in {jobs} processes)')
+      return parallel_lexer.stream_parallel(source, engine, consumers, lineIndex, jobs)
+  return lexical_analyzer.stream_lines(source_lines(source, engine), engine, consumers, lineIndex, verbose)
+
+def error_status(error: Exception) -> str:
+  # Lexical, syntactic and semantic errors carry their kind
+  return getattr(error, 'kind', None) or STATUS_ERROR
+
+def drain(lexemes: Iterator[Token]):
+  # Lexes the rest of the file for the consumers; a lexical error there ends
+  # the artifacts early, the syntax error is still the one reported
+  try:
+    deque(lexemes, maxlen=0)
+  except lexical_analyzer.LexicalError:
+    pass
+
+def analyze(source: bytes, engine: str = 'table', lineIndex: Optional[LineIndex] = None, consumers: Optional[List[lexical_analyzer.LineConsumer]] = None, verbose: bool = False, collect: Optional[List[Token]] = None, instrumentation: Optional['Instrumentation'] = None, jobs: int = 1, phase: str = PHASE_SEMANTIC) -> Optional[Program]:
+  # Lexer -> Parser -> Semantic Analyzer, up to `phase`; raises the first
+  # error found. Returns the program, or None after a lex-only run.
+  line_index = lineIndex if lineIndex is not None else LineIndex()
+  if instrumentation is not None:
+    consumers = instrumentation.wrap_consumers(consumers)
+  lexemes = lex(source, engine, consumers, line_index, verbose, jobs)
+  if instrumentation is not None:
+    lexemes = instrumentation.wrap_tokens(lexemes)
+
+  if phase == PHASE_LEX:
+    if collect is not None:
+      collect.extend(lexemes)
+    else:
+      deque(lexemes, maxlen=0)
+    return None
+
+  import analyzers.syntax_analyzer as syntax_analyzer
+  tokens = TokenStream(lexemes, line_index, consumers=[collect.append] if collect is not None else None)
+
+  # Parser
+  parser = syntax_analyzer.Parser(tokens)
+  try:
+    program = instrumentation.run('parse', parser.parse) if instrumentation is not None else parser.parse()
+  except syntax_analyzer.SyntacticError:
+    # The artifacts still cover the whole file, as when lexing ran before parsing
+    if consumers:
+      drain(lexemes)
+    raise
+  if verbose:
+    print('✅ Syntax is valid.')
+  if phase == PHASE_SYNTAX:
+    return program
+
+  # Semantic Analyzer
+  import analyzers.semantic_analyzer as semantic_analyzer
+  semantic = semantic_analyzer.SemanticAnalyzer(program, line_index)
+  if instrumentation is not None:
+    instrumentation.run('semantic', semantic.validate)
+  else:
+    semantic.validate()
+  if verbose:
+    print('✅ Semantic is valid.')
+
+  return program
+
+def compile_source(source: bytes, name: str, engine: str = 'table', cache: Optional['CompileCache'] = None, consumers: Optional[List[lexical_analyzer.LineConsumer]] = None, lineIndex: Optional[LineIndex] = None, verbose: bool = False, instrumentation: Optional['Instrumentation'] = None, jobs: int = 1, phase: str = PHASE_SEMANTIC) -> CompileResult:
+  # The cache holds full compiles only, so partial runs neither read nor fill it
+  if phase != PHASE_SEMANTIC:
+    cache = None
+  line_index = lineIndex if lineIndex is not None else LineIndex()
+  if instrumentation is not None:
+    instrumentation.start()
+
+  (result, key) = (None, None)
+  if cache is not None:
+    key = cache.key(source)
+    entry = cache.get_entry(key)
+    # An error entry holds no tokens to write artifacts from, so with
+    # artifact writers open the file is compiled again instead
+    if entry is not None and (entry.tokens is not None or not consumers):
+      if entry.tokens is not None and consumers:
+        line_index.starts.extend(entry.line_index.starts)
+        replay_consumers = instrumentation.wrap_consumers(consumers) if instrumentation is not None else consumers
+        lexical_analyzer.replay_lines(entry.tokens, line_index, replay_consumers)
+      result = CompileResult(name, entry.status, entry.message, True, entry.code_index)
+      if instrumentation is not None and entry.tokens is not None:
+        instrumentation.tokens = len(entry.tokens)
+
+  if result is None:
+    result = compile_uncached(source, name, engine, cache, key, consumers, line_index, verbose, instrumentation, jobs, phase)
+
+  if instrumentation is not None:
+    instrumentation.lines = len(line_index.starts)
+    instrumentation.finish(file=name, status=result.status, cached=result.cached)
+
+  return result
+
+def compile_uncached(source: bytes, name: str, engine: str, cache: Optional['CompileCache'], cacheKey: Optional[str], consumers: Optional[List[lexical_analyzer.LineConsumer]], lineIndex: LineIndex, verbose: bool, instrumentation: Optional['Instrumentation'], jobs: int = 1, phase: str = PHASE_SEMANTIC) -> CompileResult:
+  tokens = [] if cache is not None else None
+  try:
+    analyze(source, engine, lineIndex, consumers, verbose, tokens, instrumentation, jobs, phase)
+    result = CompileResult(name, STATUS_OK, '')
+  except (CompilerError, UnicodeDecodeError) as e:
+    # Only errors of the source itself are results (and cached); anything
+    # else is a compiler failure and propagates
+    result = CompileResult(name, error_status(e), str(e), code_index=getattr(e, 'code_index', 'unknown'))
+    tokens = None
+
+  if cache is not None:
+    from utils.compile_cache import CacheEntry
+    cache.put_entry(cacheKey, CacheEntry(result.status, result.message, result.code_index, tokens, lineIndex if tokens is not None else None))
+
+  return result
+
+def diagnose(source: bytes, engine: str = 'table', limit: int = DEFAULT_DIAGNOSTIC_LIMIT) -> tuple[DiagnosticCollector, LineIndex]:
+  # Every lexical, syntactic and semantic error of the source in one pass,
+  # instead of stopping at the first one. Stops once `limit` are found.
+  import analyzers.semantic_analyzer as semantic_analyzer
+  import analyzers.syntax_analyzer as syntax_analyzer
+  diagnostics = DiagnosticCollector(limit)
+  line_index = LineIndex()
+  lexemes = lexical_analyzer.stream_lines(source_lines(source, engine), engine, lineIndex=line_index, verbose=False, diagnostics=diagnostics)
+  parser = syntax_analyzer.Parser(TokenStream(lexemes, line_index), diagnostics)
+
+  try:
+    program = parser.parse()
+
+    semantic = semantic_analyzer.SemanticAnalyzer(program, line_index)
+    for var in semantic.double_declarations():
+      diagnostics.add(SEMANTIC, semantic_analyzer.double_declaration_error(var.name, line_index.code_index(var.offset)), var.offset)
+
+    # Without a readable var block every name would be reported
+    if not parser.header_failed:
+      for var in semantic.undeclared_variables(program.body):
+        if var.name: # Placeholder of a malformed "para"
+          diagnostics.add(SEMANTIC, semantic_analyzer.undeclared_variable_error(var.name, line_index.code_index(var.offset)), var.offset)
+  except TooManyDiagnostics:
+    pass
+
+  return (diagnostics, line_index)
+
+def load_program(source: bytes, engine: str = 'table') -> tuple[Program, LineIndex]:
+  # Front end only, for the backends; raises the first error found
+  line_index = LineIndex()
+  return (analyze(source, engine, line_index), line_index)
+
+def warnings(source: bytes, engine: str = 'table') -> List[Diagnostic]:
+  # Dataflow warnings of a valid program; raises the first error found
+  import analyzers.dataflow as dataflow
+  (program, line_index) = load_program(source, engine)
+  return dataflow.flow_warnings(program, line_index)
+
+# ----------------
+# Embedding API
+# ----------------
+DEFAULT_MEMORY_ENTRIES = 4096
+
+class Compiler:
+  # In-memory compiles for embedding: takes source text or bytes, returns a
+  # CompileResult, prints nothing and writes nothing unless given a disk cache.
+  # Every compile has its own lexer/parser state, so one instance can serve
+  # many threads. Recent results stay in an LRU keyed by source hash.
+  def __init__(self, engine: str = 'bytes', cache: Optional['CompileCache'] = None, memoryEntries: int = DEFAULT_MEMORY_ENTRIES):
+    if engine not in lexical_analyzer.SCANNERS:
+      raise ValueError(f'Unknown lexer engine "{engine}"')
+    self.engine = engine
+    self.cache = cache
+    self.memory_entries = memoryEntries
+    self.recent: 'OrderedDict[bytes, CompileResult]' = OrderedDict()
+    self.lock = threading.Lock()
+    self.requests = 0
+    self.memory_hits = 0
+
+  def compile(self, source: Union[str, bytes], name: str = '<source>') -> CompileResult:
+    import hashlib
+    source = to_bytes(source)
+    key = hashlib.blake2b(source, digest_size=20).digest()
+
+    with self.lock:
+      self.requests += 1
+      result = self.recent.get(key)
+      if result is not None:
+        self.recent.move_to_end(key)
+        self.memory_hits += 1
+        return result._replace(file_name=name, cached=True)
+
+    result = compile_source(source, name, self.engine, self.cache)
+
+    if self.memory_entries > 0:
+      with self.lock:
+        self.recent[key] = result
+        if len(self.recent) > self.memory_entries:
+          self.recent.popitem(last=False)
+
+    return result
+
+  def compile_with_artifacts(self, source: Union[str, bytes], name: str = '<source>') -> tuple[CompileResult, Artifacts]:
+    # Opt-in artifacts, kept in memory: the replaced lines and tokens lexed
+    # before the first error. Never served from a cache, so they always
+    # match the source.
+    collector = lexical_analyzer.ArtifactCollector()
+    line_index = LineIndex()
+    with self.lock:
+      self.requests += 1
+    result = compile_source(to_bytes(source), name, self.engine, None, [collector], line_index)
+    return (result, Artifacts(collector.lines, collector.tokens, line_index))
+
+  def stats(self) -> dict:
+    with self.lock:
+      stats = {'requests': self.requests, 'memory_hits': self.memory_hits, 'memory_entries': len(self.recent)}
+    if self.cache is not None:
+      stats['disk_cache'] = self.cache.stats()
+    return stats
+
+def to_bytes(source: Union[str, bytes]) -> bytes:
+  return source.encode('utf-8') if isinstance(source, str) else source
+
+def compile_file(path: str, engine: str = 'bytes', cache: Optional['CompileCache'] = None) -> CompileResult:
+  # Quiet compile of any path, without artifacts; errors become the result status
+  try:
+    with map_file(path) as source:
+      return compile_source(source, path, engine, cache)
+  except OSError as e:
+    return CompileResult(path, STATUS_ERROR, str(e), code_index='unknown')
+  except Exception as e:
+    # A compiler failure (never cached), so one bad file doesn't stop a batch
+    return CompileResult(path, STATUS_ERROR, f'Internal compiler error: {e!r}', code_index='unknown')
@@ -0,0 +1,150 @@
+import argparse
+import json
+import os
+import socketserver
+import sys
+import time
+from typing import Optional, Union
+
+from analyzers.diagnostics import split_code_index
+from pipeline import DEFAULT_MEMORY_ENTRIES, STATUS_OK, CompileResult, Compiler, diagnose
+from utils.compile_cache import CompileCache
+from utils.server_address import DEFAULT_SOCKET_PATH
+
+class CompileService:
+  # Answers compile requests with every module already imported and the lexer
+  # tables built. Compiles go through a shared Compiler (in-memory LRU keyed by
+  # source hash); an optional disk cache is shared with batch/compiler runs.
+  # Thread-safe.
+  def __init__(self, diskCache: Optional[CompileCache] = None, memoryEntries: int = DEFAULT_MEMORY_ENTRIES):
+    self.compiler = Compiler(cache=diskCache, memoryEntries=memoryEntries)
+
+  def handle(self, request: dict) -> dict:
+    op = request.get('op', 'compile')
+    if op == 'ping':
+      return {'id': request.get('id'), 'ok': True}
+    if op == 'stats':
+      return {'id': request.get('id'), **self.stats()}
+    if op != 'compile':
+      return {'id': request.get('id'), 'error': f'Unknown op "{op}"'}
+
+    start = time.perf_counter()
+    try:
+      (name, source) = self.read_source(request)
+    except (OSError, KeyError, TypeError) as e:
+      return {'id': request.get('id'), 'error': f'Cannot read source: {e}'}
+
+    result = self.compile(name, source)
+    response = self.to_response(result)
+    if request.get('all_errors') and result.status != STATUS_OK:
+      response.update(self.all_errors(source))
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 3)
+    return {'id': request.get('id'), **response, 'elapsed_ms': elapsed_ms}
+
+  def read_source(self, request: dict) -> tuple[str, bytes]:
+    if 'source' in request:
+      (name, source) = (request.get('name', '<source>'), request['source'])
+      if not isinstance(source, str) or not isinstance(name, str):
+        raise TypeError('"source" and "name" must be strings')
+      return (name, source.encode('utf-8'))
+
+    path = request['path']
+    if not isinstance(path, str):
+      raise TypeError('"path" must be a string')
+    with open(path, 'rb') as file:
+      return (path, file.read())
+
+  def compile(self, name: str, source: bytes) -> CompileResult:
+    return self.compiler.compile(source, name)
+
+  def to_response(self, result: CompileResult) -> dict:
+    diagnostics = []
+    if result.status != STATUS_OK:
+      (line, column) = split_code_index(result.code_index)
+      diagnostics.append({'kind': result.status, 'message': result.message, 'line': line, 'column': column})
+
+    return {'file': result.file_name, 'status': result.status, 'diagnostics': diagnostics, 'cached': result.cached}
+
+  def all_errors(self, source: bytes) -> dict:
+    # Only failed sources are recompiled in recovery mode, and never cached
+    (diagnostics, line_index) = diagnose(source)
+    items = []
+    for diagnostic in diagnostics.in_source_order():
+      (line, column) = split_code_index(line_index.code_index(diagnostic.offset))
+      items.append({'kind': diagnostic.kind, 'message': diagnostic.message, 'line': line, 'column': column})
+
+    return {'diagnostics': items, 'truncated': diagnostics.truncated}
+
+  def stats(self) -> dict:
+    return self.compiler.stats()
+
+  def handle_line(self, line: Union[str, bytes]) -> str:
+    request = None
+    try:
+      request = json.loads(line)
+      if not isinstance(request, dict):
+        raise ValueError('request must be a JSON object')
+      response = self.handle(request)
+    except ValueError as e:
+      response = {'error': f'Bad request: {e}'}
+    except Exception as e:
+      # One failing request gets an error response, the server keeps serving
+      response = {'id': request.get('id') if isinstance(request, dict) else None, 'error': f'Internal error: {e!r}'}
+
+    return json.dumps(response, ensure_ascii=False)
+
+# ----------------
+# Transports
+# ----------------
+def serve_stdio(service: CompileService):
+  # One JSON request per line on stdin, one JSON response per line on stdout
+  for line in sys.stdin:
+    if line.strip():
+      sys.stdout.write(service.handle_line(line) + '\n')
+      sys.stdout.flush()
+
+class CompileRequestHandler(socketserver.StreamRequestHandler):
+  def handle(self):
+    for line in self.rfile:
+      if not line.strip():
+        continue
+      response = self.server.service.handle_line(line)
+      self.wfile.write(response.encode('utf-8') + b'\n')
+      self.wfile.flush()
+
+class CompileSocketServer(socketserver.ThreadingUnixStreamServer):
+  daemon_threads = True
+
+  def __init__(self, path: str, service: CompileService):
+    self.service = service
+    super().__init__(path, CompileRequestHandler)
+
+def serve_socket(service: CompileService, path: str):
+  if os.path.exists(path):
+    os.unlink(path) # Stale socket from a previous run
+
+  with CompileSocketServer(path, service) as server:
+    print(f'Compile server listening on {path}', file=sys.stderr)
+    try:
+      server.serve_forever()
+    except KeyboardInterrupt:
+      pass
+    finally:
+      os.unlink(path)
+
+def main():
+  arg_parser = argparse.ArgumentParser(description='Long-running compile server.')
+  transport = arg_parser.add_mutually_exclusive_group()
+  transport.add_argument('--stdio', action='store_true', help='JSON lines over stdin/stdout')
+  transport.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help=f'Unix socket path (default: {DEFAULT_SOCKET_PATH})')
+  arg_parser.add_argument('--cache', metavar='DIR', help='also keep results in this disk cache directory')
+  args = arg_parser.parse_args()
+
+  service = CompileService(CompileCache(args.cache) if args.cache else None)
+  if args.stdio:
+    serve_stdio(service)
+  else:
+    serve_socket(service, args.socket)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,50 @@
+import unittest
+
+from analyzers.incremental import IncrementalDocument
+
+PROGRAM = '''algoritmo "t"
+var
+  a, b, c, d: inteiro
+inicio
+  a <- 1
+  b <- a + 2
+  se a < b então
+    c <- b
+  fim_se
+  para d até 3
+    escreva(d)
+  fim_para
+fimalgoritmo
+'''
+
+class TruncatedTailTest(unittest.TestCase):
+  # Removing the end of the file leaves no token after the point where the
+  # incremental parse resumes; its error must match a fresh parse
+  def assert_matches_full_parse(self, text: str, startLine: int, endLine: int):
+    document = IncrementalDocument(text)
+    document.diagnostics()
+    document.edit(startLine, endLine, '')
+    self.assertEqual(document.diagnostics(), IncrementalDocument(document.text).diagnostics())
+
+  def test_tail_after_first_statement(self):
+    self.assert_matches_full_parse('algoritmo "t"\nvar\n a, b, c, d: inteiro\ninicio\n a <- 1\nfimalgoritmo\n', 4, 6)
+
+  def test_every_tail(self):
+    line_count = PROGRAM.count('\n')
+    for start in range(4, line_count):
+      with self.subTest(start=start):
+        self.assert_matches_full_parse(PROGRAM, start, line_count)
+
+  def test_every_tail_after_previous_edit(self):
+    line_count = PROGRAM.count('\n')
+    for start in range(5, line_count):
+      with self.subTest(start=start):
+        document = IncrementalDocument(PROGRAM)
+        document.diagnostics()
+        document.edit(4, 5, '  a <- 7\n')
+        document.diagnostics()
+        document.edit(start, line_count, '')
+        self.assertEqual(document.diagnostics(), IncrementalDocument(document.text).diagnostics())
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,210 @@
+import hashlib
+import marshal
+import os
+from array import array
+from typing import List, NamedTuple, Optional
+
+from utils.tokens import LineIndex, Token
+
+DEFAULT_CACHE_PATH = 'output/cache'
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = '.bin'
+
+# Bump when the entry layout changes; the source fingerprint covers code changes
+CACHE_FORMAT = 2
+
+# Modules whose code decides the compile result
+FINGERPRINT_DIRS = ['analyzers', 'backends', 'utils']
+FINGERPRINT_FILES = ['pipeline.py']
+
+_fingerprint: Optional[bytes] = None
+
+def compiler_fingerprint() -> bytes:
+  global _fingerprint
+
+  if _fingerprint is None:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    paths = [os.path.join(root, fileName) for fileName in FINGERPRINT_FILES]
+    for directory in FINGERPRINT_DIRS:
+      directory_path = os.path.join(root, directory)
+      paths.extend(os.path.join(directory_path, fileName) for fileName in os.listdir(directory_path) if fileName.endswith('.py'))
+
+    digest = hashlib.blake2b(str(CACHE_FORMAT).encode(), digest_size=16)
+    for path in sorted(paths):
+      with open(path, 'rb') as file:
+        digest.update(file.read())
+    _fingerprint = digest.digest()
+
+  return _fingerprint
+
+class CacheEntry(NamedTuple):
+  status: str
+  message: str
+  code_index: str
+  # Only kept for programs that compiled successfully
+  tokens: Optional[List[Token]] = None
+  line_index: Optional[LineIndex] = None
+
+def encode_entry(entry: CacheEntry) -> bytes:
+  if entry.tokens is None:
+    return marshal.dumps((CACHE_FORMAT, entry.status, entry.message, entry.code_index))
+
+  # Kinds as bytes, lexemes through a string table, offsets as a packed array
+  lexeme_ids = {}
+  kinds = bytes(token.kind for token in entry.tokens)
+  lexemes = array('I', (lexeme_ids.setdefault(token.lexeme, len(lexeme_ids)) for token in entry.tokens))
+  offsets = array('q', (token.offset for token in entry.tokens))
+
+  return marshal.dumps((
+    CACHE_FORMAT, entry.status, entry.message, entry.code_index,
+    kinds, list(lexeme_ids), lexemes.tobytes(), offsets.tobytes(), entry.line_index.starts.tobytes(),
+  ))
+
+def decode_entry(data: bytes) -> Optional[CacheEntry]:
+  try:
+    fields = marshal.loads(data)
+  except (EOFError, ValueError, TypeError):
+    return None  # Corrupt entry
+
+  # Anything but one of the two tuples encode_entry writes is a miss
+  if not isinstance(fields, tuple) or len(fields) not in (4, 9) or fields[0] != CACHE_FORMAT:
+    return None
+  if len(fields) == 4:
+    return CacheEntry(fields[1], fields[2], fields[3])
+
+  (_, status, message, code_index, kinds, lexeme_table, lexeme_bytes, offset_bytes, start_bytes) = fields
+  try:
+    lexemes = array('I', lexeme_bytes)
+    offsets = array('q', offset_bytes)
+    tokens = [Token(kind, lexeme_table[lexeme], offset) for kind, lexeme, offset in zip(kinds, lexemes, offsets)]
+
+    line_index = LineIndex()
+    line_index.starts.frombytes(start_bytes)
+  except (TypeError, ValueError, IndexError):
+    return None # Corrupt entry
+  return CacheEntry(status, message, code_index, tokens, line_index)
+
+class CompileCache:
+  # On-disk cache of compile results keyed by source hash + compiler fingerprint.
+  # Entries are written atomically (temp file + rename) and evicted least
+  # recently used first, so several batch workers can share one directory.
+  def __init__(self, directory: str = DEFAULT_CACHE_PATH, maxBytes: int = DEFAULT_MAX_BYTES):
+    self.directory = directory
+    self.max_bytes = maxBytes
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.size_estimate: Optional[int] = None
+
+  def key(self, source: bytes, artifact: str = '') -> str:
+    # `artifact` names what is stored for the source (a compile result by
+    # default, generated code for the backends), so the kinds never collide
+    digest = hashlib.blake2b(compiler_fingerprint(), digest_size=20, person=artifact.encode())
+    digest.update(source) # Also takes a mapped file without copying it
+    return digest.hexdigest()
+
+  def path(self, key: str) -> str:
+    return os.path.join(self.directory, key + ENTRY_SUFFIX)
+
+  def get(self, key: str) -> Optional[bytes]:
+    path = self.path(key)
+    try:
+      with open(path, 'rb') as file:
+        data = file.read()
+      os.utime(path) # Mark as recently used
+    except OSError:
+      self.misses += 1
+      return None
+
+    self.hits += 1
+    return data
+
+  def locate(self, key: str) -> Optional[str]:
+    # Path of an entry that is used in place (e.g. a cached executable)
+    path = self.path(key)
+    try:
+      os.utime(path) # Mark as recently used
+    except OSError:
+      self.misses += 1
+      return None
+
+    self.hits += 1
+    return path
+
+  def put(self, key: str, data: bytes, mode: Optional[int] = None):
+    # `mode` sets the file permissions before the entry becomes visible
+    import tempfile # Only writes need it; cache hits skip the import
+    os.makedirs(self.directory, exist_ok=True)
+
+    (fd, temp_path) = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+    try:
+      with os.fdopen(fd, 'wb') as file:
+        file.write(data)
+        if mode is not None:
+          os.fchmod(file.fileno(), mode)
+      os.replace(temp_path, self.path(key))
+    except BaseException:
+      os.unlink(temp_path)
+      raise
+
+    if self.size_estimate is None:
+      self.size_estimate = self.disk_usage()
+    else:
+      self.size_estimate += len(data)
+
+    if self.size_estimate > self.max_bytes:
+      self.evict()
+
+  def get_entry(self, key: str) -> Optional[CacheEntry]:
+    data = self.get(key)
+    if data is None:
+      return None
+
+    entry = decode_entry(data)
+    if entry is None:
+      # Count unreadable entries as misses
+      self.hits -= 1
+      self.misses += 1
+    return entry
+
+  def put_entry(self, key: str, entry: CacheEntry):
+    self.put(key, encode_entry(entry))
+
+  def disk_usage(self) -> int:
+    return sum(size for _, _, size in self.entries())
+
+  def entries(self) -> List[tuple[float, str, int]]:
+    entries = []
+    with os.scandir(self.directory) as scan:
+      for item in scan:
+        if not item.name.endswith(ENTRY_SUFFIX):
+          continue
+        try:
+          stat = item.stat()
+        except FileNotFoundError:
+          continue # Evicted by another worker
+        entries.append((stat.st_mtime, item.path, stat.st_size))
+
+    return entries
+
+  def evict(self):
+    # Drop least recently used entries down to 90% of the cap, so
+    # eviction runs once per batch of writes rather than on every put
+    entries = sorted(self.entries())
+    total = sum(size for _, _, size in entries)
+    target = self.max_bytes * 9 // 10
+
+    for (_, path, size) in entries:
+      if total <= target:
+        break
+      try:
+        os.unlink(path)
+        self.evictions += 1
+      except FileNotFoundError:
+        pass # Evicted by another worker
+      total -= size
+
+    self.size_estimate = total
+
+  def stats(self) -> dict:
+    return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
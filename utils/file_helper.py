@@ -1,7 +1,53 @@
+import io
+import mmap
 import os
+from contextlib import contextmanager
+from typing import Iterator, List, Union
 
 BASE_INPUT_PATH = 'input'
 
 def read_lines_from_file(fileName):
   with open(f'{BASE_INPUT_PATH}/{fileName}', 'r', encoding='utf-8') as file:
     return file.readlines()
+
+def read_bytes_from_file(fileName) -> bytes:
+  with open(f'{BASE_INPUT_PATH}/{fileName}', 'rb') as file:
+    return file.read()
+
+def iter_lines_from_file(fileName) -> Iterator[str]:
+  return iter_lines_from_path(f'{BASE_INPUT_PATH}/{fileName}')
+
+def iter_lines_from_path(path) -> Iterator[str]:
+  with open(path, 'r', encoding='utf-8') as file:
+    yield from file
+
+def iter_lines_from_bytes(source: bytes) -> Iterator[str]:
+  # Same decoding and newline handling as reading the file in text mode
+  return io.TextIOWrapper(io.BytesIO(source), encoding='utf-8')
+
+@contextmanager
+def map_file(path) -> Iterator[Union[mmap.mmap, bytes]]:
+  # Read-only view of the file's bytes, paged in by the OS as it is scanned
+  with open(path, 'rb') as file:
+    if os.fstat(file.fileno()).st_size == 0:
+      yield b'' # Empty files can't be mapped
+      return
+
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+      yield view
+
+def iter_buffer_lines(buffer) -> Iterator[Union[bytes, str]]:
+  # Undecoded lines of a UTF-8 buffer, for the 'bytes' lexer engine
+  if buffer.find(b'\r') != -1:
+    yield from iter_lines_from_bytes(buffer) # Universal newlines
+    return
+
+  (start, size) = (0, len(buffer))
+  while start < size:
+    end = buffer.find(b'\n', start) + 1 or size
+    yield buffer[start:end]
+    start = end
+
+def split_lines(text: str) -> List[str]:
+  # Lines as readlines() would return them for a file with this text
+  return io.StringIO(text, newline=None).readlines()
@@ -0,0 +1,135 @@
+import cProfile
+import os
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+PHASES = ['lex', 'parse', 'semantic', 'artifacts']
+
+class Instrumentation:
+  # Splits the wall time of one compile between its phases. The pipeline is
+  # streamed, so the phases interleave (the parser pulls tokens from the lexer,
+  # the lexer feeds the artifact writers); time always goes to the innermost
+  # phase entered. Optionally tracks the tracemalloc peak and a cProfile
+  # profile per phase. Stats are handed to `callback` when the compile ends.
+  def __init__(self, memory: bool = False, profile: bool = False, callback: Optional[Callable[[dict], None]] = None):
+    self.memory = memory
+    self.callback = callback
+    self.seconds: Dict[str, float] = dict.fromkeys(PHASES, 0.0)
+    self.peak_bytes: Dict[str, int] = dict.fromkeys(PHASES, 0)
+    self.profiles: Dict[str, cProfile.Profile] = {phase: cProfile.Profile() for phase in PHASES} if profile else {}
+    self.stack: List[str] = []
+    self.tokens = 0
+    self.lines = 0
+    self.started_tracemalloc = False
+    self.phase_start = 0.0
+    self.start_time = 0.0
+    self.stats: Optional[dict] = None
+
+  def start(self):
+    if self.memory and not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self.started_tracemalloc = True
+    self.start_time = time.perf_counter()
+
+  def finish(self, **fields) -> dict:
+    total = time.perf_counter() - self.start_time
+    if self.started_tracemalloc:
+      tracemalloc.stop()
+
+    phases = {}
+    for phase in PHASES:
+      phases[phase] = {'seconds': round(self.seconds[phase], 6)}
+      if self.memory:
+        phases[phase]['peak_bytes'] = self.peak_bytes[phase]
+
+    self.stats = {**fields, 'lines': self.lines, 'tokens': self.tokens, 'total_seconds': round(total, 6), 'phases': phases}
+    if self.callback is not None:
+      self.callback(self.stats)
+    return self.stats
+
+  # ----------------
+  # Phases
+  # ----------------
+  def enter(self, phase: str):
+    self.pause()
+    self.stack.append(phase)
+    self.resume()
+
+  def leave(self):
+    self.pause()
+    self.stack.pop()
+    self.resume()
+
+  def pause(self):
+    if not self.stack:
+      return
+
+    phase = self.stack[-1]
+    self.seconds[phase] += time.perf_counter() - self.phase_start
+    if phase in self.profiles:
+      self.profiles[phase].disable()
+    if self.memory:
+      self.peak_bytes[phase] = max(self.peak_bytes[phase], tracemalloc.get_traced_memory()[1])
+
+  def resume(self):
+    if not self.stack:
+      return
+
+    phase = self.stack[-1]
+    if self.memory:
+      tracemalloc.reset_peak()
+    if phase in self.profiles:
+      self.profiles[phase].enable()
+    self.phase_start = time.perf_counter()
+
+  def run(self, phase: str, function: Callable, *args):
+    self.enter(phase)
+    try:
+      return function(*args)
+    finally:
+      self.leave()
+
+  # ----------------
+  # Stream wrappers
+  # ----------------
+  def wrap_tokens(self, tokens: Iterable) -> Iterator:
+    # Counts the time the consumer spends waiting on the lexer as lex time
+    iterator = iter(tokens)
+    while True:
+      self.enter('lex')
+      try:
+        token = next(iterator)
+      except StopIteration:
+        return
+      finally:
+        self.leave()
+      self.tokens += 1
+      yield token
+
+  def wrap_consumers(self, consumers: Optional[list]) -> Optional[list]:
+    if not consumers:
+      return consumers
+    return [InstrumentedConsumer(consumer, self) for consumer in consumers]
+
+  def dump_profiles(self, directory: str) -> List[str]:
+    # One pstats file per phase, readable with `python -m pstats` or snakeviz
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for phase, profile in self.profiles.items():
+      path = os.path.join(directory, f'{phase}.prof')
+      profile.dump_stats(path)
+      paths.append(path)
+    return paths
+
+class InstrumentedConsumer:
+  # Artifact writer proxy that books its time as the "artifacts" phase
+  def __init__(self, consumer, instrumentation: Instrumentation):
+    self.consumer = consumer
+    self.instrumentation = instrumentation
+
+  def write_line(self, new_line: str, tokens: list):
+    self.instrumentation.run('artifacts', self.consumer.write_line, new_line, tokens)
+
+  def close(self):
+    self.instrumentation.run('artifacts', self.consumer.close)
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# Unix socket of the compile server, shared by server.py and client.py so
+# both resolve the same path; $PORTUGOL_SOCKET overrides it. Standard library
+# only, the client imports it on every run.
+DEFAULT_SOCKET_PATH = os.environ.get('PORTUGOL_SOCKET', os.path.join(tempfile.gettempdir(), 'portugol-compiler.sock'))
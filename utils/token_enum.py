@@ -40,3 +40,9 @@ class TokenEnum(Enum):
   INICIO = 'inicio'
   FIMALGORITMO = 'fimalgoritmo'
   END_OF_FILE = '__EOF__'
+
+
+# Integer kind codes, so token tests are int compares instead of name compares
+TOKENS_BY_KIND = list(TokenEnum)
+for kind, token in enumerate(TOKENS_BY_KIND):
+  token.kind = kind
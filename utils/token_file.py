@@ -0,0 +1,332 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterator, List, Optional, Union
+
+from analyzers.ast_nodes import Assign, BinaryOp, Escreva, Leia, Node, Num, Para, Program, Se, Str, UnaryOp, Var
+from utils.tokens import LineIndex, Token
+
+# ----------------
+# Layout
+# ----------------
+# A token file (".tok") is little-endian, every section 8-byte aligned:
+#   header      HEADER below
+#   strings     (string_count + 1) int64 end offsets into the string data, from 0
+#   string data UTF-8 lexemes (and AST names/texts), each stored once
+#   tokens      token_count records of 2 int64: lexeme id << 8 | kind, char offset
+#   lines       line_count int64 line start offsets, then line_count + 1 int64
+#               first token index of each line (the last is token_count)
+#   ast         optional, NODE_WORDS int64 per node in preorder:
+#               node type | aux << 8, value, char offset
+# Records are fixed width, so a reader seeks straight to any token or line.
+MAGIC = b'PTOK'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHH8Q')
+FLAG_AST = 1
+
+TOKEN_WORDS = 2
+NODE_WORDS = 3
+KIND_BITS = 8
+KIND_MASK = (1 << KIND_BITS) - 1
+
+# AST node types; aux and value hold, by type:
+#   Var/Str: aux = string id | Num: aux = string id of the digits
+#   BinaryOp/UnaryOp: aux = operator kind
+#   Se: aux = then count, value = else count (children: condition, then, else)
+#   Para: aux = has step, value = body count (children: var, limit, step?, body)
+#   Program: aux = declaration count, value = body count (children: name, declarations, body)
+NODE_TYPES = [Var, Num, Str, BinaryOp, UnaryOp, Assign, Escreva, Leia, Se, Para, Program]
+NODE_TYPE_IDS = {node_type: i for i, node_type in enumerate(NODE_TYPES)}
+
+LITTLE_ENDIAN = sys.byteorder == 'little'
+
+class TokenFileError(ValueError):
+  pass
+
+class StringTable:
+  # Interns strings to ids while writing
+  def __init__(self):
+    self.ids: Dict[str, int] = {}
+
+  def id(self, text: str) -> int:
+    string_id = self.ids.get(text)
+    if string_id is None:
+      string_id = self.ids[text] = len(self.ids)
+    return string_id
+
+  def encode(self) -> tuple[bytes, bytes]:
+    data = [text.encode('utf-8') for text in self.ids]
+    ends = array('q', [0])
+    for item in data:
+      ends.append(ends[-1] + len(item))
+    return (to_little_endian(ends), pad(b''.join(data)))
+
+# ----------------
+# Writing
+# ----------------
+def encode(tokens: List[Token], lineIndex: LineIndex, program: Optional[Program] = None) -> bytes:
+  strings = StringTable()
+  string_id = strings.id
+
+  # Both words of every record in one array: even slots, then odd slots
+  count = len(tokens)
+  records = array('q', bytes(8 * TOKEN_WORDS * count))
+  records[0::2] = array('q', [string_id(token.lexeme) << KIND_BITS | token.kind for token in tokens])
+  offsets = array('q', [token.offset for token in tokens])
+  records[1::2] = offsets
+
+  starts = lineIndex.starts
+  first_tokens = array('q', [bisect_left(offsets, start) for start in starts])
+  first_tokens.append(count)
+
+  ast = encode_ast(program, strings) if program is not None else b''
+  (string_index, string_data) = strings.encode()
+
+  sections = [string_index, string_data, to_little_endian(records), to_little_endian(starts) + to_little_endian(first_tokens), ast]
+  positions = []
+  position = HEADER.size
+  for section in sections:
+    positions.append(position)
+    position += len(section)
+
+  header = HEADER.pack(
+    MAGIC, FORMAT_VERSION, FLAG_AST if program is not None else 0,
+    count, len(starts), len(strings.ids), *positions,
+  )
+  return b''.join([header, *sections])
+
+def encode_ast(program: Program, strings: StringTable) -> bytes:
+  # Preorder with an explicit stack, so deep expressions can't overflow it
+  words = array('q')
+  stack: List[Node] = [program]
+  while stack:
+    node = stack.pop()
+    (aux, value, children) = (0, 0, ())
+    if isinstance(node, Var):
+      aux = strings.id(node.name)
+    elif isinstance(node, Num):
+      aux = strings.id(str(node.value))
+    elif isinstance(node, Str):
+      aux = strings.id(node.text)
+    elif isinstance(node, BinaryOp):
+      (aux, children) = (node.op, (node.left, node.right))
+    elif isinstance(node, UnaryOp):
+      (aux, children) = (node.op, (node.operand,))
+    elif isinstance(node, Assign):
+      children = (node.target, node.value)
+    elif isinstance(node, Escreva):
+      children = (node.value,)
+    elif isinstance(node, Leia):
+      children = (node.target,)
+    elif isinstance(node, Se):
+      (aux, value, children) = (len(node.then_body), len(node.else_body), [node.condition, *node.then_body, *node.else_body])
+    elif isinstance(node, Para):
+      step = [node.step] if node.step is not None else []
+      (aux, value, children) = (len(step), len(node.body), [node.var, node.limit, *step, *node.body])
+    else:
+      (aux, value, children) = (len(node.declarations), len(node.body), [node.name, *node.declarations, *node.body])
+
+    words.extend((NODE_TYPE_IDS[type(node)] | aux << KIND_BITS, value, node.offset))
+    stack.extend(reversed(children))
+
+  return to_little_endian(words)
+
+def write(path: str, tokens: List[Token], lineIndex: LineIndex, program: Optional[Program] = None):
+  with open(path, 'wb') as file:
+    file.write(encode(tokens, lineIndex, program))
+
+def to_little_endian(values: array) -> bytes:
+  if not LITTLE_ENDIAN:
+    values = array(values.typecode, values)
+    values.byteswap()
+  return values.tobytes()
+
+def pad(data: bytes) -> bytes:
+  return data + bytes(-len(data) % 8)
+
+# ----------------
+# Reading
+# ----------------
+class TokenFile:
+  # Read-only view of a token file. Nothing is decoded up front: tokens,
+  # lines and lexemes are read from the buffer when asked for, so a tool can
+  # open a large file and seek to one token or line for the cost of a few
+  # reads. Takes any bytes-like buffer; TokenFile.open maps a file.
+  def __init__(self, buffer: Union[bytes, mmap.mmap, memoryview]):
+    if len(buffer) < HEADER.size:
+      raise TokenFileError('Truncated token file')
+    (magic, version, flags, self.token_count, self.line_count, self.string_count,
+     strings_at, string_data_at, tokens_at, lines_at, ast_at) = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+      raise TokenFileError('Not a token file')
+    if version != FORMAT_VERSION:
+      raise TokenFileError(f'Unsupported token file version {version}')
+
+    self.buffer = buffer
+    view = memoryview(buffer)
+    self.string_ends = words(view, strings_at, self.string_count + 1)
+    self.string_data = view[string_data_at:tokens_at]
+    self.records = words(view, tokens_at, TOKEN_WORDS * self.token_count)
+    self.line_starts = words(view, lines_at, self.line_count)
+    self.first_tokens = words(view, lines_at + 8 * self.line_count, self.line_count + 1)
+    self.ast = words(view, ast_at, (len(buffer) - ast_at) // 8) if flags & FLAG_AST else None
+    self.strings: Dict[int, str] = {}
+    self.file = None
+
+  @classmethod
+  def open(cls, path: str) -> 'TokenFile':
+    file = open(path, 'rb')
+    try:
+      buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b''
+      token_file = cls(buffer)
+    except BaseException:
+      file.close()
+      raise
+    token_file.file = file
+    return token_file
+
+  def close(self):
+    # Views must go before the map they point into
+    self.string_ends = self.string_data = self.records = self.line_starts = self.first_tokens = self.ast = None
+    if isinstance(self.buffer, mmap.mmap):
+      self.buffer.close()
+    if self.file is not None:
+      self.file.close()
+
+  def __enter__(self) -> 'TokenFile':
+    return self
+
+  def __exit__(self, *exc):
+    self.close()
+
+  # ----------------
+  # Tokens and lines
+  # ----------------
+  def __len__(self) -> int:
+    return self.token_count
+
+  def __getitem__(self, index: int) -> Token:
+    if index < 0:
+      index += self.token_count
+    if not 0 <= index < self.token_count:
+      raise IndexError('token index out of range')
+    word = self.records[TOKEN_WORDS * index]
+    return Token(word & KIND_MASK, self.string(word >> KIND_BITS), self.records[TOKEN_WORDS * index + 1])
+
+  def __iter__(self) -> Iterator[Token]:
+    return iter(self.tokens(0, self.token_count))
+
+  def tokens(self, start: int, end: int) -> List[Token]:
+    # One bulk copy of the records, then the Tokens are built in C
+    words = self.records[TOKEN_WORDS * start:TOKEN_WORDS * min(end, self.token_count)].tolist()
+    heads = words[0::TOKEN_WORDS]
+    if len(heads) > self.string_count:
+      strings = self.all_strings()
+      lexemes = [strings[word >> KIND_BITS] for word in heads]
+    else:
+      lexemes = [self.string(word >> KIND_BITS) for word in heads]
+    return list(map(Token, [word & KIND_MASK for word in heads], lexemes, words[1::TOKEN_WORDS]))
+
+  def line_tokens(self, line: int) -> List[Token]:
+    # Tokens of a 1-based line, as in "line:col"
+    if not 1 <= line <= self.line_count:
+      raise IndexError('line out of range')
+    return self.tokens(self.first_tokens[line - 1], self.first_tokens[line])
+
+  def line_index(self) -> LineIndex:
+    line_index = LineIndex()
+    line_index.starts.extend(self.line_starts)
+    return line_index
+
+  def code_index(self, index: int) -> str:
+    offset = self[index].offset
+    line = bisect_right(self.line_starts, offset)
+    return f'{line}:{offset - self.line_starts[line - 1] + 1}'
+
+  def all_strings(self) -> List[str]:
+    if len(self.strings) < self.string_count:
+      data = bytes(self.string_data)
+      ends = self.string_ends.tolist()
+      self.strings = dict(enumerate(data[ends[i]:ends[i + 1]].decode('utf-8') for i in range(self.string_count)))
+    return list(self.strings.values())
+
+  def string(self, stringId: int) -> str:
+    text = self.strings.get(stringId)
+    if text is None:
+      text = self.strings[stringId] = str(self.string_data[self.string_ends[stringId]:self.string_ends[stringId + 1]], 'utf-8')
+    return text
+
+  # ----------------
+  # AST
+  # ----------------
+  def program(self) -> Optional[Program]:
+    # Decoded on demand, bottom up: in reverse preorder the children of a
+    # node are the top entries of the stack, first child on top
+    if self.ast is None:
+      return None
+
+    ast = self.ast.tolist()
+    strings = self.all_strings()
+    stack: List[Node] = []
+    pop = stack.pop
+    for i in range(len(ast) - NODE_WORDS, -1, -NODE_WORDS):
+      (word, value, offset) = (ast[i], ast[i + 1], ast[i + 2])
+      (node_type, aux) = (NODE_TYPES[word & KIND_MASK], word >> KIND_BITS)
+      if node_type is Var:
+        node = Var(strings[aux], offset)
+      elif node_type is Num:
+        node = Num(int(strings[aux]), offset)
+      elif node_type is Str:
+        node = Str(strings[aux], offset)
+      elif node_type is BinaryOp:
+        node = BinaryOp(aux, pop(), pop(), offset)
+      elif node_type is UnaryOp:
+        node = UnaryOp(aux, pop(), offset)
+      elif node_type is Assign:
+        node = Assign(pop(), pop(), offset)
+      elif node_type is Escreva:
+        node = Escreva(pop(), offset)
+      elif node_type is Leia:
+        node = Leia(pop(), offset)
+      elif node_type is Se:
+        condition = pop()
+        node = Se(condition, take(stack, aux), take(stack, value), offset)
+      elif node_type is Para:
+        (var, limit) = (pop(), pop())
+        step = pop() if aux else None
+        node = Para(var, limit, step, take(stack, value), offset)
+      else:
+        name = pop()
+        node = Program(name, take(stack, aux), take(stack, value), offset)
+      stack.append(node)
+
+    if len(stack) != 1:
+      raise TokenFileError('Malformed AST section')
+    return stack[0]
+
+def words(view: memoryview, start: int, count: int) -> Union[memoryview, array]:
+  # int64 section as a zero-copy view (copied and swapped on big-endian hosts)
+  section = view[start:start + 8 * count]
+  if len(section) != 8 * count:
+    raise TokenFileError('Truncated token file')
+  if LITTLE_ENDIAN:
+    return section.cast('q')
+  values = array('q', section)
+  values.byteswap()
+  return values
+
+def take(stack: List[Node], count: int) -> List[Node]:
+  # The next `count` children, in order
+  if not count:
+    return []
+  nodes = stack[:-count - 1:-1]
+  del stack[-count:]
+  return nodes
+
+def read(path: str) -> tuple[List[Token], LineIndex, Optional[Program]]:
+  # Everything at once; the file is closed afterwards
+  with TokenFile.open(path) as token_file:
+    return (list(token_file), token_file.line_index(), token_file.program())
@@ -0,0 +1,54 @@
+from collections import deque
+from typing import Callable, Deque, Iterable, List, Optional
+
+from utils.tokens import LineIndex, Token
+
+class TokenStream:
+  # Pulls tokens lazily from any iterable through a small lookahead buffer.
+  # Consumers see every token once, in order, as it enters the buffer.
+  def __init__(self, tokens: Iterable[Token], lineIndex: LineIndex, consumers: Optional[List[Callable[[Token], None]]] = None):
+    self.source = iter(tokens)
+    self.line_index = lineIndex
+    self.buffer: Deque[Token] = deque()
+    self.consumers = consumers or []
+    self.last: Optional[Token] = None
+    self.exhausted = False
+
+  def fill(self, size: int) -> bool:
+    while len(self.buffer) < size:
+      if self.exhausted:
+        return False
+
+      try:
+        token = next(self.source)
+      except StopIteration:
+        self.exhausted = True
+        return False
+
+      for consumer in self.consumers:
+        consumer(token)
+      self.buffer.append(token)
+
+    return True
+
+  def peek(self, offset: int = 0) -> Optional[Token]:
+    if offset < len(self.buffer) or self.fill(offset + 1):
+      return self.buffer[offset]
+
+    return None
+
+  def advance(self) -> Optional[Token]:
+    token = self.peek()
+    if token is not None:
+      self.buffer.popleft()
+      self.last = token
+
+    return token
+
+  def at_end(self) -> bool:
+    return self.peek() is None
+
+  def code_index(self, token: Optional[Token]) -> str:
+    if token is None:
+      return 'unknown'
+    return self.line_index.code_index(token.offset)
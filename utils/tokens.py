@@ -0,0 +1,50 @@
+from array import array
+from bisect import bisect_right
+from typing import Dict
+
+from utils.token_enum import TOKENS_BY_KIND
+
+class Token:
+  # kind: TokenEnum kind code, lexeme: interned source text,
+  # offset: char offset of the token in the source (see LineIndex)
+  __slots__ = ('kind', 'lexeme', 'offset')
+
+  def __init__(self, kind: int, lexeme: str, offset: int):
+    self.kind = kind
+    self.lexeme = lexeme
+    self.offset = offset
+
+  @property
+  def name(self) -> str:
+    return TOKENS_BY_KIND[self.kind].name
+
+  def to_dict(self, lineIndex: 'LineIndex') -> Dict[str, str]:
+    return {
+      "token": self.name,
+      "lexeme": self.lexeme,
+      "code_index": lineIndex.code_index(self.offset)
+    }
+
+  def __eq__(self, other) -> bool:
+    if not isinstance(other, Token):
+      return NotImplemented
+    return self.kind == other.kind and self.lexeme == other.lexeme and self.offset == other.offset
+
+  def __repr__(self) -> str:
+    return f'Token({self.name}, {self.lexeme!r}, {self.offset})'
+
+class LineIndex:
+  # Start offset of every line, filled while the source is read.
+  # Offsets only become "line:col" when a diagnostic or artifact needs them.
+  def __init__(self):
+    self.starts = array('q')
+
+  def add_line(self, start: int):
+    self.starts.append(start)
+
+  def code_index(self, offset: int) -> str:
+    line = bisect_right(self.starts, offset)
+    if line == 0:
+      return 'unknown'
+
+    return f'{line}:{offset - self.starts[line - 1] + 1}'